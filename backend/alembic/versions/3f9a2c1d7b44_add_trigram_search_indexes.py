@@ -0,0 +1,41 @@
+"""Add trigram search indexes
+
+Revision ID: 3f9a2c1d7b44
+Revises: 1db82050ed99
+Create Date: 2026-10-17 09:12:41.502113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c1d7b44'
+down_revision: Union[str, Sequence[str], None] = '1db82050ed99'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STUDENT_SEARCH_COLUMNS = ['name', 'admission_number', 'father_name', 'mother_name', 'parent_contact']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('idx_student_search_trgm', 'students', STUDENT_SEARCH_COLUMNS, unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={c: 'gin_trgm_ops' for c in STUDENT_SEARCH_COLUMNS})
+    op.create_index('idx_user_search_trgm', 'users', ['name', 'email'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops', 'email': 'gin_trgm_ops'})
+    op.create_index('idx_notification_title_trgm', 'notifications', ['title'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_notification_title_trgm', table_name='notifications')
+    op.drop_index('idx_user_search_trgm', table_name='users')
+    op.drop_index('idx_student_search_trgm', table_name='students')
@@ -0,0 +1,43 @@
+"""Add normalized parent phone to students
+
+Revision ID: 8c41e07a5d26
+Revises: 3f9a2c1d7b44
+Create Date: 2026-10-17 11:03:18.225907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41e07a5d26'
+down_revision: Union[str, Sequence[str], None] = '3f9a2c1d7b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('students', sa.Column('parent_phone_e164', sa.String(length=24), nullable=True))
+    # Same rules as models.normalize_phone, assuming the default country code +91
+    op.execute("""
+        UPDATE students
+        SET parent_phone_e164 = CASE
+            WHEN n.phone LIKE '+%' THEN '+' || replace(substr(n.phone, 2), '+', '')
+            WHEN replace(n.phone, '+', '') LIKE '00%' THEN '+' || substr(replace(n.phone, '+', ''), 3)
+            ELSE '+91' || ltrim(replace(n.phone, '+', ''), '0')
+        END
+        FROM (
+            SELECT id, regexp_replace(parent_contact, '[^0-9+]', '', 'g') AS phone FROM students
+        ) AS n
+        WHERE n.id = students.id
+    """)
+    op.create_index('idx_student_school_phone', 'students', ['school_id', 'parent_phone_e164'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_student_school_phone', table_name='students')
+    op.drop_column('students', 'parent_phone_e164')
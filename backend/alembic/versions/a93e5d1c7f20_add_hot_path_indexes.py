@@ -0,0 +1,45 @@
+"""Add hot path indexes
+
+Revision ID: a93e5d1c7f20
+Revises: f2c7a9b3d018
+Create Date: 2026-10-17 19:02:13.447061
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93e5d1c7f20'
+down_revision: Union[str, Sequence[str], None] = 'f2c7a9b3d018'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Student list: school + active filter, optional class, keyset order (class_name, name, id).
+    # date_of_admission makes the dashboard's student counts index-only.
+    op.create_index('idx_student_active_school_class_name', 'students', ['school_id', 'class_name', 'name', 'id'], unique=False,
+                    postgresql_where=sa.text('is_active'),
+                    postgresql_include=['date_of_admission'])
+    # Dashboard pending fee count, joined from the school's students
+    op.create_index('idx_student_fee_unpaid_student', 'student_fees', ['student_id'], unique=False,
+                    postgresql_where=sa.text("status = 'unpaid'"))
+    # Newest-first lists per school; the single-column school_id indexes are prefixes of these
+    op.create_index('idx_fee_bill_school_created', 'fee_bills', ['school_id', 'created_at', 'id'], unique=False)
+    op.drop_index(op.f('ix_fee_bills_school_id'), table_name='fee_bills')
+    op.create_index('idx_notification_school_created', 'notifications', ['school_id', 'created_at', 'id'], unique=False)
+    op.drop_index(op.f('ix_notifications_school_id'), table_name='notifications')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_notifications_school_id'), 'notifications', ['school_id'], unique=False)
+    op.drop_index('idx_notification_school_created', table_name='notifications')
+    op.create_index(op.f('ix_fee_bills_school_id'), 'fee_bills', ['school_id'], unique=False)
+    op.drop_index('idx_fee_bill_school_created', table_name='fee_bills')
+    op.drop_index('idx_student_fee_unpaid_student', table_name='student_fees')
+    op.drop_index('idx_student_active_school_class_name', table_name='students')
@@ -0,0 +1,48 @@
+"""Add notification_deliveries outbox
+
+Revision ID: b7e2d4f19a30
+Revises: 8c41e07a5d26
+Create Date: 2026-10-17 13:42:51.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4f19a30'
+down_revision: Union[str, Sequence[str], None] = '8c41e07a5d26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notification_deliveries',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('notification_id', sa.String(length=36), nullable=False),
+    sa.Column('school_id', sa.String(length=36), nullable=False),
+    sa.Column('phone', sa.String(length=24), nullable=False),
+    sa.Column('student_names', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_delivery_notification_phone', 'notification_deliveries', ['notification_id', 'phone'], unique=True)
+    op.create_index('idx_delivery_due', 'notification_deliveries', ['next_attempt_at'], unique=False,
+                    postgresql_where=sa.text("status IN ('pending', 'sending')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_delivery_due', table_name='notification_deliveries', postgresql_where=sa.text("status IN ('pending', 'sending')"))
+    op.drop_index('idx_delivery_notification_phone', table_name='notification_deliveries')
+    op.drop_table('notification_deliveries')
@@ -0,0 +1,33 @@
+"""Add archive tombstone to fee bills
+
+Revision ID: c3d8e5f1a7b2
+Revises: a93e5d1c7f20
+Create Date: 2026-10-17 23:41:06.519384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d8e5f1a7b2'
+down_revision: Union[str, Sequence[str], None] = 'a93e5d1c7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Set when the bill's paid fees move to the archive; the bill can no longer be applied
+    op.add_column('fee_bills', sa.Column('archived_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('fee_bills', sa.Column('archived_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('fee_bills', sa.Column('archived_amount', sa.Float(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('fee_bills', 'archived_amount')
+    op.drop_column('fee_bills', 'archived_count')
+    op.drop_column('fee_bills', 'archived_at')
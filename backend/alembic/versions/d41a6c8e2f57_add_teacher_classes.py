@@ -0,0 +1,43 @@
+"""Add teacher_classes join table
+
+Revision ID: d41a6c8e2f57
+Revises: b7e2d4f19a30
+Create Date: 2026-10-17 15:20:07.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a6c8e2f57'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d4f19a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('teacher_classes',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('class_name', sa.String(length=50), nullable=False),
+    sa.Column('school_id', sa.String(length=36), nullable=False),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'class_name')
+    )
+    op.create_index('idx_teacher_class_school_class', 'teacher_classes', ['school_id', 'class_name'], unique=False)
+    op.execute("""
+        INSERT INTO teacher_classes (user_id, class_name, school_id)
+        SELECT DISTINCT users.id, trim(c.class_name), users.school_id
+        FROM users, unnest(string_to_array(users.assigned_classes, ',')) AS c(class_name)
+        WHERE trim(c.class_name) <> ''
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_teacher_class_school_class', table_name='teacher_classes')
+    op.drop_table('teacher_classes')
@@ -0,0 +1,124 @@
+"""Partition attendance by month
+
+Revision ID: f2c7a9b3d018
+Revises: d41a6c8e2f57
+Create Date: 2026-10-17 17:05:44.912730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c7a9b3d018'
+down_revision: Union[str, Sequence[str], None] = 'd41a6c8e2f57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Creates the monthly partitions covering [start_date, end_date] plus one for
+# every month that has rows in attendance_default, moving those rows over.
+# Called from partitions.py at startup and daily.
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION ensure_attendance_partitions(start_date date, end_date date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Self-exclusive, so callers do not race on CREATE TABLE, and blocks inserts into
+    -- the default partition: a row landing there for a month being moved out would
+    -- make ATTACH PARTITION fail
+    LOCK TABLE attendance_default IN SHARE ROW EXCLUSIVE MODE;
+
+    FOR month_start IN
+        SELECT generate_series(date_trunc('month', start_date), date_trunc('month', end_date), interval '1 month')::date
+        UNION
+        SELECT DISTINCT date_trunc('month', date)::date FROM attendance_default
+    LOOP
+        partition_name := format('attendance_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+
+        EXECUTE format('CREATE TABLE %I (LIKE attendance INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM attendance_default WHERE date >= %L AND date < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            month_start, (month_start + interval '1 month')::date, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE attendance ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, (month_start + interval '1 month')::date
+        );
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('attendance', 'attendance_legacy')
+    op.execute('ALTER TABLE attendance_legacy RENAME CONSTRAINT attendance_pkey TO attendance_legacy_pkey')
+    op.execute('ALTER INDEX idx_attendance_student_date RENAME TO idx_attendance_legacy_student_date')
+    op.execute('ALTER INDEX ix_attendance_date RENAME TO ix_attendance_legacy_date')
+    op.execute('ALTER INDEX ix_attendance_student_id RENAME TO ix_attendance_legacy_student_id')
+
+    # The partition key has to be part of every unique constraint, hence (id, date)
+    op.create_table('attendance',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('student_id', sa.String(length=36), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('marked_by', sa.String(length=36), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'date'),
+    postgresql_partition_by='RANGE (date)'
+    )
+    op.create_index('idx_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True)
+    op.create_index(op.f('ix_attendance_date'), 'attendance', ['date'], unique=False)
+    op.create_index(op.f('ix_attendance_student_id'), 'attendance', ['student_id'], unique=False)
+    # Catches dates without a monthly partition until ensure_attendance_partitions moves them
+    op.execute('CREATE TABLE attendance_default PARTITION OF attendance DEFAULT')
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+
+    op.execute("""
+        SELECT ensure_attendance_partitions(
+            coalesce((SELECT min(date) FROM attendance_legacy), current_date),
+            (current_date + interval '3 months')::date
+        )
+    """)
+    op.execute('INSERT INTO attendance SELECT id, student_id, date, status, marked_by, created_at FROM attendance_legacy')
+    op.drop_table('attendance_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('attendance', 'attendance_partitioned')
+    op.execute('ALTER INDEX idx_attendance_student_date RENAME TO idx_attendance_partitioned_student_date')
+    op.execute('ALTER INDEX ix_attendance_date RENAME TO ix_attendance_partitioned_date')
+    op.execute('ALTER INDEX ix_attendance_student_id RENAME TO ix_attendance_partitioned_student_id')
+    op.execute('ALTER TABLE attendance_partitioned RENAME CONSTRAINT attendance_pkey TO attendance_partitioned_pkey')
+
+    op.create_table('attendance',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('student_id', sa.String(length=36), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('marked_by', sa.String(length=36), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO attendance SELECT id, student_id, date, status, marked_by, created_at FROM attendance_partitioned')
+    op.create_index('idx_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True)
+    op.create_index(op.f('ix_attendance_date'), 'attendance', ['date'], unique=False)
+    op.create_index(op.f('ix_attendance_student_id'), 'attendance', ['student_id'], unique=False)
+
+    op.drop_table('attendance_partitioned')  # drops every partition
+    op.execute('DROP FUNCTION ensure_attendance_partitions(date, date)')
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""Archival of closed academic years to Parquet files.
+
+Attendance, student fees and teacher salary payments of academic years that
+have ended are rarely read but keep growing the hot tables, their indexes and
+the backups. The archiver writes one school's rows of one academic year to
+``ARCHIVE_DIR/<school_id>/<table>/<year>.parquet`` (zstd-compressed,
+``year`` being the calendar year the academic year starts in) and then
+deletes them from Postgres in batches of ARCHIVE_BATCH_SIZE.
+
+Only fees of fully settled bills are archived. The existing rows are what
+keep a re-applied bill from billing students who already have it, so the
+transaction deleting a bill's fees also stamps ``FeeBill.archived_at`` and
+adds them to its ``archived_count`` and ``archived_amount``; an archived
+bill can no longer be applied.
+
+An academic year starts on the first of ACADEMIC_YEAR_START_MONTH and counts
+as closed ARCHIVE_GRACE_DAYS after it ends, leaving time for late corrections.
+History endpoints asking for dates in archived years read the files back
+with ``read_archived``.
+
+    python archive.py --school <school_id>          # every closed year
+    python archive.py --school <school_id> --year 2024
+    python archive.py --all-schools
+    python archive.py --school <school_id> --list
+
+The API starts runs with ``start_archive_job`` and reports them by job id.
+Needs pyarrow.
+"""
+
+import argparse
+import asyncio
+import fcntl
+import logging
+import json
+import os
+import sys
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, select, update
+
+from database import AsyncSessionLocal, ROOT_DIR
+from models import Attendance, FeeBill, School, Student, StudentFee, TeacherSalary, User
+
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', ROOT_DIR / 'archive'))
+ACADEMIC_YEAR_START_MONTH = int(os.environ.get('ACADEMIC_YEAR_START_MONTH', 4))
+ARCHIVE_GRACE_DAYS = int(os.environ.get('ARCHIVE_GRACE_DAYS', 90))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 2000))
+ARCHIVE_COMPRESSION = os.environ.get('ARCHIVE_COMPRESSION', 'zstd')
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveUnavailableError(RuntimeError):
+    """pyarrow is not installed"""
+
+
+class ArchiveBusyError(RuntimeError):
+    """Another archive run holds the school's lock"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ArchiveUnavailableError("Archiving needs pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+# ========================
+# Academic years
+# ========================
+
+def academic_year(day: date) -> int:
+    """The academic year ``day`` falls in, named after the year it starts in"""
+    return day.year if day.month >= ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def academic_year_bounds(year: int):
+    """First day of the academic year and first day of the next one"""
+    return date(year, ACADEMIC_YEAR_START_MONTH, 1), date(year + 1, ACADEMIC_YEAR_START_MONTH, 1)
+
+
+def last_closed_year(today: Optional[date] = None) -> int:
+    """The latest academic year that may be archived"""
+    today = today or date.today()
+    return academic_year(today - timedelta(days=ARCHIVE_GRACE_DAYS)) - 1
+
+
+# ========================
+# Archived tables
+# ========================
+
+@dataclass(frozen=True)
+class ArchivedTable:
+    model: Any
+    date_column: Any  # puts each row in an academic year
+    school_filter: Callable[[str], Any]  # school_id -> condition on the model's own columns
+    # Runs in each delete batch's transaction, before the delete: (session, row ids, condition)
+    before_delete: Optional[Callable[[Any, List[str], Any], Awaitable[None]]] = None
+
+    def bound(self, day: date):
+        if self.date_column.type.python_type is datetime:
+            return datetime.combine(day, time.min, tzinfo=timezone.utc)
+        return day
+
+    def where(self, school_id: str, start: date, end: date):
+        """Rows of the school dated from ``start`` up to, not including, ``end``"""
+        return and_(
+            self.school_filter(school_id),
+            self.date_column >= self.bound(start),
+            self.date_column < self.bound(end)
+        )
+
+
+def _school_students(school_id: str):
+    return select(Student.id).where(Student.school_id == school_id)
+
+
+def _settled_fee_bills(school_id: str):
+    """Bills of the school without any unpaid fee"""
+    unpaid = select(StudentFee.id).where(and_(StudentFee.fee_bill_id == FeeBill.id, StudentFee.status != 'paid'))
+    return select(FeeBill.id).where(and_(FeeBill.school_id == school_id, ~unpaid.exists()))
+
+
+async def _tombstone_fee_bills(session, fee_ids: List[str], condition):
+    """Mark the bills of the fees about to be deleted as archived and add the fees to their totals
+
+    The update locks the bills until the fees are gone, so a concurrent
+    ``apply`` either finishes first or finds the bill archived.
+    """
+    totals = select(
+        StudentFee.fee_bill_id, func.count().label("count"), func.sum(StudentFee.amount).label("amount")
+    ).where(and_(StudentFee.id.in_(fee_ids), condition)).group_by(StudentFee.fee_bill_id).subquery()
+    await session.execute(
+        update(FeeBill).where(FeeBill.id == totals.c.fee_bill_id).values(
+            archived_at=func.coalesce(FeeBill.archived_at, func.now()),
+            archived_count=FeeBill.archived_count + totals.c.count,
+            archived_amount=FeeBill.archived_amount + totals.c.amount
+        ).execution_options(synchronize_session=False)
+    )
+
+
+ARCHIVED_TABLES: Dict[str, ArchivedTable] = {
+    'attendance': ArchivedTable(
+        Attendance, Attendance.date,
+        lambda school_id: Attendance.student_id.in_(_school_students(school_id))
+    ),
+    'student_fees': ArchivedTable(
+        StudentFee, StudentFee.created_at,
+        lambda school_id: StudentFee.fee_bill_id.in_(_settled_fee_bills(school_id)),
+        before_delete=_tombstone_fee_bills
+    ),
+    'teacher_salaries': ArchivedTable(
+        TeacherSalary, TeacherSalary.paid_at,
+        lambda school_id: TeacherSalary.teacher_id.in_(select(User.id).where(User.school_id == school_id))
+    ),
+}
+
+
+def arrow_schema(model):
+    pa, _ = _pyarrow()
+    types = {datetime: pa.timestamp('us', tz='UTC'), date: pa.date32(), float: pa.float64(), int: pa.int64()}
+    return pa.schema([
+        pa.field(column.name, types.get(column.type.python_type, pa.string()))
+        for column in model.__table__.columns
+    ])
+
+
+def archive_path(school_id: str, table: str, year: int) -> Path:
+    return ARCHIVE_DIR / school_id / table / f"{year}.parquet"
+
+
+def archived_years(school_id: str, table: str) -> List[int]:
+    directory = ARCHIVE_DIR / school_id / table
+    if not directory.is_dir():
+        return []
+    return sorted(int(path.stem) for path in directory.glob("*.parquet") if path.stem.isdigit())
+
+
+def _describe(table: str, year: int, rows: int, size: Optional[int] = None) -> dict:
+    start, end = academic_year_bounds(year)
+    return {"table": table, "year": year, "start_date": start, "end_date": end - timedelta(days=1), "rows": rows, "bytes": size}
+
+
+@contextmanager
+def _school_lock(school_id: str):
+    """One archive run per school at a time"""
+    directory = ARCHIVE_DIR / school_id
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ArchiveBusyError(f"An archive run for school {school_id} is already in progress")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def archive_running(school_id: str) -> bool:
+    """Whether an archive run, in any process, holds the school's lock"""
+    try:
+        with _school_lock(school_id):
+            return False
+    except ArchiveBusyError:
+        return True
+
+
+# ========================
+# Archiving
+# ========================
+
+async def _write_year(path: Path, spec: ArchivedTable, condition) -> List[str]:
+    """Write the matching rows, plus those already in ``path``, to a new file at ``path``.
+
+    Returns the ids of the matching rows. The file is synced to disk before it
+    replaces the old one, so rows are only ever deleted once they are durable.
+    """
+    pa, pq = _pyarrow()
+    schema = arrow_schema(spec.model)
+    # A run interrupted while deleting leaves rows both in the file and in the
+    # table; they are kept from the file and not written twice
+    existing = await asyncio.to_thread(pq.read_table, path) if path.exists() else None
+    archived_ids = set(existing.column('id').to_pylist()) if existing is not None else set()
+
+    row_ids = []
+    partial = path.with_name(path.name + ".partial")
+    with open(partial, "wb") as sink:
+        writer = pq.ParquetWriter(sink, schema, compression=ARCHIVE_COMPRESSION)
+        try:
+            if existing is not None:
+                writer.write_table(existing.cast(schema))
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(
+                    select(*spec.model.__table__.columns).where(condition).execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+                )
+                async for partition in result.partitions():
+                    rows = [dict(row._mapping) for row in partition]
+                    row_ids += [row['id'] for row in rows]
+                    new_rows = [row for row in rows if row['id'] not in archived_ids]
+                    if new_rows:
+                        await asyncio.to_thread(writer.write_batch, pa.RecordBatch.from_pylist(new_rows, schema))
+        finally:
+            writer.close()
+        sink.flush()
+        os.fsync(sink.fileno())
+
+    if not row_ids:
+        partial.unlink()
+        return row_ids
+    expected = len(archived_ids | set(row_ids))
+    written = pq.ParquetFile(partial).metadata.num_rows
+    if written != expected:
+        partial.unlink()
+        raise RuntimeError(f"{partial} holds {written} rows, expected {expected}")
+    os.replace(partial, path)
+    return row_ids
+
+
+async def archive_year(school_id: str, table: str, year: int) -> int:
+    """Move one academic year of a school's ``table`` rows to its Parquet file, returning how many"""
+    spec = ARCHIVED_TABLES[table]
+    start, end = academic_year_bounds(year)
+    condition = spec.where(school_id, start, end)
+    path = archive_path(school_id, table, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    row_ids = await _write_year(path, spec, condition)
+
+    # Small transactions keep locks short and the WAL steady; repeating the
+    # date range lets attendance deletes skip the other monthly partitions
+    for i in range(0, len(row_ids), ARCHIVE_BATCH_SIZE):
+        async with AsyncSessionLocal() as session:
+            if spec.before_delete:
+                await spec.before_delete(session, row_ids[i:i + ARCHIVE_BATCH_SIZE], condition)
+            await session.execute(
+                delete(spec.model).where(spec.model.id.in_(row_ids[i:i + ARCHIVE_BATCH_SIZE]), condition)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    if row_ids:
+        logger.info("Archived %d %s rows of %d for school %s", len(row_ids), table, year, school_id)
+    return len(row_ids)
+
+
+async def _archive_closed_years(school_id: str, through_year: Optional[int]) -> List[dict]:
+    """Archive the closed years of every table; the caller holds the school's lock"""
+    closed = last_closed_year()
+    through_year = closed if through_year is None else min(through_year, closed)
+    archived = []
+    for table, spec in ARCHIVED_TABLES.items():
+        async with AsyncSessionLocal() as session:
+            first = await session.scalar(select(func.min(spec.date_column)).where(spec.school_filter(school_id)))
+        if first is None:
+            continue
+        if isinstance(first, datetime):
+            first = first.astimezone(timezone.utc).date()
+        for year in range(academic_year(first), through_year + 1):
+            rows = await archive_year(school_id, table, year)
+            if rows:
+                archived.append(_describe(table, year, rows))
+    return archived
+
+
+async def archive_school(school_id: str, through_year: Optional[int] = None) -> List[dict]:
+    """Archive every closed academic year of a school, up to ``through_year`` if given"""
+    _pyarrow()
+    with _school_lock(school_id):
+        return await _archive_closed_years(school_id, through_year)
+
+
+# ========================
+# Jobs
+# ========================
+
+# Running job tasks, referenced until they finish
+_job_tasks = set()
+
+
+def _job_path(school_id: str, job_id: str) -> Path:
+    return ARCHIVE_DIR / school_id / "jobs" / f"{job_id}.json"
+
+
+def _save_job(school_id: str, job: dict):
+    path = _job_path(school_id, job["id"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    partial.write_text(json.dumps(job, default=str))
+    os.replace(partial, path)
+
+
+def start_archive_job(school_id: str, through_year: Optional[int] = None,
+                      on_done: Optional[Callable[[dict], None]] = None) -> dict:
+    """Start archiving a school's closed years in the background and return the new job.
+
+    The school's lock is taken here, so a second run is refused with
+    ArchiveBusyError instead of queueing, and held until the job's final
+    status is saved. Job status lives next to the archive files, so every
+    API worker can report it. ``on_done`` gets the finished job.
+    """
+    _pyarrow()
+    lock = ExitStack()
+    lock.enter_context(_school_lock(school_id))
+    job = {
+        "id": str(uuid.uuid4()),
+        "status": "running",
+        "year": through_year,
+        "last_closed_year": last_closed_year(),
+        "started_at": datetime.now(timezone.utc),
+        "finished_at": None,
+        "archived": [],
+        "error": None,
+    }
+    try:
+        _save_job(school_id, job)
+    except BaseException:
+        lock.close()
+        raise
+
+    async def run_job():
+        with lock:
+            try:
+                job["archived"] = await _archive_closed_years(school_id, through_year)
+                job["status"] = "succeeded"
+            except BaseException as e:
+                logger.exception("Archive job %s for school %s failed", job["id"], school_id)
+                job["status"] = "failed"
+                job["error"] = "Interrupted" if isinstance(e, asyncio.CancelledError) else str(e)
+                if not isinstance(e, Exception):
+                    raise
+            finally:
+                job["finished_at"] = datetime.now(timezone.utc)
+                _save_job(school_id, job)
+                if on_done:
+                    on_done(job)
+
+    task = asyncio.create_task(run_job())
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    return dict(job)
+
+
+def load_archive_job(school_id: str, job_id: str) -> Optional[dict]:
+    """A job of the school by id, or None"""
+    try:
+        job_id = str(uuid.UUID(job_id))
+    except ValueError:
+        return None
+    path = _job_path(school_id, job_id)
+    if not path.exists():
+        return None
+    job = json.loads(path.read_text())
+    # A process that died mid-run leaves its job running without the lock
+    if job["status"] == "running" and not archive_running(school_id):
+        job.update(status="failed", error="Interrupted")
+    return job
+
+
+# ========================
+# Reading archives
+# ========================
+
+def list_archives(school_id: str) -> List[dict]:
+    """Archived academic years of a school with their row counts and file sizes"""
+    archives = []
+    for table in ARCHIVED_TABLES:
+        for year in archived_years(school_id, table):
+            _, pq = _pyarrow()
+            path = archive_path(school_id, table, year)
+            archives.append(_describe(table, year, pq.ParquetFile(path).metadata.num_rows, path.stat().st_size))
+    return archives
+
+
+def read_archived(school_id: str, table: str, start: Optional[date], end: Optional[date], **equals) -> List[dict]:
+    """Archived rows of ``table`` dated from ``start`` to ``end`` inclusive whose columns match ``equals``.
+
+    A missing ``start`` or ``end`` leaves that side of the range open.
+    Blocking; call it through ``asyncio.to_thread``. Only the files of the
+    academic years overlapping the range are opened, and Parquet statistics let
+    pyarrow skip row groups outside it.
+    """
+    spec = ARCHIVED_TABLES[table]
+    years = [
+        year for year in archived_years(school_id, table)
+        if (start is None or academic_year(start) <= year) and (end is None or year <= academic_year(end))
+    ]
+    if not years:
+        return []
+
+    _, pq = _pyarrow()
+    filters = [(name, '==', value) for name, value in equals.items()]
+    if start is not None:
+        filters.append((spec.date_column.name, '>=', spec.bound(start)))
+    if end is not None:
+        filters.append((spec.date_column.name, '<', spec.bound(end + timedelta(days=1))))
+    rows = []
+    for year in years:
+        rows += pq.read_table(archive_path(school_id, table, year), filters=filters or None).to_pylist()
+    return rows
+
+
+# ========================
+# CLI
+# ========================
+
+async def run(school_id: Optional[str], through_year: Optional[int]):
+    if school_id:
+        school_ids = [school_id]
+    else:
+        async with AsyncSessionLocal() as session:
+            school_ids = list(await session.scalars(select(School.id)))
+    for school_id in school_ids:
+        for archived in await archive_school(school_id, through_year):
+            logger.info("%s", archived)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--school", help="school id")
+    target.add_argument("--all-schools", action="store_true")
+    parser.add_argument("--year", type=int, help="archive closed academic years up to this one (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the school's archived years and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.list:
+        if not args.school:
+            parser.error("--list needs --school")
+        for archived in list_archives(args.school):
+            print(archived)
+        return 0
+
+    asyncio.run(run(args.school, args.year))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
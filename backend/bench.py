@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""Load benchmarks for the School Administration API.
+
+Run from the backend directory against a running server, e.g.
+
+    python bench.py hashing --base-url http://localhost:8001
+
+Benchmarks that need large datasets seed them directly through DATABASE_URL,
+so they must run against the same database as the server.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, samples_ms):
+    print(f"{name}: n={len(samples_ms)} "
+          f"p50={percentile(samples_ms, 50):.1f}ms "
+          f"p99={percentile(samples_ms, 99):.1f}ms "
+          f"max={max(samples_ms):.1f}ms "
+          f"mean={statistics.mean(samples_ms):.1f}ms")
+
+
+def run_sql(statements):
+    """Execute seeding statements (text, params) in one transaction"""
+    from sqlalchemy import text
+    from database import engine
+
+    async def execute():
+        async with engine.begin() as conn:
+            for statement, params in statements:
+                await conn.execute(text(statement), params)
+        await engine.dispose()
+
+    asyncio.run(execute())
+
+
+def vacuum(*tables):
+    """VACUUM ANALYZE seeded tables, so new rows are in the indexes (not a GIN pending list) and planned with fresh statistics"""
+    from sqlalchemy import text
+    from database import engine
+
+    async def execute():
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for table in tables:
+                await conn.execute(text(f"VACUUM ANALYZE {table}"))
+        await engine.dispose()
+
+    asyncio.run(execute())
+
+
+def seed_students(school_id: str, count: int, classes: int = 12):
+    run_sql([("""
+        INSERT INTO students (id, school_id, class_name, admission_number, name, father_name,
+                              parent_contact, parent_phone_e164, date_of_admission, is_active, created_at)
+        SELECT gen_random_uuid()::text, :school_id, 'Class ' || (1 + n % :classes), 'BENCH-' || n,
+               'Student ' || n, 'Parent ' || n, '98' || lpad(n::text, 8, '0'), '+9198' || lpad(n::text, 8, '0'),
+               current_date - (n % 720), true, now()
+        FROM generate_series(1, :count) AS n
+    """, {"school_id": school_id, "count": count, "classes": classes})])
+
+
+def seed_attendance(school_id: str, days: int, offset: int = 0):
+    """One attendance row per active student per day, for ``days`` days ending ``offset`` days ago"""
+    run_sql([("""
+        SELECT ensure_attendance_partitions(current_date - CAST(:offset AS integer) - CAST(:days AS integer), current_date)
+    """, {"days": days, "offset": offset}), ("""
+        INSERT INTO attendance (id, student_id, date, status, marked_by, created_at)
+        SELECT gen_random_uuid()::text, s.id, current_date - CAST(:offset AS integer) - d,
+               CASE WHEN random() < 0.9 THEN 'present' ELSE 'absent' END, NULL, now()
+        FROM students s CROSS JOIN generate_series(0, :days - 1) AS d
+        WHERE s.school_id = :school_id
+        ON CONFLICT (student_id, date) DO NOTHING
+    """, {"school_id": school_id, "days": days, "offset": offset})])
+
+
+def timed_get(url: str, headers: dict, count: int):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = requests.get(url, headers=headers, timeout=60)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def register_school(base_url: str) -> dict:
+    """Register a throwaway school and return its credentials and token"""
+    suffix = datetime.now().strftime('%H%M%S%f')
+    credentials = {"email": f"bench{suffix}@benchschool.com", "password": "BenchPass123!"}
+    response = requests.post(f"{base_url}/api/auth/register-school", json={
+        "school_name": f"Bench School {suffix}",
+        "user_name": "Bench Principal",
+        "user_email": credentials["email"],
+        "user_password": credentials["password"],
+    }, timeout=30)
+    response.raise_for_status()
+    body = response.json()
+    return {**credentials, "token": body["access_token"], "school_id": body["school"]["id"]}
+
+
+def sample_latency(url: str, stop: threading.Event, headers: dict = None):
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(url, headers=headers, timeout=30)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_hashing(args):
+    """p99 latency of /api/health while concurrent logins run bcrypt"""
+    account = register_school(args.base_url)
+    login_body = {"email": account["email"], "password": account["password"]}
+
+    baseline_stop = threading.Event()
+    timer = threading.Timer(args.baseline_seconds, baseline_stop.set)
+    timer.start()
+    report("health (idle)", sample_latency(f"{args.base_url}/api/health", baseline_stop))
+
+    stop = threading.Event()
+    statuses = []
+
+    def login():
+        response = requests.post(f"{args.base_url}/api/auth/login", json=login_body, timeout=60)
+        statuses.append(response.status_code)
+
+    with ThreadPoolExecutor(max_workers=1) as sampler:
+        health = sampler.submit(sample_latency, f"{args.base_url}/api/health", stop)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for _ in range(args.logins):
+                pool.submit(login)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        report(f"health (during {args.concurrency} concurrent logins)", health.result())
+
+    rejected = sum(1 for s in statuses if s == 503)
+    print(f"logins: {len(statuses)} in {elapsed:.2f}s, {rejected} rejected as overloaded")
+
+
+def bench_dashboard(args):
+    """/api/dashboard/stats latency over a large school"""
+    account = register_school(args.base_url)
+    print(f"seeding {args.students} students and {args.students * args.days} attendance rows...")
+    seed_students(account["school_id"], args.students)
+    seed_attendance(account["school_id"], args.days)
+
+    headers = {"Authorization": f"Bearer {account['token']}"}
+    url = f"{args.base_url}/api/dashboard/stats"
+    report("dashboard (first request)", timed_get(url, headers, 1))
+    report("dashboard (repeated, cached unless DASHBOARD_CACHE_TTL=0)", timed_get(url, headers, args.requests))
+
+
+def bench_search(args):
+    """/api/search latency over a school with many students"""
+    account = register_school(args.base_url)
+    print(f"seeding {args.students} students...")
+    seed_students(account["school_id"], args.students)
+    vacuum("students")
+
+    headers = {"Authorization": f"Bearer {account['token']}"}
+    for term in args.terms:
+        url = f"{args.base_url}/api/search?q={term}"
+        timed_get(url, headers, 1)  # warm up
+        report(f"search q={term!r}", timed_get(url, headers, args.requests))
+
+
+def bench_outbox(args):
+    """Drain throughput of one broadcast through the notification outbox"""
+    account = register_school(args.base_url)
+    print(f"seeding {args.students} students...")
+    seed_students(account["school_id"], args.students)
+
+    headers = {"Authorization": f"Bearer {account['token']}"}
+    response = requests.post(f"{args.base_url}/api/notifications", headers=headers, json={
+        "title": "Bench broadcast",
+        "message": "School will remain closed tomorrow.",
+    }, timeout=60)
+    response.raise_for_status()
+    notification = response.json()
+    print(f"queued {notification['queued_count']} deliveries; waiting for outbox workers...")
+
+    url = f"{args.base_url}/api/notifications/{notification['id']}/deliveries"
+    start = time.perf_counter()
+    while True:
+        status = requests.get(url, headers=headers, timeout=30).json()
+        elapsed = time.perf_counter() - start
+        if status["pending"] + status["sending"] == 0 or elapsed > args.timeout:
+            break
+        time.sleep(1)
+    print(f"outbox: sent={status['sent']} failed={status['failed']} "
+          f"remaining={status['pending'] + status['sending']} in {elapsed:.1f}s "
+          f"({status['sent'] / elapsed:.1f} msg/s)")
+
+
+def bench_db_profiles(args):
+    """Query throughput of the direct and pgbouncer connection profiles"""
+    from sqlalchemy import and_, select
+    from database import ASYNC_DATABASE_URL, make_engine
+    from models import Student
+
+    account = register_school(args.base_url)
+    print(f"seeding {args.students} students...")
+    seed_students(account["school_id"], args.students)
+    vacuum("students")
+
+    # The query behind /api/students?class_name=, with the class changing per call
+    def students_query(n):
+        return select(Student).where(
+            and_(Student.school_id == account["school_id"], Student.is_active == True, Student.class_name == f"Class {1 + n % 12}")
+        ).order_by(Student.name, Student.id).limit(100)
+
+    async def run(url, profile):
+        engine = make_engine(url, profile, pool_size=args.concurrency, max_overflow=0)
+        samples = []
+
+        async def worker(offset):
+            async with engine.connect() as conn:
+                for n in range(offset, offset + args.queries):
+                    start = time.perf_counter()
+                    await conn.execute(students_query(n))
+                    samples.append((time.perf_counter() - start) * 1000)
+
+        await worker(0)  # connect and warm up the caches
+        samples.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(i * args.queries) for i in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+        await engine.dispose()
+        report(f"{profile} ({len(samples) / elapsed:.0f} queries/s)", samples)
+
+    urls = {"direct": args.direct_url or ASYNC_DATABASE_URL, "pgbouncer": args.pgbouncer_url or ASYNC_DATABASE_URL}
+    for profile in args.profiles:
+        asyncio.run(run(urls[profile], profile))
+
+
+def bench_middleware(args):
+    """Per-request overhead of the metrics middleware, measured in-process"""
+    from types import SimpleNamespace
+    from metrics import MetricsMiddleware
+
+    route = SimpleNamespace(path="/api/students/{student_id}")
+
+    async def app(scope, receive, send):
+        scope["route"] = route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def measure(asgi):
+        scope = {"type": "http", "method": "GET", "path": "/api/students/1"}
+        for _ in range(1000):  # warm up
+            await asgi(dict(scope), receive, send)
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            await asgi(dict(scope), receive, send)
+        return (time.perf_counter() - start) / args.requests * 1e6
+
+    bare = asyncio.run(measure(app))
+    wrapped = asyncio.run(measure(MetricsMiddleware(app)))
+    print(f"bare app: {bare:.2f}us/request, with MetricsMiddleware: {wrapped:.2f}us/request, "
+          f"overhead: {wrapped - bare:.2f}us/request")
+
+
+def bench_attendance(args):
+    """Attendance read latency as history grows, to check partition pruning"""
+    account = register_school(args.base_url)
+    headers = {"Authorization": f"Bearer {account['token']}"}
+    print(f"seeding {args.students} students...")
+    seed_students(account["school_id"], args.students)
+
+    # Any student of the seeded school, for the per-student history
+    students = requests.get(f"{args.base_url}/api/students", headers=headers,
+                            params={"limit": 1, "class_name": "Class 1"}, timeout=60).json()
+    urls = {
+        "class register (today)": f"{args.base_url}/api/attendance?class_name=Class+1&date={datetime.now().date()}",
+        "student history (60 days)": f"{args.base_url}/api/students/{students[0]['id']}/attendance",
+        "dashboard": f"{args.base_url}/api/dashboard/stats",
+    }
+
+    seeded_days = 0
+    for _ in range(args.steps):
+        seed_attendance(account["school_id"], args.days_per_step, offset=seeded_days)
+        seeded_days += args.days_per_step
+        print(f"--- {args.students * seeded_days:,} attendance rows ({seeded_days} days)")
+        for name, url in urls.items():
+            timed_get(url, headers, 1)  # warm up
+            report(name, timed_get(url, headers, args.requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    hashing = subparsers.add_parser("hashing", help=bench_hashing.__doc__)
+    hashing.add_argument("--concurrency", type=int, default=50)
+    hashing.add_argument("--logins", type=int, default=200)
+    hashing.add_argument("--baseline-seconds", type=float, default=3.0)
+    hashing.set_defaults(func=bench_hashing)
+
+    dashboard = subparsers.add_parser("dashboard", help=bench_dashboard.__doc__)
+    dashboard.add_argument("--students", type=int, default=5000)
+    dashboard.add_argument("--days", type=int, default=200)
+    dashboard.add_argument("--requests", type=int, default=200)
+    dashboard.set_defaults(func=bench_dashboard)
+
+    search = subparsers.add_parser("search", help=bench_search.__doc__)
+    search.add_argument("--students", type=int, default=100000)
+    search.add_argument("--requests", type=int, default=100)
+    search.add_argument("--terms", nargs="+", default=["Student 4242", "BENCH-9999", "Parnet 17", "Studemt 4242", "9800001"])
+    search.set_defaults(func=bench_search)
+
+    outbox = subparsers.add_parser("outbox", help=bench_outbox.__doc__)
+    outbox.add_argument("--students", type=int, default=3000)
+    outbox.add_argument("--timeout", type=float, default=1800.0)
+    outbox.set_defaults(func=bench_outbox)
+
+    db_profiles = subparsers.add_parser("db-profiles", help=bench_db_profiles.__doc__)
+    db_profiles.add_argument("--direct-url", help="postgresql+asyncpg:// URL of Postgres (default DATABASE_URL)")
+    db_profiles.add_argument("--pgbouncer-url", help="postgresql+asyncpg:// URL of PgBouncer (default DATABASE_URL)")
+    db_profiles.add_argument("--profiles", nargs="+", choices=["direct", "pgbouncer"], default=["direct", "pgbouncer"])
+    db_profiles.add_argument("--students", type=int, default=5000)
+    db_profiles.add_argument("--concurrency", type=int, default=10)
+    db_profiles.add_argument("--queries", type=int, default=2000, help="queries per connection")
+    db_profiles.set_defaults(func=bench_db_profiles)
+
+    middleware = subparsers.add_parser("middleware", help=bench_middleware.__doc__)
+    middleware.add_argument("--requests", type=int, default=200000)
+    middleware.set_defaults(func=bench_middleware)
+
+    attendance = subparsers.add_parser("attendance", help=bench_attendance.__doc__)
+    attendance.add_argument("--students", type=int, default=20000)
+    attendance.add_argument("--days-per-step", type=int, default=100)
+    attendance.add_argument("--steps", type=int, default=5, help="history grows by days-per-step each step")
+    attendance.add_argument("--requests", type=int, default=50)
+    attendance.set_defaults(func=bench_attendance)
+
+    args = parser.parse_args()
+    args.base_url = args.base_url.rstrip('/')
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
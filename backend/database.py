@@ -1,28 +1,86 @@
 import os
+import time
+import uuid
 from pathlib import Path
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
+from fastapi import Request, Response
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
+from metrics import TimedAsyncQueuePool
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 ASYNC_DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://')
 
-engine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    pool_size=10,
-    max_overflow=5,
-    pool_timeout=30,
-    pool_recycle=1800,
-    pool_pre_ping=False,
-    echo=False,
-    connect_args={
-        "statement_cache_size": 0,
-        "command_timeout": 30,
+# Optional streaming replica for GET requests
+DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+
+# After a write the client is told to read from the primary until this time
+# (epoch seconds) and echoes it back, so it sees its own writes despite lag
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes-Until"
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+# Which database served the request: primary or replica
+DB_ROUTE_HEADER = "X-DB-Route"
+
+# Connection profiles:
+#   direct    - straight to Postgres; prepared statements are cached per connection
+#   pgbouncer - through a transaction-pooling PgBouncer (e.g. the Supabase pooler on
+#               port 6543), where a prepared statement may land on another backend,
+#               so statement caching is off
+CONNECTION_PROFILES = ('direct', 'pgbouncer')
+
+
+def default_profile(url: str) -> str:
+    return 'pgbouncer' if urlsplit(url).port == 6543 else 'direct'
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def make_engine(url: str = ASYNC_DATABASE_URL, profile: str = None, name: str = "primary", **overrides):
+    """Async engine for ``url`` using a connection profile and the DB_* settings
+
+    ``name`` labels the pool in the metrics.
+    """
+    profile = profile or os.environ.get('DB_CONNECTION_PROFILE') or default_profile(url)
+    if profile not in CONNECTION_PROFILES:
+        raise ValueError(f"Unknown DB_CONNECTION_PROFILE {profile!r}, expected one of {CONNECTION_PROFILES}")
+
+    connect_args = {"command_timeout": float(os.environ.get('DB_COMMAND_TIMEOUT', 30))}
+    if profile == 'direct':
+        cache_size = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 500))
+        # asyncpg's own cache, and the dialect's cache of prepared statement handles
+        connect_args["statement_cache_size"] = cache_size
+        prepared_cache_size = cache_size
+    else:
+        connect_args["statement_cache_size"] = 0
+        # Unique names so statements from different clients never collide on a shared backend
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        prepared_cache_size = 0
+
+    options = {
+        "pool_size": int(os.environ.get('DB_POOL_SIZE', 10)),
+        "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        "pool_timeout": float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        "pool_recycle": int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        "pool_pre_ping": _env_bool('DB_POOL_PRE_PING', False),
+        "echo": False,
+        "poolclass": TimedAsyncQueuePool,
+        "pool_logging_name": name,
+        "connect_args": connect_args,
     }
-)
+    options.update(overrides)
+    separator = '&' if '?' in url else '?'
+    return create_async_engine(f"{url}{separator}prepared_statement_cache_size={prepared_cache_size}", **options)
+
+
+engine = make_engine()
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -32,10 +90,43 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+# Falls back to the primary when no replica is configured
+if DATABASE_READ_URL:
+    read_engine = make_engine(DATABASE_READ_URL.replace('postgresql://', 'postgresql+asyncpg://'), name="replica")
+else:
+    read_engine = engine
+
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+)
+
 Base = declarative_base()
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+SAFE_METHODS = ("GET", "HEAD")
+
+def use_replica(request: Request) -> bool:
+    """GET requests go to the replica unless the client recently wrote"""
+    if read_engine is engine or request.method not in SAFE_METHODS:
+        return False
+    try:
+        read_primary_until = float(request.headers.get(READ_YOUR_WRITES_HEADER, 0))
+    except ValueError:
+        read_primary_until = 0
+    now = time.time()
+    # get_db never issues a time more than one window ahead. A later one was
+    # not ours, and honouring it would pin the client to the primary.
+    return read_primary_until < now or read_primary_until > now + READ_YOUR_WRITES_SECONDS + 1
+
+async def get_db(request: Request, response: Response):
+    replica = use_replica(request)
+    if request.method not in SAFE_METHODS:
+        response.headers[READ_YOUR_WRITES_HEADER] = str(int(time.time() + READ_YOUR_WRITES_SECONDS) + 1)
+    response.headers[DB_ROUTE_HEADER] = "replica" if replica else "primary"
+    async with (ReadSessionLocal if replica else AsyncSessionLocal)() as session:
         try:
             yield session
         finally:
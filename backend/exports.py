@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+
+from fastapi.responses import StreamingResponse
+
+from database import ReadSessionLocal
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 2000))
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+async def _stream_rows(query, fmt: str):
+    # The request's session is closed before a streaming body is sent, so the
+    # export holds its own session (on the replica, if any) for as long as the
+    # client keeps reading.
+    async with ReadSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if fmt == "csv":
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        async for partition in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            for row in partition:
+                values = [_plain(v) for v in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+
+def stream_export(query, fmt: str, name: str) -> StreamingResponse:
+    """Stream the rows of ``query`` as CSV or NDJSON through a server-side cursor"""
+    return StreamingResponse(
+        _stream_rows(query, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    )
@@ -0,0 +1,186 @@
+"""Per-request SQL statistics.
+
+Engine events count the statements run on behalf of the current request and
+time them. The request's stats live in a context variable: SQLAlchemy runs the
+sync engine events in a greenlet that shares the caller's context, so events
+fired from an ``await db.execute(...)`` see the stats of the request awaiting it.
+
+Settings:
+    SQL_DEBUG_HEADERS  add X-DB-Queries, X-DB-Time-Ms and X-DB-Slowest-Ms to responses
+    SQL_LOG_REQUESTS   log one JSON line with the stats of every request
+    SQL_SLOW_QUERY_MS  log statements slower than this (default 500)
+    SQL_TEST_MODE      fail requests whose query count grows with the number of
+                       items returned (N+1 queries) with a 500
+"""
+
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+def _env_bool(name: str) -> bool:
+    return os.environ.get(name, 'false').lower() in ('1', 'true', 'yes')
+
+
+SQL_DEBUG_HEADERS = _env_bool('SQL_DEBUG_HEADERS')
+SQL_LOG_REQUESTS = _env_bool('SQL_LOG_REQUESTS')
+SQL_TEST_MODE = _env_bool('SQL_TEST_MODE')
+SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 500))
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def headers(self) -> list:
+        return [
+            (b"x-db-queries", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.total_ms:.1f}".encode()),
+            (b"x-db-slowest-ms", f"{self.slowest_ms:.1f}".encode()),
+        ]
+
+
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _request_stats.get()
+
+
+def instrument_engine(engine):
+    """Attach the timing hooks to an async engine"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed_ms)
+        if elapsed_ms > SQL_SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
+
+@dataclass
+class RouteProfile:
+    """Query counts seen for a route, by number of items returned"""
+    samples: Dict[int, int] = field(default_factory=dict)
+
+    def check(self, items: int, queries: int) -> Optional[Tuple[int, int]]:
+        """An earlier (items, queries) sample that shows queries growing with items, if any
+
+        Growth counts when at least one extra query was issued per extra item,
+        over at least three extra items. One-off queries, such as an identity
+        cache miss once its TTL expires, add a fixed one or two and never do.
+        """
+        self.samples.setdefault(items, queries)
+        for seen_items, seen_queries in self.samples.items():
+            extra_items = items - seen_items
+            if seen_items > 0 and extra_items >= 3 and queries - seen_queries >= extra_items:
+                return seen_items, seen_queries
+        return None
+
+
+route_profiles: Dict[str, RouteProfile] = {}
+
+
+def _item_count(body: bytes) -> Optional[int]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return len(data) if isinstance(data, list) else None
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware collecting the SQL statistics of each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        buffered = []
+
+        async def send_with_stats(message):
+            if SQL_TEST_MODE:
+                # Hold the response until its query count has been checked
+                buffered.append(message)
+                return
+            if message["type"] == "http.response.start" and SQL_DEBUG_HEADERS:
+                message["headers"] = list(message.get("headers", [])) + stats.headers()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_stats.reset(token)
+
+        route = scope.get("route")
+        path = getattr(route, "path", scope["path"])
+        if SQL_LOG_REQUESTS:
+            logger.info(json.dumps({
+                "method": scope["method"],
+                "route": path,
+                "queries": stats.count,
+                "db_ms": round(stats.total_ms, 1),
+                "slowest_ms": round(stats.slowest_ms, 1),
+                "slowest_statement": stats.slowest_statement,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            }))
+
+        if SQL_TEST_MODE:
+            await self._send_checked(scope["method"], path, stats, buffered, send)
+
+    async def _send_checked(self, method, path, stats, messages, send):
+        start = next(m for m in messages if m["type"] == "http.response.start")
+        body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+        items = _item_count(body) if start["status"] == 200 else None
+
+        if items:
+            profile = route_profiles.setdefault(f"{method} {path}", RouteProfile())
+            earlier = profile.check(items, stats.count)
+            if earlier is not None:
+                detail = (f"N+1 queries on {method} {path}: {stats.count} queries for {items} items, "
+                          f"{earlier[1]} for {earlier[0]}")
+                logger.error(detail)
+                body = json.dumps({"detail": detail}).encode()
+                await send({"type": "http.response.start", "status": 500, "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *stats.headers(),
+                ]})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+        headers += [(b"content-length", str(len(body)).encode()), *stats.headers()]
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
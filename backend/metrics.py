@@ -0,0 +1,154 @@
+"""Request latency and connection pool metrics in the Prometheus text format.
+
+Latencies are kept per route template (``/api/students/{student_id}``, not the
+raw path) so the number of series stays bounded. Every worker process keeps
+its own counters; scrape each worker or aggregate them in Prometheus.
+"""
+
+import logging
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+# (method, route template, status) -> latency histogram
+request_latency: Dict[Tuple[str, str, int], Histogram] = {}
+requests_in_flight = 0
+
+# pool name -> histogram of the time spent waiting for a connection
+pool_wait: Dict[str, Histogram] = {}
+
+# pool name -> engine, for the pool gauges
+engines: Dict[str, object] = {}
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool recording how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            name = self._orig_logging_name or "default"
+            histogram = pool_wait.get(name)
+            if histogram is None:
+                histogram = pool_wait[name] = Histogram(POOL_WAIT_BUCKETS)
+            histogram.observe(time.perf_counter() - start)
+
+
+# SQLAlchemy names pool loggers after the pool class, which puts this one
+# outside the "sqlalchemy" logger and its default WARNING level
+logging.getLogger(f"{__name__}.{TimedAsyncQueuePool.__name__}").setLevel(logging.WARNING)
+
+
+def register_engine(name: str, engine):
+    engines[name] = engine
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request by route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global requests_in_flight
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight -= 1
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched", status)
+            histogram = request_latency.get(key)
+            if histogram is None:
+                histogram = request_latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(time.perf_counter() - start)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics() -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route template and status.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), histogram in sorted(request_latency.items()):
+        labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+        lines += histogram.render("http_request_duration_seconds", labels)
+
+    lines += [
+        "# HELP http_requests_in_flight Requests being handled.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {requests_in_flight}",
+    ]
+
+    gauges = {
+        "db_pool_size": ("Configured pool size.", lambda pool: pool.size()),
+        "db_pool_checked_out": ("Connections in use.", lambda pool: pool.checkedout()),
+        "db_pool_checked_in": ("Idle connections in the pool.", lambda pool: pool.checkedin()),
+        "db_pool_overflow": ("Connections above pool_size (negative while the pool is not full).", lambda pool: pool.overflow()),
+    }
+    for metric, (help_text, read) in gauges.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for name, engine in engines.items():
+            lines.append(f'{metric}{{pool="{name}"}} {read(engine.pool)}')
+
+    lines += [
+        "# HELP db_pool_wait_seconds Time spent waiting to check out a connection.",
+        "# TYPE db_pool_wait_seconds histogram",
+    ]
+    for name, histogram in sorted(pool_wait.items()):
+        lines += histogram.render("db_pool_wait_seconds", f'pool="{name}"')
+
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,9 @@
+import os
+import re
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer, Boolean, Float, Date, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer, Boolean, Float, Date, Index, text
+from sqlalchemy.orm import relationship, validates
 from database import Base
 
 def generate_uuid():
@@ -10,6 +12,22 @@ def generate_uuid():
 def utc_now():
     return datetime.now(timezone.utc)
 
+# Country code assumed for phone numbers entered without one
+DEFAULT_COUNTRY_CODE = os.environ.get('DEFAULT_COUNTRY_CODE', '+91')
+
+def normalize_phone(phone: str) -> str:
+    """Normalize a phone number as typed by the front desk to E.164"""
+    digits = re.sub(r'[^0-9+]', '', phone)
+    if digits.startswith('+'):
+        return '+' + digits[1:].replace('+', '')
+    digits = digits.replace('+', '')
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    return DEFAULT_COUNTRY_CODE + digits.lstrip('0')
+
+# Columns the front desk searches students by (trigram indexed)
+STUDENT_SEARCH_COLUMNS = ('name', 'admission_number', 'father_name', 'mother_name', 'parent_contact')
+
 class School(Base):
     __tablename__ = 'schools'
     
@@ -36,14 +54,31 @@ class User(Base):
     role = Column(String(20), nullable=False, default='teacher')  # principal, teacher
     phone = Column(String(20))
     address = Column(Text)
-    assigned_classes = Column(Text)  # Comma-separated class names for teachers
+    assigned_classes = Column(Text)  # Comma-separated copy of class_assignments, for responses
     created_at = Column(DateTime(timezone=True), default=utc_now)
     
     school = relationship('School', back_populates='users')
     salary_payments = relationship('TeacherSalary', back_populates='teacher', cascade='all, delete-orphan', foreign_keys='TeacherSalary.teacher_id')
+    class_assignments = relationship('TeacherClass', back_populates='user', cascade='all, delete-orphan')
     
     __table_args__ = (
         Index('idx_user_school_email', 'school_id', 'email', unique=True),
+        Index('idx_user_search_trgm', 'name', 'email', postgresql_using='gin',
+              postgresql_ops={'name': 'gin_trgm_ops', 'email': 'gin_trgm_ops'}),
+    )
+
+class TeacherClass(Base):
+    __tablename__ = 'teacher_classes'
+    
+    # The primary key also serves lookups by user_id
+    user_id = Column(String(36), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    class_name = Column(String(50), primary_key=True)
+    school_id = Column(String(36), ForeignKey('schools.id', ondelete='CASCADE'), nullable=False)
+    
+    user = relationship('User', back_populates='class_assignments')
+    
+    __table_args__ = (
+        Index('idx_teacher_class_school_class', 'school_id', 'class_name'),
     )
 
 class Student(Base):
@@ -60,6 +95,7 @@ class Student(Base):
     gender = Column(String(10))
     address = Column(Text)
     parent_contact = Column(String(20), nullable=False)
+    parent_phone_e164 = Column(String(24))  # normalized parent_contact, kept in sync below
     parent_email = Column(String(255))
     date_of_admission = Column(Date, nullable=False)
     is_active = Column(Boolean, default=True)
@@ -71,22 +107,40 @@ class Student(Base):
     
     __table_args__ = (
         Index('idx_student_school_admission', 'school_id', 'admission_number', unique=True),
+        Index('idx_student_search_trgm', *STUDENT_SEARCH_COLUMNS, postgresql_using='gin',
+              postgresql_ops={c: 'gin_trgm_ops' for c in STUDENT_SEARCH_COLUMNS}),
+        Index('idx_student_school_phone', 'school_id', 'parent_phone_e164'),
+        Index('idx_student_active_school_class_name', 'school_id', 'class_name', 'name', 'id',
+              postgresql_where=text('is_active'), postgresql_include=['date_of_admission']),
     )
+    
+    @validates('parent_contact')
+    def _sync_parent_phone(self, key, value):
+        self.parent_phone_e164 = normalize_phone(value) if value else None
+        return value
 
 class FeeBill(Base):
     __tablename__ = 'fee_bills'
     
     id = Column(String(36), primary_key=True, default=generate_uuid)
-    school_id = Column(String(36), ForeignKey('schools.id', ondelete='CASCADE'), nullable=False, index=True)
+    school_id = Column(String(36), ForeignKey('schools.id', ondelete='CASCADE'), nullable=False)
     name = Column(String(255), nullable=False)  # Monthly Fee, Registration Fee, etc.
     amount = Column(Float, nullable=False)
     description = Column(Text)
     target_class = Column(String(50))  # null means all classes
     due_date = Column(Date)
     created_at = Column(DateTime(timezone=True), default=utc_now)
+    # Paid fees moved to the archive; an archived bill cannot be applied again
+    archived_at = Column(DateTime(timezone=True))
+    archived_count = Column(Integer, nullable=False, default=0, server_default='0')
+    archived_amount = Column(Float, nullable=False, default=0, server_default='0')
     
     school = relationship('School', back_populates='fee_bills')
     student_fees = relationship('StudentFee', back_populates='fee_bill', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        Index('idx_fee_bill_school_created', 'school_id', 'created_at', 'id'),
+    )
 
 class StudentFee(Base):
     __tablename__ = 'student_fees'
@@ -106,6 +160,7 @@ class StudentFee(Base):
     
     __table_args__ = (
         Index('idx_student_fee_unique', 'student_id', 'fee_bill_id', unique=True),
+        Index('idx_student_fee_unpaid_student', 'student_id', postgresql_where=text("status = 'unpaid'")),
     )
 
 class Attendance(Base):
@@ -113,7 +168,7 @@ class Attendance(Base):
     
     id = Column(String(36), primary_key=True, default=generate_uuid)
     student_id = Column(String(36), ForeignKey('students.id', ondelete='CASCADE'), nullable=False, index=True)
-    date = Column(Date, nullable=False, index=True)
+    date = Column(Date, primary_key=True, index=True)  # partition key, see partitions.py
     status = Column(String(10), nullable=False)  # present, absent
     marked_by = Column(String(36))  # user_id
     created_at = Column(DateTime(timezone=True), default=utc_now)
@@ -122,13 +177,14 @@ class Attendance(Base):
     
     __table_args__ = (
         Index('idx_attendance_student_date', 'student_id', 'date', unique=True),
+        {'postgresql_partition_by': 'RANGE (date)'},
     )
 
 class Notification(Base):
     __tablename__ = 'notifications'
     
     id = Column(String(36), primary_key=True, default=generate_uuid)
-    school_id = Column(String(36), ForeignKey('schools.id', ondelete='CASCADE'), nullable=False, index=True)
+    school_id = Column(String(36), ForeignKey('schools.id', ondelete='CASCADE'), nullable=False)
     title = Column(String(255), nullable=False)
     message = Column(Text, nullable=False)
     target_class = Column(String(50))  # null means all classes
@@ -136,6 +192,34 @@ class Notification(Base):
     created_at = Column(DateTime(timezone=True), default=utc_now)
     
     school = relationship('School', back_populates='notifications')
+    
+    __table_args__ = (
+        Index('idx_notification_title_trgm', 'title', postgresql_using='gin',
+              postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('idx_notification_school_created', 'school_id', 'created_at', 'id'),
+    )
+
+class NotificationDelivery(Base):
+    """Outbox row: one message to one parent phone, drained by outbox.py"""
+    __tablename__ = 'notification_deliveries'
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    notification_id = Column(String(36), ForeignKey('notifications.id', ondelete='CASCADE'), nullable=False)
+    school_id = Column(String(36), ForeignKey('schools.id', ondelete='CASCADE'), nullable=False)
+    phone = Column(String(24), nullable=False)  # E.164
+    student_names = Column(Text)
+    status = Column(String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+    last_error = Column(Text)
+    sent_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    
+    __table_args__ = (
+        Index('idx_delivery_notification_phone', 'notification_id', 'phone', unique=True),
+        Index('idx_delivery_due', 'next_attempt_at',
+              postgresql_where=text("status IN ('pending', 'sending')")),
+    )
 
 class TeacherSalary(Base):
     __tablename__ = 'teacher_salaries'
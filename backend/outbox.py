@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""Notification delivery outbox.
+
+Creating a notification inserts one ``notification_deliveries`` row per
+parent phone in the same transaction. A pool of asyncio workers claims due
+rows in batches (``FOR UPDATE SKIP LOCKED``), hands them to the configured
+sender under a per-school rate limit, and records the outcome. Failed sends
+are retried with exponential backoff until OUTBOX_MAX_ATTEMPTS.
+
+Run the pool as its own process so deliveries never compete with request
+handling:
+
+    python outbox.py --workers 4
+
+or set OUTBOX_WORKERS in the API process for small deployments.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, ROOT_DIR
+from models import Notification, NotificationDelivery, School, Student
+
+OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', 0))  # in the API process
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1.0))
+OUTBOX_LEASE_SECONDS = float(os.environ.get('OUTBOX_LEASE_SECONDS', 120))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_BASE_SECONDS = float(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', 30))
+OUTBOX_RETRY_MAX_SECONDS = float(os.environ.get('OUTBOX_RETRY_MAX_SECONDS', 3600))
+OUTBOX_SCHOOL_RATE = float(os.environ.get('OUTBOX_SCHOOL_RATE', 5))  # messages per second
+OUTBOX_SCHOOL_BURST = int(os.environ.get('OUTBOX_SCHOOL_BURST', 20))
+
+NOTIFICATION_SENDER = os.environ.get('NOTIFICATION_SENDER', 'file')
+
+logger = logging.getLogger(__name__)
+
+
+def format_notification(title: str, message: str, signature: str) -> str:
+    """Text of a notification as parents receive it"""
+    return f"*{title}*\n\n{message}\n\n- {signature}"
+
+
+async def enqueue_notification(db: AsyncSession, notification: Notification) -> int:
+    """Add one pending delivery per parent phone; commit with the notification"""
+    query = select(
+        func.gen_random_uuid().cast(NotificationDelivery.id.type),
+        literal(notification.id, NotificationDelivery.notification_id.type),
+        Student.school_id,
+        Student.parent_phone_e164,
+        func.string_agg(Student.name, aggregate_order_by(literal(', '), Student.name)),
+        literal('pending'),
+        literal(0),
+        func.now(),
+        func.now()
+    ).where(
+        and_(Student.school_id == notification.school_id, Student.is_active == True, Student.parent_phone_e164.is_not(None))
+    ).group_by(Student.school_id, Student.parent_phone_e164)
+    if notification.target_class:
+        query = query.where(Student.class_name == notification.target_class)
+
+    result = await db.execute(
+        pg_insert(NotificationDelivery).from_select(
+            ["id", "notification_id", "school_id", "phone", "student_names",
+             "status", "attempts", "next_attempt_at", "created_at"],
+            query
+        ).on_conflict_do_nothing(index_elements=["notification_id", "phone"])
+    )
+    return result.rowcount
+
+
+# ========================
+# Senders
+# ========================
+
+@dataclass
+class Message:
+    delivery_id: str
+    school_id: str
+    phone: str
+    text: str
+    attempt: int
+
+
+class DeliveryError(Exception):
+    """A message could not be delivered and should be retried"""
+
+
+class Sender:
+    """Delivers messages to parents.
+
+    Subclasses implement ``send``; providers with a bulk API can override
+    ``send_batch`` and raise ``batch_size``.
+    """
+
+    batch_size = 1
+
+    async def send(self, message: Message) -> None:
+        raise NotImplementedError
+
+    async def send_batch(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """Send ``messages``, returning None or the error for each one"""
+        outcomes = []
+        for message in messages:
+            try:
+                await self.send(message)
+                outcomes.append(None)
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    async def close(self) -> None:
+        pass
+
+
+class FileSender(Sender):
+    """Appends messages as JSON lines to a local file, for development and tests"""
+
+    batch_size = 100
+
+    def __init__(self):
+        self.path = Path(os.environ.get('OUTBOX_FILE_PATH', ROOT_DIR / 'outbox.jsonl'))
+        self.failure_rate = float(os.environ.get('OUTBOX_FILE_FAILURE_RATE', 0))
+
+    def _write(self, lines: List[str]):
+        with open(self.path, 'a') as f:
+            f.writelines(lines)
+
+    async def send_batch(self, messages: List[Message]) -> List[Optional[Exception]]:
+        outcomes = [
+            DeliveryError("simulated failure") if random.random() < self.failure_rate else None
+            for _ in messages
+        ]
+        lines = [
+            json.dumps({"delivery_id": m.delivery_id, "phone": m.phone, "text": m.text,
+                        "sent_at": datetime.now(timezone.utc).isoformat()}) + "\n"
+            for m, error in zip(messages, outcomes) if error is None
+        ]
+        await asyncio.to_thread(self._write, lines)
+        return outcomes
+
+
+SENDERS = {
+    "file": FileSender,
+}
+
+
+def get_sender(name: str = NOTIFICATION_SENDER) -> Sender:
+    """Sender registered as ``name``, or a ``module:Class`` path"""
+    if name in SENDERS:
+        return SENDERS[name]()
+    if ':' in name:
+        module, cls = name.split(':', 1)
+        return getattr(importlib.import_module(module), cls)()
+    raise ValueError(f"Unknown notification sender: {name}")
+
+
+# ========================
+# Worker Pool
+# ========================
+
+class TokenBucket:
+    """Allows ``rate`` messages per second with bursts of up to ``burst``"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, count: int = 1):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                await asyncio.sleep((count - self.tokens) / self.rate)
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter after the given failed attempt"""
+    delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxWorkerPool:
+    """Asyncio workers draining ``notification_deliveries``.
+
+    Rate limits are per process: with several outbox processes each school
+    may receive up to ``processes * OUTBOX_SCHOOL_RATE`` messages per second.
+    """
+
+    def __init__(self, workers: int, sender: Sender = None, batch_size: int = OUTBOX_BATCH_SIZE):
+        if OUTBOX_SCHOOL_RATE <= 0 or OUTBOX_SCHOOL_BURST < 1:
+            raise ValueError(
+                f"OUTBOX_SCHOOL_RATE must be positive and OUTBOX_SCHOOL_BURST at least 1, "
+                f"got {OUTBOX_SCHOOL_RATE} and {OUTBOX_SCHOOL_BURST}"
+            )
+        self.workers = workers
+        self.sender = sender or get_sender()
+        self.batch_size = batch_size
+        self.buckets: Dict[str, TokenBucket] = defaultdict(
+            lambda: TokenBucket(OUTBOX_SCHOOL_RATE, OUTBOX_SCHOOL_BURST)
+        )
+        self.counts = {"sent": 0, "retried": 0, "failed": 0}
+        self.started = time.monotonic()
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self.started = time.monotonic()
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        self._stop.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.sender.close()
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "workers": self.workers,
+            **self.counts,
+            "sent_per_second": round(self.counts["sent"] / elapsed, 2) if elapsed else 0.0,
+        }
+
+    async def _run(self, worker: int):
+        while not self._stop.is_set():
+            try:
+                claimed = await self.drain_batch()
+            except Exception:
+                logger.exception("Outbox worker %d failed", worker)
+                claimed = 0
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def claim(self) -> List[Message]:
+        """Lease a batch of due deliveries to this worker.
+
+        A claimed row is hidden for OUTBOX_LEASE_SECONDS, after which it is
+        claimed again, so deliveries held by a crashed worker are not lost.
+        Leases that expire after the last of OUTBOX_MAX_ATTEMPTS are marked
+        failed instead, so a message that crashes the sender is not retried
+        forever.
+        """
+        due = select(NotificationDelivery.id).where(and_(
+            or_(
+                NotificationDelivery.status == 'pending',
+                and_(NotificationDelivery.status == 'sending', NotificationDelivery.attempts < OUTBOX_MAX_ATTEMPTS)
+            ),
+            NotificationDelivery.next_attempt_at <= func.now()
+        )).order_by(NotificationDelivery.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True).cte("due")
+
+        async with AsyncSessionLocal() as session:
+            abandoned = await session.execute(
+                update(NotificationDelivery).where(and_(
+                    NotificationDelivery.status == 'sending',
+                    NotificationDelivery.attempts >= OUTBOX_MAX_ATTEMPTS,
+                    NotificationDelivery.next_attempt_at <= func.now()
+                )).values(status='failed', last_error='Lease expired on the last attempt')
+            )
+            self.counts["failed"] += abandoned.rowcount
+            result = await session.execute(
+                update(NotificationDelivery).where(and_(
+                    NotificationDelivery.id == due.c.id,
+                    Notification.id == NotificationDelivery.notification_id,
+                    School.id == NotificationDelivery.school_id
+                )).values(
+                    status='sending',
+                    attempts=NotificationDelivery.attempts + 1,
+                    next_attempt_at=func.now() + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+                ).returning(
+                    NotificationDelivery.id, NotificationDelivery.school_id, NotificationDelivery.phone,
+                    NotificationDelivery.attempts, Notification.title, Notification.message,
+                    School.name.label("school_name")
+                )
+            )
+            rows = result.all()
+            await session.commit()
+
+        return [
+            Message(row.id, row.school_id, row.phone, format_notification(row.title, row.message, row.school_name), row.attempts)
+            for row in rows
+        ]
+
+    async def drain_batch(self) -> int:
+        """Claim, send and record one batch, returning how many were claimed"""
+        messages = await self.claim()
+        if not messages:
+            return 0
+
+        by_school: Dict[str, List[Message]] = defaultdict(list)
+        for message in messages:
+            by_school[message.school_id].append(message)
+        outcomes = await asyncio.gather(*[self._send_school(batch) for batch in by_school.values()])
+
+        sent = [m.delivery_id for school in outcomes for m, error in school if error is None]
+        failures = [(m, error) for school in outcomes for m, error in school if error is not None]
+        await self.record(sent, failures)
+        return len(messages)
+
+    async def _send_school(self, messages: List[Message]):
+        bucket = self.buckets[messages[0].school_id]
+        chunk_size = max(1, min(self.sender.batch_size, bucket.burst))
+        outcomes = []
+        for i in range(0, len(messages), chunk_size):
+            chunk = messages[i:i + chunk_size]
+            await bucket.acquire(len(chunk))
+            try:
+                errors = await self.sender.send_batch(chunk)
+            except Exception as e:
+                errors = [e] * len(chunk)
+            outcomes.extend(zip(chunk, errors))
+        return outcomes
+
+    async def record(self, sent: List[str], failures: List[tuple]):
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as session:
+            if sent:
+                await session.execute(
+                    update(NotificationDelivery).where(NotificationDelivery.id.in_(sent)).values(
+                        status='sent', sent_at=now, last_error=None
+                    )
+                )
+            for message, error in failures:
+                if message.attempt >= OUTBOX_MAX_ATTEMPTS:
+                    values = {"status": 'failed'}
+                    self.counts["failed"] += 1
+                else:
+                    values = {"status": 'pending', "next_attempt_at": now + timedelta(seconds=retry_delay(message.attempt))}
+                    self.counts["retried"] += 1
+                await session.execute(
+                    update(NotificationDelivery).where(NotificationDelivery.id == message.delivery_id).values(
+                        last_error=str(error)[:1000] or type(error).__name__, **values
+                    )
+                )
+            await session.commit()
+        self.counts["sent"] += len(sent)
+
+
+async def run(workers: int, report_every: float):
+    pool = OutboxWorkerPool(workers)
+    pool.start()
+    logger.info("Outbox started with %d workers using the %s sender", workers, NOTIFICATION_SENDER)
+    try:
+        while True:
+            await asyncio.sleep(report_every)
+            logger.info("Outbox stats: %s", pool.stats())
+    finally:
+        await pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=max(OUTBOX_WORKERS, 4))
+    parser.add_argument("--report-every", type=float, default=30.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(run(args.workers, args.report_every))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Keyset:
+    """Sort key of a list endpoint, used for ordering and opaque cursors.
+
+    All columns sort in the same direction so the position of a row can be
+    compared as a single row-value, e.g. ``(class_name, name, id) > (...)``.
+    The last column must be unique (normally the primary key).
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self) -> list:
+        return [c.desc() if self.descending else c.asc() for c in self.columns]
+
+    def after(self, cursor: str):
+        """Condition selecting the rows that follow ``cursor``"""
+        values = self.decode(cursor)
+        position = tuple_(*[literal(v, c.type) for c, v in zip(self.columns, values)])
+        keys = tuple_(*self.columns)
+        return keys < position if self.descending else keys > position
+
+    def key(self, row) -> tuple:
+        return tuple(getattr(row, c.key) for c in self.columns)
+
+    def follows(self, key: tuple, position: tuple) -> bool:
+        """Whether a row with ``key`` sorts after ``position``"""
+        return key < position if self.descending else key > position
+
+    def encode(self, row) -> str:
+        values = [getattr(row, c.key) for c in self.columns]
+        raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> list:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.columns):
+                raise ValueError(cursor)
+            return [self._parse(c, v) for c, v in zip(self.columns, values)]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    @staticmethod
+    def _parse(column, value):
+        if value is None:
+            return None
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        return value
+
+
+def parse_fields(fields: Optional[str], available: Iterable[str]) -> Optional[List[str]]:
+    """Parse a comma-separated ``fields=`` projection, None meaning all fields"""
+    if not fields:
+        return None
+    available = list(available)
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(',') if f.strip()))
+    unknown = [f for f in requested if f not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def select_columns(columns: Dict[str, Any], fields: Optional[List[str]], keyset: Keyset) -> list:
+    """Labelled columns for the requested fields plus the keyset columns"""
+    names = fields if fields is not None else list(columns)
+    selected = [columns[name].label(name) for name in names]
+    selected += [c.label(c.key) for c in keyset.columns if c.key not in names]
+    return selected
+
+
+async def fetch_page(db: AsyncSession, query, keyset: Keyset, cursor: Optional[str], limit: int) -> Tuple[Sequence, Optional[str]]:
+    """Run ``query`` for one page and return its rows and the next cursor"""
+    if cursor:
+        query = query.where(keyset.after(cursor))
+    query = query.order_by(*keyset.order_by()).limit(limit + 1)
+    result = await db.execute(query)
+    rows = result.all()
+    if len(rows) > limit:
+        return rows[:limit], keyset.encode(rows[limit - 1])
+    return rows, None
+
+
+def rows_after(rows: Iterable, keyset: Keyset, cursor: Optional[str]) -> list:
+    """In-memory counterpart of the ``fetch_page`` ordering and cursor, for rows not in the database"""
+    rows = sorted(rows, key=keyset.key, reverse=keyset.descending)
+    if not cursor:
+        return rows
+    position = tuple(keyset.decode(cursor))
+    return [row for row in rows if keyset.follows(keyset.key(row), position)]
+
+
+def merge_page(rows: Sequence, next_cursor: Optional[str], others: Iterable, keyset: Keyset,
+               cursor: Optional[str], limit: int) -> Tuple[list, Optional[str]]:
+    """Merge rows kept outside the database (e.g. archived) into a ``fetch_page`` page.
+
+    ``others`` holds every such row of the listing; those at or before
+    ``cursor`` are dropped, and so are those with the same key as a database
+    row, which wins. When the database has more pages, rows of ``others``
+    sorting after the page's last row are left for the following pages.
+    """
+    keys = {keyset.key(row) for row in rows}
+    merged = list(rows) + [row for row in rows_after(others, keyset, cursor) if keyset.key(row) not in keys]
+    merged.sort(key=keyset.key, reverse=keyset.descending)
+    if next_cursor:
+        last = keyset.key(rows[-1])
+        merged = [row for row in merged if not keyset.follows(keyset.key(row), last)]
+    if next_cursor or len(merged) > limit:
+        merged = merged[:limit]
+        next_cursor = keyset.encode(merged[-1])
+    return merged, next_cursor
+
+
+def render_page(rows, next_cursor: Optional[str], response: Response, model, fields: Optional[List[str]]):
+    """Response models for a full page, or plain dicts for a ``fields=`` projection"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if fields is None:
+        return [model.model_validate(row) for row in rows]
+    items = [{name: getattr(row, name) for name in fields} for row in rows]
+    page = JSONResponse(jsonable_encoder(items))
+    # FastAPI only merges the injected response's headers (X-DB-Route, ...) into responses it builds itself
+    page.headers.raw.extend(
+        (name, value) for name, value in response.headers.raw if name not in (b"content-length", b"content-type")
+    )
+    return page
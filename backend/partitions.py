@@ -0,0 +1,52 @@
+"""Monthly partitions of the attendance table.
+
+``attendance`` is range-partitioned by ``date``, one partition per month
+(``attendance_y2026m04``), so reads for a day or a date range only touch the
+matching months. Partitions are created by the ``ensure_attendance_partitions``
+SQL function (see the f2c7a9b3d018 migration). The API calls it at startup and
+then daily, keeping ATTENDANCE_PARTITION_MONTHS_AHEAD months ready ahead of
+time. Rows for months without a partition land in ``attendance_default`` and
+move to their own partition on the next run.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+ATTENDANCE_PARTITION_MONTHS_AHEAD = int(os.environ.get('ATTENDANCE_PARTITION_MONTHS_AHEAD', 3))
+PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get('PARTITION_MAINTENANCE_INTERVAL', 24 * 3600))
+
+logger = logging.getLogger(__name__)
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+async def ensure_attendance_partitions(engine, start_date: date = None, end_date: date = None) -> int:
+    """Create the missing monthly partitions between two dates, returning how many"""
+    today = date.today()
+    start_date = start_date or today.replace(day=1)
+    end_date = end_date or add_months(today, ATTENDANCE_PARTITION_MONTHS_AHEAD)
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text("SELECT ensure_attendance_partitions(:start_date, :end_date)"),
+            {"start_date": start_date, "end_date": end_date}
+        )
+        return result.scalar()
+
+
+async def maintain_partitions(engine):
+    """Ensure upcoming partitions now and then every PARTITION_MAINTENANCE_INTERVAL"""
+    while True:
+        try:
+            created = await ensure_attendance_partitions(engine)
+            if created:
+                logger.info("Created %d attendance partitions", created)
+        except Exception:
+            logger.exception("Attendance partition maintenance failed")
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL)
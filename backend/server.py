@@ -1,22 +1,48 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Response, UploadFile, File, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, delete
+from sqlalchemy import select, update, union_all, and_, or_, any_, exists, func, delete, insert, bindparam, column, literal, table, text, true, values, cast, String, Date, Float, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by, ARRAY
 from sqlalchemy.orm import selectinload
+import asyncio
 import os
+import csv
+import io
+import itertools
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from urllib.parse import quote
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import Dict, List, Optional
+from dataclasses import dataclass, fields
+from types import SimpleNamespace
 import uuid
 from datetime import datetime, timezone, date, timedelta
 import jwt
-from passlib.context import CryptContext
 
-from database import get_db, engine, Base
-from models import School, User, Student, FeeBill, StudentFee, Attendance, Notification, TeacherSalary
+from database import get_db, engine, read_engine, Base, DB_ROUTE_HEADER, READ_YOUR_WRITES_HEADER
+from hashing import password_hasher, HasherOverloadedError
+from cache import TTLCache, cache_stats
+from exports import stream_export
+from instrumentation import QueryStatsMiddleware, instrument_engine
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, engines, register_engine, render_metrics
+from warmup import ping, warm_up, warmup_state
+from partitions import maintain_partitions
+from archive import (
+    ArchiveBusyError, ArchiveUnavailableError,
+    academic_year, archived_years, last_closed_year, list_archives, load_archive_job, read_archived, start_archive_job
+)
+from outbox import OUTBOX_WORKERS, OutboxWorkerPool, enqueue_notification, format_notification
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER,
+    Keyset, parse_fields, select_columns, fetch_page, merge_page, render_page
+)
+from models import (
+    School, User, TeacherClass, Student, FeeBill, StudentFee, Attendance, Notification, NotificationDelivery, TeacherSalary,
+    STUDENT_SEARCH_COLUMNS, normalize_phone
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -26,12 +52,46 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'schoolify-secret-key')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Security
 security = HTTPBearer()
 
+# Pre-defined classes, in promotion order
+ALL_CLASSES = [f"Class {i}" for i in range(1, 13)]
+
+# Year-end promotion: each class moves up one, the last class graduates
+DEFAULT_PROMOTION_MAPPING = {
+    **dict(zip(ALL_CLASSES, ALL_CLASSES[1:])),
+    ALL_CLASSES[-1]: None
+}
+
+# Authenticated users, keyed by user_id
+identity_cache = TTLCache(
+    "identity",
+    maxsize=int(os.environ.get('IDENTITY_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('IDENTITY_CACHE_TTL', 30))
+)
+
+# Fee bill collection summaries, keyed by school_id
+fee_summary_cache = TTLCache(
+    "fee_summary",
+    maxsize=int(os.environ.get('FEE_SUMMARY_CACHE_SIZE', 1000)),
+    ttl=float(os.environ.get('FEE_SUMMARY_CACHE_TTL', 30))
+)
+
+# Rendered WhatsApp contact lists, keyed by (school_id, notification_id)
+notification_contacts_cache = TTLCache(
+    "notification_contacts",
+    maxsize=int(os.environ.get('NOTIFICATION_CONTACTS_CACHE_SIZE', 200)),
+    ttl=float(os.environ.get('NOTIFICATION_CONTACTS_CACHE_TTL', 300))
+)
+
+# Dashboard statistics, keyed by school_id
+dashboard_cache = TTLCache(
+    "dashboard",
+    maxsize=int(os.environ.get('DASHBOARD_CACHE_SIZE', 1000)),
+    ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', 15))
+)
+
 app = FastAPI(title="School Administration API")
 api_router = APIRouter(prefix="/api")
 
@@ -116,6 +176,39 @@ class TeacherSalaryResponse(BaseModel):
     teacher_name: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+class PayrollPayment(BaseModel):
+    teacher_id: str
+    amount: float
+    remark: Optional[str] = None
+
+class PayrollRunRequest(BaseModel):
+    payments: List[PayrollPayment]
+    remark: Optional[str] = None  # used for payments without their own remark
+
+class PayrollRunResponse(BaseModel):
+    paid: int
+    total_amount: float
+    payments: List[TeacherSalaryResponse]
+
+class TeacherSalaryTotal(BaseModel):
+    teacher_id: str
+    teacher_name: str
+    payments: int
+    total_amount: float
+    last_paid_at: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+class MonthlySalaryTotal(BaseModel):
+    month: date
+    payments: int
+    total_amount: float
+    model_config = ConfigDict(from_attributes=True)
+
+class SalarySummaryResponse(BaseModel):
+    total_amount: float
+    teachers: List[TeacherSalaryTotal]
+    months: List[MonthlySalaryTotal]
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -135,6 +228,16 @@ class StudentCreate(BaseModel):
     parent_email: Optional[str] = None
     date_of_admission: date
 
+class StudentImportError(BaseModel):
+    row: int
+    admission_number: Optional[str] = None
+    errors: List[str]
+
+class StudentImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[StudentImportError]
+
 class StudentUpdate(BaseModel):
     class_name: Optional[str] = None
     name: Optional[str] = None
@@ -147,6 +250,21 @@ class StudentUpdate(BaseModel):
     parent_email: Optional[str] = None
     is_active: Optional[bool] = None
 
+class PromotionRequest(BaseModel):
+    dry_run: bool = True
+    mapping: Optional[Dict[str, Optional[str]]] = None  # from class -> to class, null graduates
+
+class ClassPromotion(BaseModel):
+    from_class: str
+    to_class: Optional[str]
+    students: int
+
+class PromotionResponse(BaseModel):
+    dry_run: bool
+    promoted: int
+    graduated: int
+    classes: List[ClassPromotion]
+
 class StudentResponse(BaseModel):
     id: str
     school_id: str
@@ -181,6 +299,8 @@ class FeeBillResponse(BaseModel):
     target_class: Optional[str]
     due_date: Optional[date]
     created_at: datetime
+    archived_at: Optional[datetime] = None
+    assigned_count: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
 class StudentFeeResponse(BaseModel):
@@ -198,9 +318,44 @@ class StudentFeeResponse(BaseModel):
     fee_bill_name: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+class FeeClassSummary(BaseModel):
+    class_name: str
+    paid_count: int
+    unpaid_count: int
+    paid_amount: float
+    unpaid_amount: float
+
+class FeeBillSummary(BaseModel):
+    fee_bill_id: str
+    name: str
+    amount: float
+    target_class: Optional[str]
+    due_date: Optional[date]
+    created_at: datetime
+    archived_at: Optional[datetime] = None  # archived fees count as paid, without a class breakdown
+    paid_count: int = 0
+    unpaid_count: int = 0
+    paid_amount: float = 0
+    unpaid_amount: float = 0
+    classes: List[FeeClassSummary] = []
+
 class MarkFeesPaid(BaseModel):
     remarks: Optional[str] = None
 
+class MarkFeesPaidBatch(BaseModel):
+    fee_ids: List[str]
+    remarks: Optional[str] = None
+
+class FeePaymentOutcome(BaseModel):
+    fee_id: str
+    outcome: str  # paid, already_paid, not_found
+
+class MarkFeesPaidBatchResponse(BaseModel):
+    paid: int
+    already_paid: int
+    not_found: int
+    results: List[FeePaymentOutcome]
+
 class AttendanceCreate(BaseModel):
     student_id: str
     status: str  # present, absent
@@ -220,6 +375,28 @@ class AttendanceResponse(BaseModel):
     student_class: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+class StudentFeeSummary(BaseModel):
+    total_count: int
+    paid_count: int
+    unpaid_count: int
+    paid_amount: float
+    unpaid_amount: float
+    recent: List[StudentFeeResponse]
+    next_cursor: Optional[str] = None  # continues ``recent`` on /students/{id}/fees
+
+class StudentAttendanceSummary(BaseModel):
+    days: int
+    marked_days: int
+    present_days: int
+    absent_days: int
+    present_percentage: float
+    recent: List[AttendanceResponse]
+
+class StudentProfile(BaseModel):
+    student: StudentResponse
+    fees: StudentFeeSummary
+    attendance: StudentAttendanceSummary
+
 class NotificationCreate(BaseModel):
     title: str
     message: str
@@ -233,6 +410,49 @@ class NotificationResponse(BaseModel):
     target_class: Optional[str]
     created_by: Optional[str]
     created_at: datetime
+    queued_count: Optional[int] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class FailedDelivery(BaseModel):
+    phone: str
+    student_names: Optional[str]
+    attempts: int
+    last_error: Optional[str]
+    model_config = ConfigDict(from_attributes=True)
+
+class DeliveryStatusResponse(BaseModel):
+    notification_id: str
+    total: int
+    pending: int = 0
+    sending: int = 0
+    sent: int = 0
+    failed: int = 0
+    last_sent_at: Optional[datetime] = None
+    failures: List[FailedDelivery]
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Detached snapshot of the authenticated user (no password hash)"""
+    id: str
+    school_id: str
+    email: str
+    name: str
+    role: str
+    phone: Optional[str]
+    address: Optional[str]
+    assigned_classes: Optional[str]
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(**{f.name: getattr(user, f.name) for f in fields(cls)})
+
+class SearchResult(BaseModel):
+    type: str  # student, user, notification
+    id: str
+    title: str
+    subtitle: Optional[str] = None
+    score: float
     model_config = ConfigDict(from_attributes=True)
 
 class DashboardStats(BaseModel):
@@ -242,47 +462,215 @@ class DashboardStats(BaseModel):
     today_attendance_rate: float
     recent_admissions: int
 
+class ArchivedYear(BaseModel):
+    table: str
+    year: int
+    start_date: date
+    end_date: date
+    rows: int
+    bytes: Optional[int] = None
+
+class ArchiveRunRequest(BaseModel):
+    year: Optional[int] = None  # latest academic year to archive, every closed one if not given
+
+class ArchiveJob(BaseModel):
+    id: str
+    status: str  # running, succeeded, failed
+    year: Optional[int] = None
+    last_closed_year: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    archived: List[ArchivedYear] = []
+    error: Optional[str] = None
+
+# ========================
+# List Columns and Sort Keys
+# ========================
+
+def response_columns(model, response_model, **extra) -> dict:
+    """Map response fields to SQL columns of ``model``, plus joined ``extra`` columns"""
+    table_columns = model.__table__.columns
+    return {
+        name: extra[name] if name in extra else getattr(model, name)
+        for name in response_model.model_fields
+        if name in extra or name in table_columns
+    }
+
+STUDENT_COLUMNS = response_columns(Student, StudentResponse)
+STUDENT_KEYSET = Keyset(Student.class_name, Student.name, Student.id)
+
+FEE_BILL_COLUMNS = response_columns(FeeBill, FeeBillResponse)
+FEE_BILL_KEYSET = Keyset(FeeBill.created_at, FeeBill.id, descending=True)
+
+STUDENT_FEE_COLUMNS = response_columns(
+    StudentFee, StudentFeeResponse,
+    student_name=Student.name, student_class=Student.class_name, fee_bill_name=FeeBill.name
+)
+STUDENT_FEE_KEYSET = Keyset(StudentFee.created_at, StudentFee.id, descending=True)
+
+ATTENDANCE_COLUMNS = response_columns(
+    Attendance, AttendanceResponse,
+    student_name=Student.name, student_class=Student.class_name
+)
+ATTENDANCE_KEYSET = Keyset(Attendance.date, Attendance.id, descending=True)
+
+SALARY_COLUMNS = response_columns(TeacherSalary, TeacherSalaryResponse, teacher_name=User.name)
+SALARY_KEYSET = Keyset(TeacherSalary.paid_at, TeacherSalary.id, descending=True)
+
+NOTIFICATION_COLUMNS = response_columns(Notification, NotificationResponse)
+NOTIFICATION_KEYSET = Keyset(Notification.created_at, Notification.id, descending=True)
+
+# ========================
+# Student Import
+# ========================
+
+STUDENT_IMPORT_BATCH_SIZE = int(os.environ.get('STUDENT_IMPORT_BATCH_SIZE', 1000))
+STUDENT_IMPORT_FIELDS = list(StudentCreate.model_fields)
+STUDENT_IMPORT_REQUIRED = [name for name, f in StudentCreate.model_fields.items() if f.is_required()]
+STUDENT_IMPORT_MAX_LENGTHS = {
+    name: Student.__table__.c[name].type.length
+    for name in STUDENT_IMPORT_FIELDS
+    if getattr(Student.__table__.c[name].type, "length", None)
+}
+
+STUDENT_IMPORT_STAGING_DDL = """
+    CREATE TEMP TABLE student_import_staging (
+        row_number integer NOT NULL,
+        class_name varchar(50) NOT NULL,
+        admission_number varchar(50) NOT NULL,
+        name varchar(255) NOT NULL,
+        father_name varchar(255),
+        mother_name varchar(255),
+        date_of_birth date,
+        gender varchar(10),
+        address text,
+        parent_contact varchar(20) NOT NULL,
+        parent_email varchar(255),
+        date_of_admission date NOT NULL,
+        parent_phone_e164 varchar(24) NOT NULL
+    ) ON COMMIT DROP
+"""
+
+def parse_student_import_batch(rows, staged: Dict[str, int]) -> tuple:
+    """Validate the next STUDENT_IMPORT_BATCH_SIZE (row_number, row) pairs of a CSV import
+
+    Returns the staging records and the StudentImportErrors for that batch;
+    every row read ends up in exactly one of them. Accepted admission numbers
+    are added to ``staged`` (admission number -> row number) so later batches
+    can reject duplicates. Blocking, run it through ``asyncio.to_thread``.
+    """
+    records = []
+    errors = []
+    for row_number, row in itertools.islice(rows, STUDENT_IMPORT_BATCH_SIZE):
+        values = {k: (v.strip() or None) for k, v in row.items() if k in STUDENT_IMPORT_FIELDS and v is not None}
+        try:
+            student = StudentCreate.model_validate(values)
+        except ValidationError as e:
+            errors.append(StudentImportError(
+                row=row_number,
+                admission_number=values.get("admission_number"),
+                errors=[f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" for err in e.errors()]
+            ))
+            continue
+        
+        too_long = [
+            f"{name}: at most {length} characters"
+            for name, length in STUDENT_IMPORT_MAX_LENGTHS.items()
+            if len(getattr(student, name) or "") > length
+        ]
+        if too_long:
+            errors.append(StudentImportError(row=row_number, admission_number=student.admission_number, errors=too_long))
+            continue
+        
+        if student.admission_number in staged:
+            errors.append(StudentImportError(
+                row=row_number, admission_number=student.admission_number,
+                errors=["Duplicate admission number in file"]
+            ))
+            continue
+        
+        staged[student.admission_number] = row_number
+        records.append((
+            row_number,
+            *(getattr(student, f) for f in STUDENT_IMPORT_FIELDS),
+            normalize_phone(student.parent_contact)
+        ))
+    return records, errors
+
 # ========================
 # Helper Functions
 # ========================
 
+def invalidate_student_caches(school_id: str):
+    """Drop cached results derived from a school's students"""
+    dashboard_cache.invalidate(school_id)
+    fee_summary_cache.invalidate(school_id)
+    notification_contacts_cache.invalidate_where(lambda key: key[0] == school_id)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HasherOverloadedError:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HasherOverloadedError:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-) -> User:
+) -> CurrentUser:
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("user_id")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
+        current_user = identity_cache.get(user_id)
+        if current_user is None:
+            result = await db.execute(select(User).where(User.id == user_id))
+            user = result.scalar_one_or_none()
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            current_user = CurrentUser.from_user(user)
+            identity_cache.set(user_id, current_user)
+        return current_user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def require_principal(user: User = Depends(get_current_user)) -> User:
+def require_principal(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     if user.role != "principal":
         raise HTTPException(status_code=403, detail="Principal access required")
     return user
 
+def class_access(user: CurrentUser, class_column):
+    """Condition limiting teachers to their assigned classes (all classes if none are assigned)"""
+    if user.role != "teacher":
+        return true()
+    assigned = select(TeacherClass.class_name).where(TeacherClass.user_id == user.id)
+    return or_(class_column.in_(assigned), ~exists(assigned))
+
+async def assign_classes(db: AsyncSession, teacher: User, classes: Optional[List[str]]):
+    """Replace a user's teacher_classes rows, keeping assigned_classes in sync"""
+    classes = list(dict.fromkeys(classes or []))
+    teacher.assigned_classes = ','.join(classes) if classes else None
+    await db.execute(delete(TeacherClass).where(TeacherClass.user_id == teacher.id))
+    if classes:
+        await db.execute(insert(TeacherClass).values([
+            {"user_id": teacher.id, "class_name": c, "school_id": teacher.school_id} for c in classes
+        ]))
+
 # ========================
 # Auth Routes
 # ========================
@@ -309,7 +697,7 @@ async def register_school(data: SchoolRegisterRequest, db: AsyncSession = Depend
     user = User(
         school_id=school.id,
         email=data.user_email,
-        password_hash=hash_password(data.user_password),
+        password_hash=await hash_password(data.user_password),
         name=data.user_name,
         role="principal"
     )
@@ -334,7 +722,7 @@ async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(data.password, user.password_hash):
+    if not user or not await verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_access_token({"user_id": user.id, "school_id": user.school_id, "role": user.role})
@@ -346,7 +734,7 @@ async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
     )
 
 @api_router.get("/auth/me", response_model=TokenResponse)
-async def get_me(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_me(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Get current user info"""
     result = await db.execute(select(School).where(School.id == user.school_id))
     school = result.scalar_one()
@@ -364,57 +752,55 @@ async def get_me(user: User = Depends(get_current_user), db: AsyncSession = Depe
 # ========================
 
 @api_router.post("/users", response_model=UserResponse)
-async def create_user(data: UserCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def create_user(data: UserCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Create a new user (teacher) - Principal only"""
     # Check if email exists
     result = await db.execute(select(User).where(User.email == data.email))
     if result.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email already exists")
     
-    assigned_classes_str = ','.join(data.assigned_classes) if data.assigned_classes else None
-    
     new_user = User(
         school_id=user.school_id,
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password(data.password),
         name=data.name,
         phone=data.phone,
         address=data.address,
-        assigned_classes=assigned_classes_str,
         role=data.role if data.role in ["teacher", "principal"] else "teacher"
     )
     db.add(new_user)
+    await db.flush()
+    await assign_classes(db, new_user, data.assigned_classes)
     await db.commit()
     await db.refresh(new_user)
     return UserResponse.model_validate(new_user)
 
 @api_router.post("/teachers", response_model=UserResponse)
-async def create_teacher(data: TeacherCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def create_teacher(data: TeacherCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Create a new teacher with assigned classes - Principal only"""
     # Check if email exists
     result = await db.execute(select(User).where(User.email == data.email))
     if result.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email already exists")
     
-    assigned_classes_str = ','.join(data.assigned_classes) if data.assigned_classes else None
-    
     new_teacher = User(
         school_id=user.school_id,
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password(data.password),
         name=data.name,
         phone=data.phone,
         address=data.address,
-        assigned_classes=assigned_classes_str,
         role="teacher"
     )
     db.add(new_teacher)
+    await db.flush()
+    await assign_classes(db, new_teacher, data.assigned_classes)
     await db.commit()
     await db.refresh(new_teacher)
     return UserResponse.model_validate(new_teacher)
 
 @api_router.get("/teachers", response_model=List[UserResponse])
-async def get_teachers(user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def get_teachers(user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Get all teachers in the school - Principal only"""
     result = await db.execute(
         select(User).where(and_(User.school_id == user.school_id, User.role == "teacher"))
@@ -423,7 +809,7 @@ async def get_teachers(user: User = Depends(require_principal), db: AsyncSession
     return [UserResponse.model_validate(t) for t in teachers]
 
 @api_router.get("/teachers/{teacher_id}", response_model=UserResponse)
-async def get_teacher(teacher_id: str, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def get_teacher(teacher_id: str, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Get a specific teacher - Principal only"""
     result = await db.execute(
         select(User).where(and_(User.id == teacher_id, User.school_id == user.school_id, User.role == "teacher"))
@@ -434,7 +820,7 @@ async def get_teacher(teacher_id: str, user: User = Depends(require_principal),
     return UserResponse.model_validate(teacher)
 
 @api_router.put("/teachers/{teacher_id}", response_model=UserResponse)
-async def update_teacher(teacher_id: str, data: TeacherCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def update_teacher(teacher_id: str, data: TeacherCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Update a teacher - Principal only"""
     result = await db.execute(
         select(User).where(and_(User.id == teacher_id, User.school_id == user.school_id, User.role == "teacher"))
@@ -446,12 +832,13 @@ async def update_teacher(teacher_id: str, data: TeacherCreate, user: User = Depe
     teacher.name = data.name
     teacher.phone = data.phone
     teacher.address = data.address
-    teacher.assigned_classes = ','.join(data.assigned_classes) if data.assigned_classes else None
+    await assign_classes(db, teacher, data.assigned_classes)
     if data.password:
-        teacher.password_hash = hash_password(data.password)
+        teacher.password_hash = await hash_password(data.password)
     
     await db.commit()
     await db.refresh(teacher)
+    identity_cache.invalidate(teacher.id)
     return UserResponse.model_validate(teacher)
 
 # ========================
@@ -459,7 +846,7 @@ async def update_teacher(teacher_id: str, data: TeacherCreate, user: User = Depe
 # ========================
 
 @api_router.post("/teacher-salaries", response_model=TeacherSalaryResponse)
-async def create_teacher_salary(data: TeacherSalaryCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def create_teacher_salary(data: TeacherSalaryCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Record a salary payment to a teacher - Principal only"""
     # Verify teacher exists in same school
     result = await db.execute(
@@ -484,31 +871,136 @@ async def create_teacher_salary(data: TeacherSalaryCreate, user: User = Depends(
     response.teacher_name = teacher.name
     return response
 
-@api_router.get("/teacher-salaries", response_model=List[TeacherSalaryResponse])
-async def get_all_salaries(user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
-    """Get all salary payments - Principal only"""
+@api_router.post("/teacher-salaries/payroll-run", response_model=PayrollRunResponse)
+async def run_payroll(data: PayrollRunRequest, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Pay a set of teachers in one multi-row insert - Principal only
+
+    Payments for teachers outside the school roll the whole run back.
+    """
+    if not data.payments:
+        raise HTTPException(status_code=400, detail="No payments in payroll run")
+    teacher_ids = [p.teacher_id for p in data.payments]
+    if len(set(teacher_ids)) != len(teacher_ids):
+        raise HTTPException(status_code=400, detail="Teacher listed more than once in payroll run")
+    
+    submitted = func.unnest(
+        bindparam("teacher_ids", teacher_ids, type_=ARRAY(String)),
+        bindparam("amounts", [p.amount for p in data.payments], type_=ARRAY(Float)),
+        bindparam("remarks", [p.remark or data.remark for p in data.payments], type_=ARRAY(String))
+    ).table_valued(
+        column("teacher_id", String), column("amount", Float), column("remark", String)
+    ).render_derived(name="submitted")
+    
+    paid_at = datetime.now(timezone.utc)
+    inserted = insert(TeacherSalary).from_select(
+        ["id", "teacher_id", "amount", "remark", "paid_by", "paid_at", "created_at"],
+        select(
+            func.gen_random_uuid().cast(String),
+            submitted.c.teacher_id,
+            submitted.c.amount,
+            submitted.c.remark,
+            literal(user.id, String),
+            literal(paid_at, TeacherSalary.paid_at.type),
+            func.now()
+        ).select_from(submitted).join(User, User.id == submitted.c.teacher_id).where(
+            and_(User.school_id == user.school_id, User.role == "teacher")
+        )
+    ).returning(*TeacherSalary.__table__.c).cte("inserted")
+    
     result = await db.execute(
-        select(TeacherSalary).options(selectinload(TeacherSalary.teacher)).join(User).where(
-            User.school_id == user.school_id
-        ).order_by(TeacherSalary.paid_at.desc())
+        select(inserted, User.name.label("teacher_name")).join(User, User.id == inserted.c.teacher_id).order_by(User.name)
     )
-    salaries = result.scalars().all()
+    payments = [TeacherSalaryResponse.model_validate(row) for row in result.all()]
     
-    response = []
-    for salary in salaries:
-        s = TeacherSalaryResponse.model_validate(salary)
-        s.teacher_name = salary.teacher.name if salary.teacher else None
-        response.append(s)
-    return response
+    if len(payments) != len(teacher_ids):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Teacher not found")
+    
+    await db.commit()
+    return PayrollRunResponse(
+        paid=len(payments),
+        total_amount=sum(p.amount for p in payments),
+        payments=payments
+    )
 
-@api_router.get("/teachers/{teacher_id}/salaries", response_model=List[TeacherSalaryResponse])
-async def get_teacher_salaries(teacher_id: str, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
-    """Get salary history for a specific teacher - Principal only"""
-    result = await db.execute(
-        select(TeacherSalary).options(selectinload(TeacherSalary.teacher)).where(
-            TeacherSalary.teacher_id == teacher_id
-        ).order_by(TeacherSalary.paid_at.desc())
+@api_router.get("/teacher-salaries/summary", response_model=SalarySummaryResponse)
+async def get_salary_summary(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Salary totals per teacher and per month - Principal only"""
+    month = func.date_trunc("month", TeacherSalary.paid_at).cast(Date)
+    query = select(
+        TeacherSalary.teacher_id,
+        func.min(User.name).label("teacher_name"),
+        month.label("month"),
+        func.count().label("payments"),
+        func.sum(TeacherSalary.amount).label("total_amount"),
+        func.max(TeacherSalary.paid_at).label("last_paid_at")
+    ).join(User, User.id == TeacherSalary.teacher_id).where(
+        User.school_id == user.school_id
+    ).group_by(
+        # One pass over the payments for both breakdowns
+        func.grouping_sets(TeacherSalary.teacher_id, month)
+    )
+    if from_date:
+        query = query.where(TeacherSalary.paid_at >= from_date)
+    if to_date:
+        query = query.where(TeacherSalary.paid_at < to_date + timedelta(days=1))
+    
+    result = await db.execute(query)
+    rows = result.all()
+    
+    teachers = sorted(
+        (TeacherSalaryTotal.model_validate(row) for row in rows if row.teacher_id is not None),
+        key=lambda t: t.teacher_name
+    )
+    months = sorted(
+        (MonthlySalaryTotal.model_validate(row) for row in rows if row.teacher_id is None),
+        key=lambda m: m.month, reverse=True
+    )
+    return SalarySummaryResponse(
+        total_amount=sum(t.total_amount for t in teachers),
+        teachers=teachers,
+        months=months
+    )
+
+@api_router.get("/teacher-salaries", response_model=List[TeacherSalaryResponse])
+async def get_all_salaries(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get all salary payments - Principal only"""
+    selected = parse_fields(fields, SALARY_COLUMNS)
+    query = select(*select_columns(SALARY_COLUMNS, selected, SALARY_KEYSET)).select_from(TeacherSalary).join(User).where(
+        User.school_id == user.school_id
     )
+    rows, next_cursor = await fetch_page(db, query, SALARY_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, TeacherSalaryResponse, selected)
+
+@api_router.get("/teachers/{teacher_id}/salaries", response_model=List[TeacherSalaryResponse])
+async def get_teacher_salaries(
+    teacher_id: str,
+    from_date: Optional[date] = None,
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get salary history for a specific teacher - Principal only
+
+    Payments of archived academic years are included when ``from_date`` reaches back into them.
+    """
+    query = select(TeacherSalary).options(selectinload(TeacherSalary.teacher)).join(User, User.id == TeacherSalary.teacher_id).where(
+        and_(TeacherSalary.teacher_id == teacher_id, User.school_id == user.school_id)
+    ).order_by(TeacherSalary.paid_at.desc())
+    if from_date:
+        query = query.where(TeacherSalary.paid_at >= from_date)
+    result = await db.execute(query)
     salaries = result.scalars().all()
     
     response = []
@@ -516,18 +1008,31 @@ async def get_teacher_salaries(teacher_id: str, user: User = Depends(require_pri
         s = TeacherSalaryResponse.model_validate(salary)
         s.teacher_name = salary.teacher.name if salary.teacher else None
         response.append(s)
+    
+    if from_date and archived_years(user.school_id, 'teacher_salaries'):
+        archived = await asyncio.to_thread(
+            read_archived, user.school_id, 'teacher_salaries', from_date, date.today(), teacher_id=teacher_id
+        )
+        # Payments are dated when recorded, so archived ones are older than the rest;
+        # rows left behind by an interrupted run are in both places
+        live_ids = {salary.id for salary in response}
+        archived = [row for row in archived if row['id'] not in live_ids]
+        if archived:
+            teacher_name = await db.scalar(select(User.name).where(and_(User.id == teacher_id, User.school_id == user.school_id)))
+            archived.sort(key=lambda row: row['paid_at'], reverse=True)
+            response += [TeacherSalaryResponse(**row, teacher_name=teacher_name) for row in archived]
     return response
 
 
 @api_router.get("/users", response_model=List[UserResponse])
-async def get_users(user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def get_users(user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Get all users in the school - Principal only"""
     result = await db.execute(select(User).where(User.school_id == user.school_id))
     users = result.scalars().all()
     return [UserResponse.model_validate(u) for u in users]
 
 @api_router.delete("/users/{user_id}")
-async def delete_user(user_id: str, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def delete_user(user_id: str, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Delete a user - Principal only"""
     if user_id == user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
@@ -539,6 +1044,7 @@ async def delete_user(user_id: str, user: User = Depends(require_principal), db:
     
     await db.delete(target_user)
     await db.commit()
+    identity_cache.invalidate(user_id)
     return {"message": "User deleted"}
 
 # ========================
@@ -546,48 +1052,322 @@ async def delete_user(user_id: str, user: User = Depends(require_principal), db:
 # ========================
 
 @api_router.post("/students", response_model=StudentResponse)
-async def create_student(data: StudentCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def create_student(data: StudentCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Create a new student - Principal only"""
     student = Student(school_id=user.school_id, **data.model_dump())
     db.add(student)
     await db.commit()
     await db.refresh(student)
+    invalidate_student_caches(user.school_id)
     return StudentResponse.model_validate(student)
 
+@api_router.post("/students/import", response_model=StudentImportResponse)
+async def import_students(file: UploadFile = File(...), user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Bulk-import students from a CSV upload - Principal only
+
+    The header row names StudentCreate fields. Rows are validated in batches and
+    COPY'd into a temporary staging table, then merged into students with one
+    INSERT ... SELECT that skips admission numbers the school already has.
+    """
+    await db.execute(text(STUDENT_IMPORT_STAGING_DDL))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    copy_columns = ["row_number", *STUDENT_IMPORT_FIELDS, "parent_phone_e164"]
+    
+    errors = []
+    staged = {}
+    
+    reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline=""))
+    fieldnames = await asyncio.to_thread(lambda: reader.fieldnames)
+    missing = [f for f in STUDENT_IMPORT_REQUIRED if f not in (fieldnames or [])]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+    
+    # Decoding and validation run off the event loop, one batch at a time; row 1 is the header
+    rows = enumerate(reader, start=2)
+    while True:
+        records, batch_errors = await asyncio.to_thread(parse_student_import_batch, rows, staged)
+        errors.extend(batch_errors)
+        if records:
+            await raw_connection.driver_connection.copy_records_to_table(
+                "student_import_staging", records=records, columns=copy_columns
+            )
+        if len(records) + len(batch_errors) < STUDENT_IMPORT_BATCH_SIZE:
+            break
+    
+    staged_columns = [*STUDENT_IMPORT_FIELDS, "parent_phone_e164"]
+    staging = table("student_import_staging", *[column(f) for f in staged_columns])
+    result = await db.execute(
+        pg_insert(Student).from_select(
+            ["id", "school_id", *staged_columns, "is_active", "created_at"],
+            select(
+                func.gen_random_uuid().cast(String),
+                literal(user.school_id, String),
+                *[staging.c[f] for f in staged_columns],
+                true(),
+                func.now()
+            ).select_from(staging)
+        ).on_conflict_do_nothing(
+            index_elements=[Student.school_id, Student.admission_number]
+        ).returning(Student.admission_number)
+    )
+    imported = set(result.scalars().all())
+    await db.commit()
+    
+    for admission_number, row_number in staged.items():
+        if admission_number not in imported:
+            errors.append(StudentImportError(
+                row=row_number, admission_number=admission_number,
+                errors=["Admission number already exists"]
+            ))
+    errors.sort(key=lambda e: e.row)
+    
+    if imported:
+        invalidate_student_caches(user.school_id)
+    
+    return StudentImportResponse(imported=len(imported), failed=len(errors), errors=errors)
+
 @api_router.get("/students", response_model=List[StudentResponse])
 async def get_students(
+    response: Response,
     class_name: Optional[str] = None,
     search: Optional[str] = None,
-    user: User = Depends(get_current_user),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all students in the school"""
-    query = select(Student).where(and_(Student.school_id == user.school_id, Student.is_active == True))
+    selected = parse_fields(fields, STUDENT_COLUMNS)
+    query = select(*select_columns(STUDENT_COLUMNS, selected, STUDENT_KEYSET)).where(
+        and_(Student.school_id == user.school_id, Student.is_active == True, class_access(user, Student.class_name))
+    )
     
     if class_name:
         query = query.where(Student.class_name == class_name)
     
     if search:
-        query = query.where(Student.name.ilike(f"%{search}%"))
+        columns = [getattr(Student, c) for c in STUDENT_SEARCH_COLUMNS]
+        rows, next_cursor = await fetch_page(db, query.where(search_match(search, *columns)), STUDENT_KEYSET, cursor, limit)
+        # Typo-tolerant only when nothing contains the term. Every page of such
+        # a walk has no substring matches either, so it takes the same branch.
+        if not rows and warmup_state.trigram_search:
+            rows, next_cursor = await fetch_page(db, query.where(fuzzy_match(search, *columns)), STUDENT_KEYSET, cursor, limit)
+    else:
+        rows, next_cursor = await fetch_page(db, query, STUDENT_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, StudentResponse, selected)
+
+@api_router.post("/students/promote", response_model=PromotionResponse)
+async def promote_students(data: PromotionRequest, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Move every active student up one class at year end - Principal only
+
+    Uses a class-mapping table (Class 1 -> Class 2, ..., Class 12 -> graduated
+    by default) joined into a single UPDATE, so the whole school moves in one
+    statement. Graduating students are deactivated. With dry_run the counts per
+    class are returned without changing anything.
+    """
+    mapping = data.mapping if data.mapping is not None else DEFAULT_PROMOTION_MAPPING
+    if not mapping:
+        raise HTTPException(status_code=400, detail="Class mapping is empty")
+    
+    class_map = values(
+        column("from_class", String), column("to_class", String), name="class_map"
+    ).data(list(mapping.items()))
+    
+    if data.dry_run:
+        query = select(
+            class_map.c.from_class, class_map.c.to_class, func.count().label("students")
+        ).select_from(class_map).join(
+            Student,
+            and_(
+                Student.class_name == class_map.c.from_class,
+                Student.school_id == user.school_id,
+                Student.is_active == True
+            )
+        ).group_by(class_map.c.from_class, class_map.c.to_class)
+    else:
+        moved = update(Student).where(
+            and_(
+                Student.class_name == class_map.c.from_class,
+                Student.school_id == user.school_id,
+                Student.is_active == True
+            )
+        ).values(
+            class_name=func.coalesce(class_map.c.to_class, Student.class_name),
+            is_active=class_map.c.to_class.is_not(None)
+        ).returning(class_map.c.from_class, class_map.c.to_class).cte("moved")
+        query = select(
+            moved.c.from_class, moved.c.to_class, func.count().label("students")
+        ).group_by(moved.c.from_class, moved.c.to_class)
     
-    query = query.order_by(Student.class_name, Student.name)
     result = await db.execute(query)
-    students = result.scalars().all()
-    return [StudentResponse.model_validate(s) for s in students]
+    counts = {row.from_class: row.students for row in result.all()}
+    
+    if not data.dry_run:
+        await db.commit()
+        invalidate_student_caches(user.school_id)
+    
+    classes = [
+        ClassPromotion(from_class=from_class, to_class=to_class, students=counts.get(from_class, 0))
+        for from_class, to_class in mapping.items()
+    ]
+    return PromotionResponse(
+        dry_run=data.dry_run,
+        promoted=sum(c.students for c in classes if c.to_class is not None),
+        graduated=sum(c.students for c in classes if c.to_class is None),
+        classes=classes
+    )
 
 @api_router.get("/students/{student_id}", response_model=StudentResponse)
-async def get_student(student_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_student(student_id: str, user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Get a single student"""
     result = await db.execute(
-        select(Student).where(and_(Student.id == student_id, Student.school_id == user.school_id))
+        select(Student).where(
+            and_(Student.id == student_id, Student.school_id == user.school_id, class_access(user, Student.class_name))
+        )
     )
     student = result.scalar_one_or_none()
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     return StudentResponse.model_validate(student)
 
+async def archived_student_rows(
+    db: AsyncSession, user: CurrentUser, table: str, student_id: str, start: Optional[date] = None, student=None
+) -> list:
+    """A student's archived ``table`` rows dated from ``start`` on (all if None), with the joined list columns
+
+    ``student`` (with name and class_name) saves looking the student up when
+    the caller has it already.
+    """
+    if not archived_years(user.school_id, table):
+        return []
+    rows = await asyncio.to_thread(read_archived, user.school_id, table, start, None, student_id=student_id)
+    if not rows:
+        return []
+    if student is None:
+        result = await db.execute(
+            select(Student.name, Student.class_name).where(and_(
+                Student.id == student_id,
+                Student.school_id == user.school_id,
+                class_access(user, Student.class_name)
+            ))
+        )
+        student = result.first()
+        if not student:
+            return []
+    joined = {"student_name": student.name, "student_class": student.class_name}
+    if table != 'student_fees':
+        return [SimpleNamespace(**row, **joined) for row in rows]
+    result = await db.execute(select(FeeBill.id, FeeBill.name).where(FeeBill.id.in_({row['fee_bill_id'] for row in rows})))
+    fee_bill_names = dict(result.all())
+    return [SimpleNamespace(**row, **joined, fee_bill_name=fee_bill_names.get(row['fee_bill_id'])) for row in rows]
+
+@api_router.get("/students/{student_id}/profile", response_model=StudentProfile)
+async def get_student_profile(
+    student_id: str,
+    days: int = Query(30, ge=1, le=366),
+    recent_fees: int = Query(5, ge=0, le=50),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Student details with fee and attendance summaries in one request
+
+    Issues three queries regardless of history size: the student together with
+    all counts and percentages (computed in SQL), the most recent fees, and the
+    attendance of the last ``days`` days (today included). Archived fees and
+    days are added when the school has archives.
+    """
+    start_date = date.today() - timedelta(days=days - 1)
+    paid = StudentFee.status == "paid"
+    unpaid = StudentFee.status == "unpaid"
+    present = Attendance.status == "present"
+    
+    fee_stats = select(
+        func.count().label("total_count"),
+        func.count().filter(paid).label("paid_count"),
+        func.count().filter(unpaid).label("unpaid_count"),
+        func.coalesce(func.sum(StudentFee.amount).filter(paid), 0).label("paid_amount"),
+        func.coalesce(func.sum(StudentFee.amount).filter(unpaid), 0).label("unpaid_amount")
+    ).where(StudentFee.student_id == student_id).cte("fee_stats")
+    
+    attendance_stats = select(
+        func.count().label("marked_days"),
+        func.count().filter(present).label("present_days"),
+        func.coalesce(
+            func.round(cast(func.count().filter(present) * 100, Numeric) / func.nullif(func.count(), 0), 1), 0
+        ).label("present_percentage")
+    ).where(and_(Attendance.student_id == student_id, Attendance.date >= start_date)).cte("attendance_stats")
+    
+    result = await db.execute(
+        select(
+            *[c.label(name) for name, c in STUDENT_COLUMNS.items()],
+            *[c.label(f"fee_{c.key}") for c in fee_stats.c],
+            *attendance_stats.c
+        ).select_from(
+            Student.__table__.join(fee_stats, true()).join(attendance_stats, true())
+        ).where(and_(Student.id == student_id, Student.school_id == user.school_id, class_access(user, Student.class_name)))
+    )
+    row = result.one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    fees, fees_cursor = [], None
+    if recent_fees:
+        fees, fees_cursor = await fetch_page(
+            db,
+            select(*select_columns(STUDENT_FEE_COLUMNS, None, STUDENT_FEE_KEYSET)).select_from(StudentFee).join(
+                Student, Student.id == StudentFee.student_id
+            ).join(
+                FeeBill, FeeBill.id == StudentFee.fee_bill_id
+            ).where(StudentFee.student_id == student_id),
+            STUDENT_FEE_KEYSET, None, recent_fees
+        )
+    
+    result = await db.execute(
+        select(*select_columns(ATTENDANCE_COLUMNS, None, ATTENDANCE_KEYSET)).select_from(Attendance).join(Student).where(
+            and_(Attendance.student_id == student_id, Attendance.date >= start_date)
+        ).order_by(*ATTENDANCE_KEYSET.order_by())
+    )
+    attendance = result.all()
+    marked_days, present_days, present_percentage = row.marked_days, row.present_days, row.present_percentage
+    
+    # Archived fees are all paid
+    archived_fees = await archived_student_rows(db, user, 'student_fees', student_id, student=row)
+    archived_amount = sum(fee.amount for fee in archived_fees)
+    if archived_fees and recent_fees:
+        fees, fees_cursor = merge_page(fees, fees_cursor, archived_fees, STUDENT_FEE_KEYSET, None, recent_fees)
+    
+    archived_days = await archived_student_rows(db, user, 'attendance', student_id, start_date, student=row)
+    if archived_days:
+        attendance, _ = merge_page(attendance, None, archived_days, ATTENDANCE_KEYSET, None, len(attendance) + len(archived_days))
+        marked_days = len(attendance)
+        present_days = sum(1 for day in attendance if day.status == "present")
+        present_percentage = round(present_days * 100 / marked_days, 1)
+    
+    return StudentProfile(
+        student=StudentResponse.model_validate(row),
+        fees=StudentFeeSummary(
+            total_count=row.fee_total_count + len(archived_fees),
+            paid_count=row.fee_paid_count + len(archived_fees),
+            unpaid_count=row.fee_unpaid_count,
+            paid_amount=row.fee_paid_amount + archived_amount,
+            unpaid_amount=row.fee_unpaid_amount,
+            recent=[StudentFeeResponse.model_validate(r) for r in fees],
+            next_cursor=fees_cursor
+        ),
+        attendance=StudentAttendanceSummary(
+            days=days,
+            marked_days=marked_days,
+            present_days=present_days,
+            absent_days=marked_days - present_days,
+            present_percentage=present_percentage,
+            recent=[AttendanceResponse.model_validate(r) for r in attendance]
+        )
+    )
+
 @api_router.put("/students/{student_id}", response_model=StudentResponse)
-async def update_student(student_id: str, data: StudentUpdate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def update_student(student_id: str, data: StudentUpdate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Update a student - Principal only"""
     result = await db.execute(
         select(Student).where(and_(Student.id == student_id, Student.school_id == user.school_id))
@@ -602,10 +1382,11 @@ async def update_student(student_id: str, data: StudentUpdate, user: User = Depe
     
     await db.commit()
     await db.refresh(student)
+    invalidate_student_caches(user.school_id)
     return StudentResponse.model_validate(student)
 
 @api_router.delete("/students/{student_id}")
-async def delete_student(student_id: str, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def delete_student(student_id: str, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Delete a student - Principal only"""
     result = await db.execute(
         select(Student).where(and_(Student.id == student_id, Student.school_id == user.school_id))
@@ -616,76 +1397,192 @@ async def delete_student(student_id: str, user: User = Depends(require_principal
     
     await db.delete(student)
     await db.commit()
+    invalidate_student_caches(user.school_id)
     return {"message": "Student deleted"}
 
 # ========================
 # Fee Management Routes
 # ========================
 
+async def assign_fee_bill(db: AsyncSession, fee_bill: FeeBill) -> int:
+    """Create unpaid StudentFee rows for every active student the bill targets.
+
+    Runs as one INSERT ... SELECT so no students are loaded into Python. Students
+    who already have the bill are skipped via idx_student_fee_unique, which makes
+    re-applying a bill safe. Returns the number of rows created.
+    """
+    students = select(
+        func.gen_random_uuid().cast(String),
+        Student.id,
+        literal(fee_bill.id, String),
+        literal(fee_bill.amount, Float),
+        literal("unpaid", String),
+        func.now()
+    ).where(and_(Student.school_id == fee_bill.school_id, Student.is_active == True))
+    if fee_bill.target_class:
+        students = students.where(Student.class_name == fee_bill.target_class)
+    
+    stmt = pg_insert(StudentFee).from_select(
+        ["id", "student_id", "fee_bill_id", "amount", "status", "created_at"], students
+    ).on_conflict_do_nothing(index_elements=[StudentFee.student_id, StudentFee.fee_bill_id])
+    
+    result = await db.execute(stmt)
+    return result.rowcount
+
 @api_router.post("/fee-bills", response_model=FeeBillResponse)
-async def create_fee_bill(data: FeeBillCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def create_fee_bill(data: FeeBillCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Create a new fee bill and assign to students - Principal only"""
     fee_bill = FeeBill(school_id=user.school_id, **data.model_dump())
     db.add(fee_bill)
     await db.flush()
     
-    # Get students to assign fee
-    query = select(Student).where(and_(Student.school_id == user.school_id, Student.is_active == True))
-    if data.target_class:
-        query = query.where(Student.class_name == data.target_class)
-    
-    result = await db.execute(query)
-    students = result.scalars().all()
-    
-    # Create student fee records
-    for student in students:
-        student_fee = StudentFee(
-            student_id=student.id,
-            fee_bill_id=fee_bill.id,
-            amount=data.amount,
-            status="unpaid"
-        )
-        db.add(student_fee)
+    assigned_count = await assign_fee_bill(db, fee_bill)
     
     await db.commit()
     await db.refresh(fee_bill)
-    return FeeBillResponse.model_validate(fee_bill)
+    dashboard_cache.invalidate(user.school_id)
+    fee_summary_cache.invalidate(user.school_id)
+    
+    response = FeeBillResponse.model_validate(fee_bill)
+    response.assigned_count = assigned_count
+    return response
+
+@api_router.post("/fee-bills/{fee_bill_id}/apply", response_model=FeeBillResponse)
+async def apply_fee_bill(fee_bill_id: str, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Assign an existing fee bill to students who do not have it yet - Principal only"""
+    # Locked against the archiver, which stamps archived_at before deleting the bill's fees
+    result = await db.execute(
+        select(FeeBill).where(and_(FeeBill.id == fee_bill_id, FeeBill.school_id == user.school_id)).with_for_update()
+    )
+    fee_bill = result.scalar_one_or_none()
+    if not fee_bill:
+        raise HTTPException(status_code=404, detail="Fee bill not found")
+    if fee_bill.archived_at is not None:
+        # Its paid fees are gone from student_fees, so every payer would be billed again
+        raise HTTPException(status_code=409, detail="Fee bill is archived and cannot be applied again")
+    
+    assigned_count = await assign_fee_bill(db, fee_bill)
+    
+    await db.commit()
+    dashboard_cache.invalidate(user.school_id)
+    fee_summary_cache.invalidate(user.school_id)
+    
+    response = FeeBillResponse.model_validate(fee_bill)
+    response.assigned_count = assigned_count
+    return response
 
 @api_router.get("/fee-bills", response_model=List[FeeBillResponse])
-async def get_fee_bills(user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def get_fee_bills(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
     """Get all fee bills - Principal only"""
+    selected = parse_fields(fields, FEE_BILL_COLUMNS)
+    query = select(*select_columns(FEE_BILL_COLUMNS, selected, FEE_BILL_KEYSET)).where(FeeBill.school_id == user.school_id)
+    rows, next_cursor = await fetch_page(db, query, FEE_BILL_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, FeeBillResponse, selected)
+
+@api_router.get("/fee-bills/summary", response_model=List[FeeBillSummary])
+async def get_fee_bills_summary(user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Collected and outstanding totals per fee bill and class - Principal only"""
+    cached = fee_summary_cache.get(user.school_id)
+    if cached is not None:
+        return cached
+    
+    paid = StudentFee.status == "paid"
+    unpaid = StudentFee.status == "unpaid"
     result = await db.execute(
-        select(FeeBill).where(FeeBill.school_id == user.school_id).order_by(FeeBill.created_at.desc())
+        select(
+            FeeBill.id,
+            FeeBill.name,
+            FeeBill.amount,
+            FeeBill.target_class,
+            FeeBill.due_date,
+            FeeBill.created_at,
+            FeeBill.archived_at,
+            FeeBill.archived_count,
+            FeeBill.archived_amount,
+            Student.class_name,
+            func.count().filter(paid).label("paid_count"),
+            func.count().filter(unpaid).label("unpaid_count"),
+            func.coalesce(func.sum(StudentFee.amount).filter(paid), 0).label("paid_amount"),
+            func.coalesce(func.sum(StudentFee.amount).filter(unpaid), 0).label("unpaid_amount")
+        ).select_from(FeeBill).outerjoin(
+            StudentFee, StudentFee.fee_bill_id == FeeBill.id
+        ).outerjoin(
+            Student, Student.id == StudentFee.student_id
+        ).where(
+            FeeBill.school_id == user.school_id
+        ).group_by(
+            FeeBill.id, Student.class_name
+        ).order_by(FeeBill.created_at.desc(), FeeBill.id, Student.class_name)
     )
-    bills = result.scalars().all()
-    return [FeeBillResponse.model_validate(b) for b in bills]
+    
+    summaries = {}
+    for row in result.all():
+        summary = summaries.get(row.id)
+        if summary is None:
+            summary = summaries[row.id] = FeeBillSummary(
+                fee_bill_id=row.id,
+                name=row.name,
+                amount=row.amount,
+                target_class=row.target_class,
+                due_date=row.due_date,
+                created_at=row.created_at,
+                archived_at=row.archived_at,
+                paid_count=row.archived_count,
+                paid_amount=row.archived_amount
+            )
+        # Bills without any student fees come back as a single row with no class
+        if row.class_name is None:
+            continue
+        summary.classes.append(FeeClassSummary(
+            class_name=row.class_name,
+            paid_count=row.paid_count,
+            unpaid_count=row.unpaid_count,
+            paid_amount=row.paid_amount,
+            unpaid_amount=row.unpaid_amount
+        ))
+        summary.paid_count += row.paid_count
+        summary.unpaid_count += row.unpaid_count
+        summary.paid_amount += row.paid_amount
+        summary.unpaid_amount += row.unpaid_amount
+    
+    response = list(summaries.values())
+    fee_summary_cache.set(user.school_id, response)
+    return response
 
 @api_router.get("/fee-bills/{fee_bill_id}/students", response_model=List[StudentFeeResponse])
-async def get_fee_bill_students(fee_bill_id: str, status: Optional[str] = None, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def get_fee_bill_students(
+    fee_bill_id: str,
+    response: Response,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
     """Get students for a fee bill with their payment status - Principal only"""
-    query = select(StudentFee).options(
-        selectinload(StudentFee.student),
-        selectinload(StudentFee.fee_bill)
-    ).where(StudentFee.fee_bill_id == fee_bill_id)
+    selected = parse_fields(fields, STUDENT_FEE_COLUMNS)
+    query = select(*select_columns(STUDENT_FEE_COLUMNS, selected, STUDENT_FEE_KEYSET)).select_from(StudentFee).join(
+        Student, Student.id == StudentFee.student_id
+    ).join(
+        FeeBill, FeeBill.id == StudentFee.fee_bill_id
+    ).where(and_(StudentFee.fee_bill_id == fee_bill_id, FeeBill.school_id == user.school_id))
     
     if status:
         query = query.where(StudentFee.status == status)
     
-    result = await db.execute(query)
-    fees = result.scalars().all()
-    
-    response = []
-    for fee in fees:
-        fee_data = StudentFeeResponse.model_validate(fee)
-        fee_data.student_name = fee.student.name if fee.student else None
-        fee_data.student_class = fee.student.class_name if fee.student else None
-        fee_data.fee_bill_name = fee.fee_bill.name if fee.fee_bill else None
-        response.append(fee_data)
-    
-    return response
+    rows, next_cursor = await fetch_page(db, query, STUDENT_FEE_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, StudentFeeResponse, selected)
 
 @api_router.put("/student-fees/{fee_id}/mark-paid", response_model=StudentFeeResponse)
-async def mark_fee_paid(fee_id: str, data: MarkFeesPaid, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def mark_fee_paid(fee_id: str, data: MarkFeesPaid, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Mark a student fee as paid - Principal only (cannot be undone)"""
     result = await db.execute(
         select(StudentFee).options(
@@ -708,6 +1605,8 @@ async def mark_fee_paid(fee_id: str, data: MarkFeesPaid, user: User = Depends(re
     
     await db.commit()
     await db.refresh(fee)
+    dashboard_cache.invalidate(user.school_id)
+    fee_summary_cache.invalidate(user.school_id)
     
     fee_data = StudentFeeResponse.model_validate(fee)
     fee_data.student_name = fee.student.name if fee.student else None
@@ -715,70 +1614,155 @@ async def mark_fee_paid(fee_id: str, data: MarkFeesPaid, user: User = Depends(re
     fee_data.fee_bill_name = fee.fee_bill.name if fee.fee_bill else None
     return fee_data
 
-@api_router.get("/students/{student_id}/fees", response_model=List[StudentFeeResponse])
-async def get_student_fees(student_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Get fee history for a student"""
+@api_router.put("/student-fees/mark-paid", response_model=MarkFeesPaidBatchResponse)
+async def mark_fees_paid_batch(data: MarkFeesPaidBatch, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Mark many student fees as paid in one transaction - Principal only
+
+    A single statement updates the unpaid fees and reports every requested ID:
+    the UPDATE runs in a CTE and the outer SELECT still sees the pre-update
+    rows, so IDs that exist but were not updated were already paid.
+    """
+    fee_ids = list(dict.fromkeys(data.fee_ids))
+    if not fee_ids:
+        return MarkFeesPaidBatchResponse(paid=0, already_paid=0, not_found=0, results=[])
+    
+    requested = any_(bindparam("fee_ids", fee_ids, type_=ARRAY(String)))
+    
+    updated = update(StudentFee).where(
+        and_(
+            StudentFee.id == requested,
+            StudentFee.status == "unpaid",
+            StudentFee.student_id == Student.id,
+            Student.school_id == user.school_id
+        )
+    ).values(
+        status="paid",
+        paid_at=datetime.now(timezone.utc),
+        marked_by=user.id,
+        remarks=data.remarks
+    ).returning(StudentFee.id).cte("updated")
+    
     result = await db.execute(
-        select(StudentFee).options(
-            selectinload(StudentFee.student),
-            selectinload(StudentFee.fee_bill)
-        ).where(StudentFee.student_id == student_id).order_by(StudentFee.created_at.desc())
+        select(StudentFee.id, updated.c.id.is_not(None).label("updated")).select_from(StudentFee).join(Student).outerjoin(
+            updated, updated.c.id == StudentFee.id
+        ).where(and_(StudentFee.id == requested, Student.school_id == user.school_id))
     )
-    fees = result.scalars().all()
+    found = {row.id: row.updated for row in result.all()}
+    await db.commit()
     
-    response = []
-    for fee in fees:
-        fee_data = StudentFeeResponse.model_validate(fee)
-        fee_data.student_name = fee.student.name if fee.student else None
-        fee_data.student_class = fee.student.class_name if fee.student else None
-        fee_data.fee_bill_name = fee.fee_bill.name if fee.fee_bill else None
-        response.append(fee_data)
+    results = []
+    for fee_id in fee_ids:
+        if fee_id not in found:
+            outcome = "not_found"
+        elif found[fee_id]:
+            outcome = "paid"
+        else:
+            outcome = "already_paid"
+        results.append(FeePaymentOutcome(fee_id=fee_id, outcome=outcome))
     
-    return response
+    paid = sum(1 for r in results if r.outcome == "paid")
+    if paid:
+        dashboard_cache.invalidate(user.school_id)
+        fee_summary_cache.invalidate(user.school_id)
+    
+    return MarkFeesPaidBatchResponse(
+        paid=paid,
+        already_paid=sum(1 for r in results if r.outcome == "already_paid"),
+        not_found=sum(1 for r in results if r.outcome == "not_found"),
+        results=results
+    )
+
+@api_router.get("/students/{student_id}/fees", response_model=List[StudentFeeResponse])
+async def get_student_fees(
+    student_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get fee history for a student, archived fees included"""
+    selected = parse_fields(fields, STUDENT_FEE_COLUMNS)
+    query = select(*select_columns(STUDENT_FEE_COLUMNS, selected, STUDENT_FEE_KEYSET)).select_from(StudentFee).join(
+        Student, Student.id == StudentFee.student_id
+    ).join(
+        FeeBill, FeeBill.id == StudentFee.fee_bill_id
+    ).where(and_(StudentFee.student_id == student_id, Student.school_id == user.school_id, class_access(user, Student.class_name)))
+    
+    rows, next_cursor = await fetch_page(db, query, STUDENT_FEE_KEYSET, cursor, limit)
+    # Fees of other, unsettled bills of archived years stay in the table, so the two interleave
+    archived = await archived_student_rows(db, user, 'student_fees', student_id)
+    if archived:
+        rows, next_cursor = merge_page(rows, next_cursor, archived, STUDENT_FEE_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, StudentFeeResponse, selected)
 
 # ========================
 # Attendance Routes
 # ========================
 
 @api_router.post("/attendance", response_model=List[AttendanceResponse])
-async def mark_attendance(data: AttendanceBulkCreate, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Mark attendance for multiple students"""
-    responses = []
+async def mark_attendance(data: AttendanceBulkCreate, user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Mark attendance for multiple students
+
+    All records are upserted in a single INSERT ... ON CONFLICT statement against
+    idx_attendance_student_date, so the number of round trips does not depend on
+    the class size. Students outside the caller's school are filtered out by the
+    same statement and cause the whole submission to be rolled back.
+    """
+    # One row per student; a later record for the same student wins
+    records = {record.student_id: record.status for record in data.records}
+    if not records:
+        return []
+    if academic_year(data.date) in archived_years(user.school_id, 'attendance'):
+        # The day may already be in the archive, where idx_attendance_student_date cannot see it
+        raise HTTPException(status_code=400, detail=f"Attendance of academic year {academic_year(data.date)} is archived")
     
-    for record in data.records:
-        # Check if attendance already exists for this date
-        result = await db.execute(
-            select(Attendance).where(
-                and_(Attendance.student_id == record.student_id, Attendance.date == data.date)
-            )
-        )
-        existing = result.scalar_one_or_none()
-        
-        if existing:
-            existing.status = record.status
-            existing.marked_by = user.id
-            attendance = existing
-        else:
-            attendance = Attendance(
-                student_id=record.student_id,
-                date=data.date,
-                status=record.status,
-                marked_by=user.id
-            )
-            db.add(attendance)
-        
-        await db.flush()
-        await db.refresh(attendance)
-        responses.append(AttendanceResponse.model_validate(attendance))
+    submitted = func.unnest(
+        bindparam("student_ids", list(records.keys()), type_=ARRAY(String)),
+        bindparam("statuses", list(records.values()), type_=ARRAY(String))
+    ).table_valued(
+        column("student_id", String), column("status", String)
+    ).render_derived(name="submitted")
+    
+    rows = select(
+        func.gen_random_uuid().cast(String),
+        submitted.c.student_id,
+        literal(data.date, Date),
+        submitted.c.status,
+        literal(user.id, String),
+        func.now()
+    ).select_from(submitted).join(Student, Student.id == submitted.c.student_id).where(
+        and_(Student.school_id == user.school_id, class_access(user, Student.class_name))
+    )
+    
+    stmt = pg_insert(Attendance).from_select(
+        ["id", "student_id", "date", "status", "marked_by", "created_at"], rows
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Attendance.student_id, Attendance.date],
+        set_={"status": stmt.excluded.status, "marked_by": stmt.excluded.marked_by}
+    ).returning(
+        Attendance.id, Attendance.student_id, Attendance.date,
+        Attendance.status, Attendance.marked_by, Attendance.created_at
+    )
+    
+    result = await db.execute(stmt)
+    saved = {row.student_id: row for row in result.all()}
+    
+    if len(saved) != len(records):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Student not found")
     
     await db.commit()
-    return responses
+    dashboard_cache.invalidate(user.school_id)
+    return [AttendanceResponse.model_validate(saved[student_id]) for student_id in records]
 
 @api_router.get("/attendance", response_model=List[AttendanceResponse])
 async def get_attendance(
     date: date,
     class_name: str,
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Get attendance for a class on a specific date"""
@@ -787,7 +1771,8 @@ async def get_attendance(
             and_(
                 Attendance.date == date,
                 Student.class_name == class_name,
-                Student.school_id == user.school_id
+                Student.school_id == user.school_id,
+                class_access(user, Student.class_name)
             )
         )
     )
@@ -803,32 +1788,41 @@ async def get_attendance(
     return response
 
 @api_router.get("/students/{student_id}/attendance", response_model=List[AttendanceResponse])
-async def get_student_attendance(student_id: str, days: int = 60, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    """Get attendance history for a student (last N days)"""
-    start_date = date.today() - timedelta(days=days)
+async def get_student_attendance(
+    student_id: str,
+    response: Response,
+    days: int = 60,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get attendance history for a student (last N days, today included)"""
+    start_date = date.today() - timedelta(days=days - 1)
     
-    result = await db.execute(
-        select(Attendance).options(selectinload(Attendance.student)).where(
-            and_(Attendance.student_id == student_id, Attendance.date >= start_date)
-        ).order_by(Attendance.date.desc())
+    selected = parse_fields(fields, ATTENDANCE_COLUMNS)
+    query = select(*select_columns(ATTENDANCE_COLUMNS, selected, ATTENDANCE_KEYSET)).select_from(Attendance).join(Student).where(
+        and_(
+            Attendance.student_id == student_id,
+            Attendance.date >= start_date,
+            Student.school_id == user.school_id,
+            class_access(user, Student.class_name)
+        )
     )
-    records = result.scalars().all()
     
-    response = []
-    for record in records:
-        att_data = AttendanceResponse.model_validate(record)
-        att_data.student_name = record.student.name if record.student else None
-        att_data.student_class = record.student.class_name if record.student else None
-        response.append(att_data)
-    
-    return response
+    rows, next_cursor = await fetch_page(db, query, ATTENDANCE_KEYSET, cursor, limit)
+    archived = await archived_student_rows(db, user, 'attendance', student_id, start_date)
+    if archived:
+        rows, next_cursor = merge_page(rows, next_cursor, archived, ATTENDANCE_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, AttendanceResponse, selected)
 
 # ========================
 # Notification Routes
 # ========================
 
 @api_router.post("/notifications", response_model=NotificationResponse)
-async def create_notification(data: NotificationCreate, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def create_notification(data: NotificationCreate, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
     """Create a notification - Principal only"""
     notification = Notification(
         school_id=user.school_id,
@@ -836,139 +1830,415 @@ async def create_notification(data: NotificationCreate, user: User = Depends(req
         **data.model_dump()
     )
     db.add(notification)
+    await db.flush()
+    # Queued in the same transaction, so every saved notification gets delivered
+    queued_count = await enqueue_notification(db, notification)
     await db.commit()
     await db.refresh(notification)
-    return NotificationResponse.model_validate(notification)
+    response = NotificationResponse.model_validate(notification)
+    response.queued_count = queued_count
+    return response
 
 @api_router.get("/notifications", response_model=List[NotificationResponse])
-async def get_notifications(user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+async def get_notifications(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
     """Get all notifications - Principal only"""
-    result = await db.execute(
-        select(Notification).where(Notification.school_id == user.school_id).order_by(Notification.created_at.desc())
+    selected = parse_fields(fields, NOTIFICATION_COLUMNS)
+    query = select(*select_columns(NOTIFICATION_COLUMNS, selected, NOTIFICATION_KEYSET)).where(
+        Notification.school_id == user.school_id
     )
-    notifications = result.scalars().all()
-    return [NotificationResponse.model_validate(n) for n in notifications]
+    rows, next_cursor = await fetch_page(db, query, NOTIFICATION_KEYSET, cursor, limit)
+    return render_page(rows, next_cursor, response, NotificationResponse, selected)
 
 @api_router.get("/notifications/{notification_id}/contacts")
-async def get_notification_contacts(notification_id: str, user: User = Depends(require_principal), db: AsyncSession = Depends(get_db)):
-    """Get WhatsApp contacts for a notification"""
-    result = await db.execute(select(Notification).where(Notification.id == notification_id))
-    notification = result.scalar_one_or_none()
+async def get_notification_contacts(
+    notification_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user: CurrentUser = Depends(require_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get WhatsApp contacts for a notification, one per parent phone number"""
+    cache_key = (user.school_id, notification_id)
+    cached = notification_contacts_cache.get(cache_key)
+    if cached is None:
+        result = await db.execute(
+            select(Notification, School.name).join(School, School.id == Notification.school_id).where(
+                and_(Notification.id == notification_id, Notification.school_id == user.school_id)
+            )
+        )
+        row = result.one_or_none()
+        
+        if not row:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        notification, school_name = row
+        
+        # Siblings share a parent, so group by the normalized phone number
+        query = select(
+            Student.parent_phone_e164,
+            func.min(Student.parent_contact).label("parent_contact"),
+            func.array_agg(aggregate_order_by(Student.name, Student.name)).label("student_names")
+        ).where(
+            and_(Student.school_id == user.school_id, Student.is_active == True, Student.parent_phone_e164.is_not(None))
+        ).group_by(Student.parent_phone_e164).order_by(Student.parent_phone_e164)
+        if notification.target_class:
+            query = query.where(Student.class_name == notification.target_class)
+        
+        result = await db.execute(query)
+        
+        message = quote(format_notification(notification.title, notification.message, school_name))
+        contacts = [
+            {
+                "student_name": ", ".join(row.student_names),
+                "student_names": row.student_names,
+                "parent_contact": row.parent_contact,
+                "phone": row.parent_phone_e164,
+                "whatsapp_link": f"https://wa.me/{row.parent_phone_e164.lstrip('+')}?text={message}"
+            }
+            for row in result.all()
+        ]
+        cached = (NotificationResponse.model_validate(notification), contacts)
+        notification_contacts_cache.set(cache_key, cached)
     
-    if not notification:
+    notification, contacts = cached
+    next_offset = offset + limit if offset + limit < len(contacts) else None
+    return {
+        "notification": notification,
+        "contacts": contacts[offset:offset + limit],
+        "total": len(contacts),
+        "next_offset": next_offset
+    }
+
+@api_router.get("/notifications/{notification_id}/deliveries", response_model=DeliveryStatusResponse)
+async def get_notification_deliveries(notification_id: str, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Delivery progress of a notification - Principal only"""
+    result = await db.execute(
+        select(Notification.id).where(and_(Notification.id == notification_id, Notification.school_id == user.school_id))
+    )
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    query = select(Student).where(and_(Student.school_id == user.school_id, Student.is_active == True))
-    if notification.target_class:
-        query = query.where(Student.class_name == notification.target_class)
+    result = await db.execute(
+        select(
+            NotificationDelivery.status,
+            func.count().label("count"),
+            func.max(NotificationDelivery.sent_at).label("last_sent_at")
+        ).where(NotificationDelivery.notification_id == notification_id).group_by(NotificationDelivery.status)
+    )
+    rows = result.all()
+    counts = {row.status: row.count for row in rows}
+    last_sent_at = max((row.last_sent_at for row in rows if row.last_sent_at), default=None)
     
-    result = await db.execute(query)
-    students = result.scalars().all()
+    failures = await db.execute(
+        select(NotificationDelivery).where(and_(
+            NotificationDelivery.notification_id == notification_id,
+            NotificationDelivery.status == 'failed'
+        )).order_by(NotificationDelivery.phone).limit(MAX_PAGE_SIZE)
+    )
+    return DeliveryStatusResponse(
+        notification_id=notification_id,
+        total=sum(counts.values()),
+        last_sent_at=last_sent_at,
+        failures=[FailedDelivery.model_validate(d) for d in failures.scalars().all()],
+        **counts
+    )
+
+# ========================
+# Export Routes
+# ========================
+
+EXPORT_FORMAT = Query("csv", pattern="^(csv|ndjson)$")
+
+def export_query(columns: dict, keyset: Keyset):
+    return select(*select_columns(columns, None, keyset)).order_by(*keyset.order_by())
+
+@api_router.get("/exports/students")
+async def export_students(
+    format: str = EXPORT_FORMAT,
+    class_name: Optional[str] = None,
+    include_inactive: bool = False,
+    user: CurrentUser = Depends(require_principal)
+):
+    """Stream all students as CSV or NDJSON - Principal only"""
+    query = export_query(STUDENT_COLUMNS, STUDENT_KEYSET).where(Student.school_id == user.school_id)
+    if class_name:
+        query = query.where(Student.class_name == class_name)
+    if not include_inactive:
+        query = query.where(Student.is_active == True)
+    return stream_export(query, format, "students")
+
+@api_router.get("/exports/student-fees")
+async def export_student_fees(
+    format: str = EXPORT_FORMAT,
+    fee_bill_id: Optional[str] = None,
+    status: Optional[str] = None,
+    user: CurrentUser = Depends(require_principal)
+):
+    """Stream student fees with student and bill names - Principal only"""
+    query = export_query(STUDENT_FEE_COLUMNS, STUDENT_FEE_KEYSET).select_from(StudentFee).join(
+        Student, Student.id == StudentFee.student_id
+    ).join(
+        FeeBill, FeeBill.id == StudentFee.fee_bill_id
+    ).where(FeeBill.school_id == user.school_id)
+    if fee_bill_id:
+        query = query.where(StudentFee.fee_bill_id == fee_bill_id)
+    if status:
+        query = query.where(StudentFee.status == status)
+    return stream_export(query, format, "student-fees")
+
+@api_router.get("/exports/attendance")
+async def export_attendance(
+    start_date: date,
+    end_date: date,
+    format: str = EXPORT_FORMAT,
+    class_name: Optional[str] = None,
+    user: CurrentUser = Depends(require_principal)
+):
+    """Stream attendance over a date range - Principal only"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    query = export_query(ATTENDANCE_COLUMNS, ATTENDANCE_KEYSET).select_from(Attendance).join(Student).where(
+        and_(Student.school_id == user.school_id, Attendance.date >= start_date, Attendance.date <= end_date)
+    )
+    if class_name:
+        query = query.where(Student.class_name == class_name)
+    return stream_export(query, format, f"attendance-{start_date}-{end_date}")
+
+@api_router.get("/exports/teacher-salaries")
+async def export_teacher_salaries(
+    format: str = EXPORT_FORMAT,
+    user: CurrentUser = Depends(require_principal)
+):
+    """Stream all teacher salary payments - Principal only"""
+    query = export_query(SALARY_COLUMNS, SALARY_KEYSET).select_from(TeacherSalary).join(User).where(
+        User.school_id == user.school_id
+    )
+    return stream_export(query, format, "teacher-salaries")
+
+# ========================
+# Archive Routes
+# ========================
+
+@api_router.get("/archives", response_model=List[ArchivedYear])
+async def get_archives(user: CurrentUser = Depends(require_principal)):
+    """List the archived academic years of the school - Principal only"""
+    try:
+        return await asyncio.to_thread(list_archives, user.school_id)
+    except ArchiveUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@api_router.post("/archives", response_model=ArchiveJob, status_code=202)
+async def run_archive(data: ArchiveRunRequest, user: CurrentUser = Depends(require_principal)):
+    """Start moving closed academic years of attendance, settled fees and salaries to the archive - Principal only"""
+    closed = last_closed_year()
+    if data.year is not None and data.year > closed:
+        raise HTTPException(status_code=400, detail=f"Academic year {data.year} has not closed yet, the latest closed one is {closed}")
+    try:
+        # Fee summaries change as fees move out
+        job = start_archive_job(user.school_id, data.year, on_done=lambda job: invalidate_student_caches(user.school_id))
+    except ArchiveUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ArchiveBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job
+
+@api_router.get("/archives/jobs/{job_id}", response_model=ArchiveJob)
+async def get_archive_job(job_id: str, user: CurrentUser = Depends(require_principal)):
+    """Status of an archive run - Principal only"""
+    job = await asyncio.to_thread(load_archive_job, user.school_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Archive job not found")
+    return job
+
+# ========================
+# Search Routes
+# ========================
+
+def search_score(term: str, *columns):
+    """Best word similarity of the term in any column (1 for substring matches)"""
+    if not warmup_state.trigram_search:
+        return literal(1.0)
+    return func.greatest(*[func.word_similarity(term, c) for c in columns])
+
+def search_match(term: str, *columns):
+    """Substring match in any column, served by the trigram indexes"""
+    return or_(*[c.icontains(term, autoescape=True) for c in columns])
+
+def fuzzy_match(term: str, *columns):
+    """Typo-tolerant match in any column (needs pg_trgm).
+
+    Close words such as a shared first name match many rows, so this is only
+    a fallback for terms without any substring match.
+    """
+    return or_(*[c.op("%>")(term) for c in columns])
+
+def search_queries(user: CurrentUser, term: str, match) -> list:
+    """One ranked SELECT per result type, filtered with ``match``"""
+    student_columns = [getattr(Student, c) for c in STUDENT_SEARCH_COLUMNS]
+    queries = [
+        select(
+            literal("student").label("type"),
+            Student.id.label("id"),
+            Student.name.label("title"),
+            func.concat(Student.class_name, " · ", Student.admission_number).label("subtitle"),
+            search_score(term, *student_columns).label("score")
+        ).where(
+            and_(
+                Student.school_id == user.school_id,
+                Student.is_active == True,
+                class_access(user, Student.class_name),
+                match(term, *student_columns)
+            )
+        )
+    ]
     
-    contacts = []
-    for student in students:
-        phone = student.parent_contact.replace(" ", "").replace("-", "")
-        if not phone.startswith("+"):
-            phone = "+91" + phone  # Default to India
-        
-        message = f"*{notification.title}*\n\n{notification.message}\n\n- {user.school_id}"
-        wa_link = f"https://wa.me/{phone.replace('+', '')}?text={message}"
-        
-        contacts.append({
-            "student_name": student.name,
-            "parent_contact": student.parent_contact,
-            "whatsapp_link": wa_link
-        })
+    if user.role == "principal":
+        queries.append(
+            select(
+                literal("user").label("type"),
+                User.id.label("id"),
+                User.name.label("title"),
+                User.email.label("subtitle"),
+                search_score(term, User.name, User.email).label("score")
+            ).where(and_(User.school_id == user.school_id, match(term, User.name, User.email)))
+        )
+        queries.append(
+            select(
+                literal("notification").label("type"),
+                Notification.id.label("id"),
+                Notification.title.label("title"),
+                func.coalesce(Notification.target_class, "All classes").label("subtitle"),
+                search_score(term, Notification.title).label("score")
+            ).where(and_(Notification.school_id == user.school_id, match(term, Notification.title)))
+        )
+    return queries
+
+@api_router.get("/search", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ranked search across students, and for principals also users and notifications"""
+    term = q.strip()
+    matches = [search_match]
+    if warmup_state.trigram_search:
+        matches.append(fuzzy_match)
     
-    return {"notification": NotificationResponse.model_validate(notification), "contacts": contacts}
+    for match in matches:
+        results = union_all(*search_queries(user, term, match)).subquery("results")
+        result = await db.execute(
+            select(results).order_by(results.c.score.desc(), results.c.title).limit(limit)
+        )
+        rows = result.all()
+        if rows:
+            break
+    return [SearchResult.model_validate(row) for row in rows]
 
 # ========================
 # Dashboard Routes
 # ========================
 
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
-async def get_dashboard_stats(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_dashboard_stats(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Get dashboard statistics"""
-    # Total students
-    result = await db.execute(
-        select(func.count(Student.id)).where(
-            and_(Student.school_id == user.school_id, Student.is_active == True)
-        )
-    )
-    total_students = result.scalar() or 0
+    cached = dashboard_cache.get(user.school_id)
+    if cached is not None:
+        return cached
     
-    # Total classes (distinct)
-    result = await db.execute(
-        select(func.count(func.distinct(Student.class_name))).where(
-            and_(Student.school_id == user.school_id, Student.is_active == True)
-        )
-    )
-    total_classes = result.scalar() or 0
+    today = date.today()
+    thirty_days_ago = today - timedelta(days=30)
+    
+    # Students, classes and recent admissions (last 30 days)
+    student_stats = select(
+        func.count().label("total_students"),
+        func.count(func.distinct(Student.class_name)).label("total_classes"),
+        func.count().filter(Student.date_of_admission >= thirty_days_ago).label("recent_admissions")
+    ).where(
+        and_(Student.school_id == user.school_id, Student.is_active == True)
+    ).cte("student_stats")
     
     # Pending fees
-    result = await db.execute(
-        select(func.count(StudentFee.id)).join(Student).where(
-            and_(Student.school_id == user.school_id, StudentFee.status == "unpaid")
-        )
-    )
-    pending_fees = result.scalar() or 0
+    fee_stats = select(
+        func.count().label("pending_fees")
+    ).select_from(StudentFee).join(Student).where(
+        and_(Student.school_id == user.school_id, StudentFee.status == "unpaid")
+    ).cte("fee_stats")
     
-    # Today's attendance rate
-    today = date.today()
-    result = await db.execute(
-        select(func.count(Attendance.id)).join(Student).where(
-            and_(Student.school_id == user.school_id, Attendance.date == today, Attendance.status == "present")
-        )
-    )
-    present_count = result.scalar() or 0
+    # Today's attendance
+    attendance_stats = select(
+        func.count().label("marked"),
+        func.count().filter(Attendance.status == "present").label("present")
+    ).select_from(Attendance).join(Student).where(
+        and_(Student.school_id == user.school_id, Attendance.date == today)
+    ).cte("attendance_stats")
     
     result = await db.execute(
-        select(func.count(Attendance.id)).join(Student).where(
-            and_(Student.school_id == user.school_id, Attendance.date == today)
+        select(
+            student_stats.c.total_students,
+            student_stats.c.total_classes,
+            student_stats.c.recent_admissions,
+            fee_stats.c.pending_fees,
+            attendance_stats.c.marked,
+            attendance_stats.c.present
+        ).select_from(
+            student_stats.join(fee_stats, true()).join(attendance_stats, true())
         )
     )
-    total_attendance = result.scalar() or 0
+    row = result.one()
     
-    attendance_rate = (present_count / total_attendance * 100) if total_attendance > 0 else 0
+    attendance_rate = (row.present / row.marked * 100) if row.marked > 0 else 0
     
-    # Recent admissions (last 30 days)
-    thirty_days_ago = date.today() - timedelta(days=30)
-    result = await db.execute(
-        select(func.count(Student.id)).where(
-            and_(
-                Student.school_id == user.school_id,
-                Student.is_active == True,
-                Student.date_of_admission >= thirty_days_ago
-            )
-        )
-    )
-    recent_admissions = result.scalar() or 0
-    
-    return DashboardStats(
-        total_students=total_students,
-        total_classes=total_classes,
-        pending_fees=pending_fees,
+    stats = DashboardStats(
+        total_students=row.total_students,
+        total_classes=row.total_classes,
+        pending_fees=row.pending_fees,
         today_attendance_rate=round(attendance_rate, 1),
-        recent_admissions=recent_admissions
+        recent_admissions=row.recent_admissions
     )
+    dashboard_cache.set(user.school_id, stats)
+    return stats
+
+async def get_assigned_classes(db: AsyncSession, user: CurrentUser) -> List[str]:
+    result = await db.execute(select(TeacherClass.class_name).where(TeacherClass.user_id == user.id))
+    order = {c: i for i, c in enumerate(ALL_CLASSES)}
+    return sorted(result.scalars().all(), key=lambda c: (order.get(c, len(order)), c))
 
 @api_router.get("/classes")
-async def get_classes(user: User = Depends(get_current_user)):
+async def get_classes(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Get list of all classes - for teachers, only assigned classes"""
-    all_classes = [f"Class {i}" for i in range(1, 13)]
-    
-    if user.role == "teacher" and user.assigned_classes:
-        assigned = user.assigned_classes.split(',')
-        return {"classes": [c for c in all_classes if c in assigned]}
+    if user.role == "teacher":
+        assigned = await get_assigned_classes(db, user)
+        if assigned:
+            return {"classes": [c for c in ALL_CLASSES if c in assigned]}
     
-    return {"classes": all_classes}
+    return {"classes": ALL_CLASSES}
 
 @api_router.get("/my-classes")
-async def get_my_classes(user: User = Depends(get_current_user)):
+async def get_my_classes(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """Get current user's assigned classes"""
-    if user.role == "teacher" and user.assigned_classes:
-        return {"classes": user.assigned_classes.split(',')}
-    return {"classes": [f"Class {i}" for i in range(1, 13)]}
+    if user.role == "teacher":
+        assigned = await get_assigned_classes(db, user)
+        if assigned:
+            return {"classes": assigned}
+    return {"classes": ALL_CLASSES}
+
+@api_router.get("/classes/{class_name}/teachers", response_model=List[UserResponse])
+async def get_class_teachers(class_name: str, user: CurrentUser = Depends(require_principal), db: AsyncSession = Depends(get_db)):
+    """Get the teachers assigned to a class - Principal only"""
+    result = await db.execute(
+        select(User).join(TeacherClass, TeacherClass.user_id == User.id).where(
+            and_(TeacherClass.school_id == user.school_id, TeacherClass.class_name == class_name)
+        ).order_by(User.name)
+    )
+    return [UserResponse.model_validate(t) for t in result.scalars().all()]
 
 # Health check
 @api_router.get("/")
@@ -979,9 +2249,58 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def health_ready(response: Response):
+    """Readiness: warm-up finished and every database answers SELECT 1"""
+    databases = {}
+    for name, db_engine in engines.items():
+        try:
+            await ping(db_engine)
+            databases[name] = "ok"
+        except Exception as e:
+            databases[name] = f"{type(e).__name__}: {e}"
+    
+    ready = warmup_state.ready and all(status == "ok" for status in databases.values())
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "not ready", "databases": databases, "warmup": warmup_state.report()}
+
+@api_router.get("/health/cache")
+async def health_cache():
+    """Hit/miss counters of the in-process caches"""
+    return cache_stats()
+
+@api_router.get("/metrics")
+async def metrics():
+    """Request latency histograms and connection pool gauges (Prometheus text format)"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@api_router.get("/health/outbox")
+async def health_outbox():
+    """Throughput of the in-process outbox workers, if any"""
+    if outbox_pool is None:
+        return {"workers": 0}
+    return outbox_pool.stats()
+
 # Include router
 app.include_router(api_router)
 
+# Per-request SQL statistics
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+app.add_middleware(QueryStatsMiddleware)
+
+# Latency histograms and pool gauges, see /api/metrics
+register_engine("primary", engine)
+if read_engine is not engine:
+    register_engine("replica", read_engine)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -989,8 +2308,38 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, DB_ROUTE_HEADER, READ_YOUR_WRITES_HEADER, "X-DB-Queries", "X-DB-Time-Ms", "X-DB-Slowest-Ms"],
 )
 
+# Outermost, so the latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
+# Notification delivery workers, when not run as a separate outbox.py process
+outbox_pool: Optional[OutboxWorkerPool] = None
+
+# Background warm-up task; /api/health/ready reports when it is done
+warmup_task: Optional[asyncio.Task] = None
+
+# Creates upcoming attendance partitions daily
+partition_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def startup():
+    global outbox_pool, warmup_task, partition_task
+    warmup_task = asyncio.create_task(warm_up(app, engines))
+    partition_task = asyncio.create_task(maintain_partitions(engine))
+    if OUTBOX_WORKERS > 0:
+        outbox_pool = OutboxWorkerPool(OUTBOX_WORKERS)
+        outbox_pool.start()
+
 @app.on_event("shutdown")
 async def shutdown():
+    for task in (warmup_task, partition_task):
+        if task is not None:
+            task.cancel()
+    if outbox_pool is not None:
+        await outbox_pool.stop()
+    password_hasher.shutdown()
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
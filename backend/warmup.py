@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict
+
+from sqlalchemy import text
+
+from hashing import password_hasher
+
+WARMUP_DB_CONNECTIONS = int(os.environ.get('WARMUP_DB_CONNECTIONS', 2))
+WARMUP_RETRY_MAX_SECONDS = float(os.environ.get('WARMUP_RETRY_MAX_SECONDS', 30))
+HEALTH_DB_TIMEOUT = float(os.environ.get('HEALTH_DB_TIMEOUT', 2))
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """Progress of the start-up warm-up, reported by the readiness probe"""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at = time.monotonic()
+        self.steps: Dict[str, float] = {}  # step -> seconds taken
+        self.last_error = None
+        # Whether every database has pg_trgm, which typo-tolerant search needs
+        self.trigram_search = False
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "steps_ms": {step: round(seconds * 1000, 1) for step, seconds in self.steps.items()},
+            "last_error": self.last_error,
+            "trigram_search": self.trigram_search,
+        }
+
+
+warmup_state = WarmupState()
+
+
+async def _timed(step: str, coro):
+    start = time.monotonic()
+    await coro
+    warmup_state.steps[step] = time.monotonic() - start
+
+
+async def ping(engine, timeout: float = HEALTH_DB_TIMEOUT):
+    """Run SELECT 1 on a pooled connection"""
+    async def select_one():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await asyncio.wait_for(select_one(), timeout)
+
+
+async def warm_pool(engine, connections: int):
+    """Open ``connections`` pooled connections at once so first requests find them idle"""
+    connections = min(connections, engine.pool.size())
+    await asyncio.gather(*[ping(engine, timeout=30) for _ in range(connections)])
+
+
+async def has_extension(engine, name: str) -> bool:
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = :name"), {"name": name})
+        return result.scalar() is not None
+
+
+async def warm_hasher():
+    # Loads the bcrypt backend and starts a hashing thread
+    await password_hasher.hash("warm-up")
+
+
+async def warm_up(app, engines: Dict[str, object]):
+    """Warm the pools, the password hasher and the Pydantic schemas, then mark ready.
+
+    Database steps are retried with backoff until the database is reachable.
+    Until they finish, search runs without the pg_trgm operators.
+    """
+    await _timed("hasher", warm_hasher())
+    start = time.monotonic()
+    # Builds the JSON schema of every request and response model once
+    app.openapi()
+    warmup_state.steps["schemas"] = time.monotonic() - start
+
+    delay = 1.0
+    while True:
+        try:
+            for name, engine in engines.items():
+                await _timed(f"pool:{name}", warm_pool(engine, WARMUP_DB_CONNECTIONS))
+            extensions = [await has_extension(engine, "pg_trgm") for engine in engines.values()]
+            break
+        except Exception as e:
+            warmup_state.last_error = f"{type(e).__name__}: {e}"
+            logger.warning("Warm-up could not reach the database, retrying in %.0fs: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+    warmup_state.trigram_search = all(extensions)
+    if not warmup_state.trigram_search:
+        logger.warning("pg_trgm is not installed, search falls back to substring matching")
+    warmup_state.last_error = None
+    warmup_state.ready = True
+    logger.info("Warm-up finished in %.2fs", time.monotonic() - warmup_state.started_at)
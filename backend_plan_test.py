@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Query plan regression tests for the hot API endpoints.
+
+Seeds a multi-school dataset directly through DATABASE_URL, calls each
+endpoint in-process, captures the SELECTs it runs and fails when EXPLAIN
+shows a sequential scan on a table of PLAN_TEST_SEQ_SCAN_MIN_ROWS rows or
+more. Run against a migrated, disposable database:
+
+    DATABASE_URL=postgresql://... python backend_plan_test.py
+
+The seeded schools and everything under them are deleted at the end.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import String, bindparam, event, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+SEQ_SCAN_MIN_ROWS = int(os.environ.get('PLAN_TEST_SEQ_SCAN_MIN_ROWS', 5000))
+
+SCHOOL_IDS = bindparam("school_ids", type_=ARRAY(String))
+
+SEED_STATEMENTS = [
+    """
+        INSERT INTO students (id, school_id, class_name, admission_number, name, father_name,
+                              parent_contact, parent_phone_e164, date_of_admission, is_active, created_at)
+        SELECT gen_random_uuid()::text, s.id, 'Class ' || (1 + n % 12), 'PLAN-' || n,
+               'Student ' || n, 'Parent ' || n, '98' || lpad(n::text, 8, '0'), '+9198' || lpad(n::text, 8, '0'),
+               current_date - (n % 720), n % 10 <> 0, now()
+        FROM unnest(:school_ids) AS s(id) CROSS JOIN generate_series(1, :students) AS n
+    """,
+    """
+        INSERT INTO fee_bills (id, school_id, name, amount, due_date, created_at)
+        SELECT gen_random_uuid()::text, s.id, 'Fee ' || n, 500 + n % 5 * 100,
+               current_date - n, now() - n * interval '1 day'
+        FROM unnest(:school_ids) AS s(id) CROSS JOIN generate_series(1, :fee_bills) AS n
+    """,
+    # The most recent bills are charged to every active student, most of them paid
+    """
+        INSERT INTO student_fees (id, student_id, fee_bill_id, amount, status, created_at)
+        SELECT gen_random_uuid()::text, st.id, b.id, b.amount,
+               CASE WHEN abs(hashtext(st.id || b.id)) % 100 < 85 THEN 'paid' ELSE 'unpaid' END, b.created_at
+        FROM fee_bills b JOIN students st ON st.school_id = b.school_id AND st.is_active
+        WHERE b.school_id = ANY(:school_ids) AND b.due_date >= current_date - CAST(:charged_bills AS integer)
+    """,
+    """
+        INSERT INTO notifications (id, school_id, title, message, created_at)
+        SELECT gen_random_uuid()::text, s.id, 'Notice ' || n, 'Message ' || n, now() - n * interval '1 hour'
+        FROM unnest(:school_ids) AS s(id) CROSS JOIN generate_series(1, :notifications) AS n
+    """,
+    """
+        SELECT ensure_attendance_partitions(current_date - CAST(:attendance_days AS integer), current_date)
+    """,
+    """
+        INSERT INTO attendance (id, student_id, date, status, created_at)
+        SELECT gen_random_uuid()::text, st.id, current_date - d,
+               CASE WHEN abs(hashtext(st.id || d)) % 10 = 0 THEN 'absent' ELSE 'present' END, now()
+        FROM students st CROSS JOIN generate_series(0, :attendance_days - 1) AS d
+        WHERE st.school_id = ANY(:school_ids) AND st.is_active
+    """,
+]
+
+ANALYZED_TABLES = ["schools", "users", "teacher_classes", "students", "fee_bills", "student_fees", "notifications", "attendance"]
+
+
+def index_names(plan: dict) -> List[str]:
+    """Indexes read anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        found += index_names(child)
+    return found
+
+
+def seq_scans(plan: dict) -> List[str]:
+    """Relations read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+class QueryPlanTester:
+    def __init__(self, args):
+        self.args = args
+        self.client = None
+        self.engines = []
+        self.principal_token = None
+        self.teacher_token = None
+        self.school_ids = []
+        self.student_id = None
+        self.table_rows: Dict[str, float] = {}
+        self.captured: Optional[list] = None
+        self.tests_run = 0
+        self.tests_passed = 0
+
+        suffix = datetime.now().strftime('%H%M%S%f')
+        self.principal = {"email": f"plan{suffix}@plantestschool.com", "password": "PlanPass123!"}
+        self.teacher = {"email": f"plan-teacher{suffix}@plantestschool.com", "password": "PlanPass123!"}
+
+    def log_result(self, test_name: str, success: bool, details: str = ""):
+        """Log test result"""
+        self.tests_run += 1
+        if success:
+            self.tests_passed += 1
+            print(f"✅ {test_name} - PASSED")
+        else:
+            print(f"❌ {test_name} - FAILED: {details}")
+
+    def capture(self, conn, cursor, statement, parameters, context, executemany):
+        if self.captured is not None and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.captured.append((statement, parameters))
+
+    async def post(self, endpoint: str, data: dict, token: str = None) -> dict:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = await self.client.post(f"/api{endpoint}", json=data, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def setup(self):
+        """Register the school under test, seed it and a crowd of other schools, then ANALYZE"""
+        body = await self.post("/auth/register-school", {
+            "school_name": "Plan Test School",
+            "user_name": "Plan Principal",
+            "user_email": self.principal["email"],
+            "user_password": self.principal["password"],
+        })
+        self.principal_token = body["access_token"]
+        school_id = body["school"]["id"]
+        self.school_ids = [school_id]
+
+        await self.post("/teachers", {
+            "name": "Plan Teacher",
+            "assigned_classes": ["Class 3", "Class 4"],
+            **self.teacher,
+        }, token=self.principal_token)
+        self.teacher_token = (await self.post("/auth/login", self.teacher))["access_token"]
+
+        from database import engine
+        params = {
+            "students": self.args.students,
+            "fee_bills": self.args.fee_bills,
+            "charged_bills": self.args.charged_bills,
+            "notifications": self.args.notifications,
+            "attendance_days": self.args.attendance_days,
+        }
+        async with engine.begin() as conn:
+            result = await conn.execute(text("""
+                INSERT INTO schools (id, name, created_at)
+                SELECT gen_random_uuid()::text, 'Plan Test School ' || n, now() FROM generate_series(1, :count) AS n
+                RETURNING id
+            """), {"count": self.args.schools - 1})
+            self.school_ids = [school_id, *result.scalars()]
+            for statement in SEED_STATEMENTS:
+                query = text(statement)
+                if ":school_ids" in statement:
+                    query = query.bindparams(SCHOOL_IDS)
+                names = set(query.compile().params)
+                await conn.execute(query, {k: v for k, v in {**params, "school_ids": self.school_ids}.items() if k in names})
+
+            result = await conn.execute(text("""
+                SELECT id FROM students WHERE school_id = :school_id AND class_name = 'Class 3' AND is_active LIMIT 1
+            """), {"school_id": school_id})
+            self.student_id = result.scalar_one()
+
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(f"ANALYZE {', '.join(ANALYZED_TABLES)}"))
+            result = await conn.execute(text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'"))
+            self.table_rows = dict(result.all())
+
+    async def cleanup(self):
+        from database import engine
+        if not self.school_ids:
+            return
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM schools WHERE id = ANY(:school_ids)").bindparams(SCHOOL_IDS),
+                               {"school_ids": self.school_ids})
+        print(f"🧹 Deleted {len(self.school_ids)} seeded schools")
+
+    async def explain(self, statement: str, parameters) -> dict:
+        from database import engine
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()
+        return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+    async def check_endpoint(self, name: str, endpoint: str, params: dict = None, token: str = None, indexes: dict = None):
+        """Call an endpoint, and its second page if it has one, and EXPLAIN every SELECT it ran
+
+        ``indexes`` maps tables to an index that one of the plans must read,
+        checked like sequential scans only on tables of SEQ_SCAN_MIN_ROWS rows or more.
+        """
+        headers = {"Authorization": f"Bearer {token or self.principal_token}"}
+        self.captured = []
+        try:
+            response = await self.client.get(f"/api{endpoint}", params=params, headers=headers)
+            cursor = response.headers.get("x-next-cursor")
+            if response.status_code == 200 and cursor:
+                response = await self.client.get(f"/api{endpoint}", params={**(params or {}), "cursor": cursor}, headers=headers)
+        finally:
+            statements, self.captured = self.captured, None
+
+        if response.status_code != 200:
+            self.log_result(name, False, f"Status {response.status_code}: {response.text[:200]}")
+            return
+
+        problems, used = [], set()
+        for statement, parameters in statements:
+            plan = await self.explain(statement, parameters)
+            used.update(index_names(plan))
+            for relation in seq_scans(plan):
+                if self.table_rows.get(relation, 0) >= SEQ_SCAN_MIN_ROWS:
+                    problems.append(f"Seq Scan on {relation} ({self.table_rows[relation]:.0f} rows) in: "
+                                    f"{' '.join(statement.split())[:300]}")
+        problems += [
+            f"{index} not used on {relation} ({self.table_rows[relation]:.0f} rows)"
+            for relation, index in (indexes or {}).items()
+            if index not in used and self.table_rows.get(relation, 0) >= SEQ_SCAN_MIN_ROWS
+        ]
+        self.log_result(name, not problems, "\n   ".join(problems))
+
+    async def run_all_tests(self):
+        """Seed, check every endpoint's plans, clean up"""
+        print("🚀 Starting query plan regression tests...")
+        from server import app
+        from database import engine, read_engine
+
+        self.engines = list({id(e): e for e in (engine, read_engine)}.values())
+        for e in self.engines:
+            event.listen(e.sync_engine, "before_cursor_execute", self.capture)
+
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://plan-test", timeout=60) as client:
+                self.client = client
+                await self.setup()
+                print(f"📦 Seeded {len(self.school_ids)} schools of {self.args.students} students")
+
+                # The hot path indexes of migration a93e5d1c7f20
+                await self.check_endpoint("Students", "/students", indexes={"students": "idx_student_active_school_class_name"})
+                await self.check_endpoint("Students by class", "/students", {"class_name": "Class 5"},
+                                          indexes={"students": "idx_student_active_school_class_name"})
+                await self.check_endpoint("Students as teacher", "/students", token=self.teacher_token)
+                await self.check_endpoint("Dashboard stats", "/dashboard/stats", indexes={"student_fees": "idx_student_fee_unpaid_student"})
+                await self.check_endpoint("Fee bills", "/fee-bills", indexes={"fee_bills": "idx_fee_bill_school_created"})
+                await self.check_endpoint("Notifications", "/notifications", indexes={"notifications": "idx_notification_school_created"})
+                await self.check_endpoint("Student fees", f"/students/{self.student_id}/fees")
+                await self.check_endpoint("Student attendance", f"/students/{self.student_id}/attendance")
+                await self.check_endpoint("Student attendance as teacher", f"/students/{self.student_id}/attendance",
+                                          token=self.teacher_token)
+        except Exception as e:
+            self.log_result("Plan checks", False, f"{type(e).__name__}: {e}")
+        finally:
+            await self.cleanup()
+            for e in self.engines:
+                event.remove(e.sync_engine, "before_cursor_execute", self.capture)
+                await e.dispose()
+
+        print(f"\n📊 Test Results Summary:")
+        print(f"   Tests Run: {self.tests_run}")
+        print(f"   Tests Passed: {self.tests_passed}")
+        print(f"   Tests Failed: {self.tests_run - self.tests_passed}")
+
+        return self.tests_run > 0 and self.tests_passed == self.tests_run
+
+
+def main():
+    """Main test runner"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schools", type=int, default=30)
+    parser.add_argument("--students", type=int, default=500, help="per school")
+    parser.add_argument("--fee-bills", type=int, default=200, help="per school")
+    parser.add_argument("--charged-bills", type=int, default=10, help="most recent bills charged to every student")
+    parser.add_argument("--notifications", type=int, default=300, help="per school")
+    parser.add_argument("--attendance-days", type=int, default=20)
+    args = parser.parse_args()
+
+    tester = QueryPlanTester(args)
+    success = asyncio.run(tester.run_all_tests())
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,19 @@
 
 import requests
 import sys
+import os
+import io
+import csv
 import json
-from datetime import datetime, date
+import time
+import socket
+import subprocess
+import asyncio
+import tempfile
+from pathlib import Path
+from datetime import datetime, date, timedelta
 from typing import Dict, Any, Optional
+from urllib.parse import unquote
 
 class SchoolAdminAPITester:
     def __init__(self, base_url: str = "https://scholify-manage.preview.emergentagent.com"):
@@ -22,6 +32,7 @@ class SchoolAdminAPITester:
         self.test_user_password = "TestPass123!"
         self.test_student_id = None
         self.test_fee_bill_id = None
+        self.other_school = None
 
     def log_result(self, test_name: str, success: bool, details: str = "", response_data: Any = None):
         """Log test result"""
@@ -39,13 +50,14 @@ class SchoolAdminAPITester:
             "response_data": response_data
         })
 
-    def make_request(self, method: str, endpoint: str, data: Dict = None, params: Dict = None) -> tuple:
+    def make_request(self, method: str, endpoint: str, data: Dict = None, params: Dict = None, token: str = None) -> tuple:
         """Make HTTP request with proper headers"""
         url = f"{self.base_url}/api/{endpoint.lstrip('/')}"
         headers = {'Content-Type': 'application/json'}
         
-        if self.token:
-            headers['Authorization'] = f'Bearer {self.token}'
+        token = token or self.token
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
         
         try:
             if method == 'GET':
@@ -85,6 +97,48 @@ class SchoolAdminAPITester:
         self.log_result("API Health Endpoint", success, 
                        f"Status: {status_code}" if not success else "", data)
 
+    def test_readiness_without_database(self):
+        """Test that a server whose database is unreachable is live but not ready
+
+        Starts a second server on a free port, with DATABASE_URL pointing at a
+        closed port.
+        """
+        print("\n🔍 Testing Readiness Without Database...")
+        
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        env = {**os.environ, "DATABASE_URL": "postgresql://postgres@127.0.0.1:1/school", "OUTBOX_WORKERS": "0"}
+        env.pop("DATABASE_READ_URL", None)
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port)],
+                                  cwd=Path(__file__).parent / "backend", env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            live = None
+            for _ in range(60):
+                try:
+                    live = requests.get(f"http://127.0.0.1:{port}/api/health/live", timeout=5)
+                    break
+                except requests.exceptions.ConnectionError:
+                    time.sleep(0.5)
+            ready = requests.get(f"http://127.0.0.1:{port}/api/health/ready", timeout=30)
+            data = ready.json()
+            success = (live is not None and live.status_code == 200 and ready.status_code == 503 and
+                       data['status'] == "not ready" and data['databases']['primary'] != "ok" and
+                       data['warmup']['ready'] is False)
+            self.log_result("Readiness 503 Without Database", success,
+                           f"Live: {live and live.status_code}, Ready: {ready.status_code} {data}" if not success else "")
+        except requests.exceptions.RequestException as e:
+            self.log_result("Readiness 503 Without Database", False, str(e))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        
+        # The server under test has its database
+        response = requests.get(f"{self.base_url}/api/health/ready", timeout=30)
+        success = response.status_code == 200 and response.json()['status'] == "ready"
+        self.log_result("Readiness 200 With Database", success, f"Status: {response.status_code}, Data: {response.text}" if not success else "")
+
     def test_school_registration(self):
         """Test school registration"""
         print("\n🔍 Testing School Registration...")
@@ -229,6 +283,94 @@ class SchoolAdminAPITester:
             self.log_result("Update Student", success, 
                            f"Status: {status_code}" if not success else "", data)
 
+    def test_search(self):
+        """Test ranked search: escaped wildcards, every column searched, typo-tolerant fallback
+
+        The typo checks need pg_trgm; the server reports it under warmup in
+        /health/ready and they are skipped without it.
+        """
+        print("\n🔍 Testing Search...")
+        
+        student_ids = []
+        for name, father in [("Search 50% Quota", "Mohan Das"), ("Search Under_Score", "Harish Rao"),
+                             ("Search Plain", "Venkatesh Iyer"), ("Meenakshi Sundaram", "Gopal Sundaram")]:
+            status_code, data = self.make_request('POST', '/students', {
+                "class_name": "Class 8",
+                "admission_number": f"SRCH{datetime.now().strftime('%H%M%S%f')}",
+                "name": name,
+                "father_name": father,
+                "parent_contact": "+91-9876500061",
+                "date_of_admission": date.today().isoformat()
+            })
+            if status_code == 200:
+                student_ids.append(data['id'])
+        
+        def titles(q):
+            status_code, data = self.make_request('GET', '/search', params={"q": q})
+            return [r['title'] for r in data if r['type'] == "student"] if status_code == 200 else data
+        
+        def listed(q):
+            status_code, data = self.make_request('GET', '/students', params={"search": q, "class_name": "Class 8"})
+            return sorted(s['name'] for s in data) if status_code == 200 else data
+        
+        # % and _ are literal characters, not LIKE wildcards
+        for q, expected in [("%", ["Search 50% Quota"]), ("_", ["Search Under_Score"])]:
+            success = titles(q) == expected and listed(q) == expected
+            self.log_result(f"Search Escapes {q}", success,
+                           f"/search: {titles(q)}, /students: {listed(q)}" if not success else "")
+        
+        success = titles("Venkatesh") == ["Search Plain"] and listed("Venkatesh") == ["Search Plain"]
+        self.log_result("Search Matches Father Name", success,
+                       f"/search: {titles('Venkatesh')}, /students: {listed('Venkatesh')}" if not success else "")
+        
+        response = requests.get(f"{self.base_url}/api/health/ready", timeout=30)
+        if not response.json().get('warmup', {}).get('trigram_search'):
+            print("   Skipping typo-tolerant search: the server has no pg_trgm")
+        else:
+            status_code, data = self.make_request('GET', '/search', params={"q": "Meenakshy"})
+            students = [r for r in data if r['type'] == "student"] if status_code == 200 else []
+            success = (len(students) == 1 and students[0]['title'] == "Meenakshi Sundaram" and
+                       0 < students[0]['score'] < 1 and listed("Meenakshy") == ["Meenakshi Sundaram"])
+            self.log_result("Search Tolerates Typos", success, f"Status: {status_code}, Data: {data}" if not success else "")
+            
+            # Typo in a column other than the name
+            success = titles("Venkatesj Iyer") == ["Search Plain"] and listed("Venkatesj Iyer") == ["Search Plain"]
+            self.log_result("Search Tolerates Typos In Every Column", success,
+                           f"/search: {titles('Venkatesj Iyer')}, /students: {listed('Venkatesj Iyer')}" if not success else "")
+        
+        for student_id in student_ids:
+            self.make_request('DELETE', f'/students/{student_id}')
+
+    def test_student_import(self):
+        """Test CSV student import with one invalid row"""
+        print("\n🔍 Testing Student Import...")
+        
+        suffix = datetime.now().strftime('%H%M%S%f')
+        csv_body = "\n".join([
+            "class_name,admission_number,name,parent_contact,date_of_admission",
+            f"Class 8,IMP{suffix}-1,Import Student One,+91-9876500011,2024-06-01",
+            f"Class 8,IMP{suffix}-2,Import Student Two,+91-9876500012,not-a-date",
+            f"Class 8,IMP{suffix}-3,Import Student Three,+91-9876500013,2024-06-01",
+        ]) + "\n"
+        response = requests.post(f"{self.base_url}/api/students/import",
+                                 headers={'Authorization': f'Bearer {self.token}'},
+                                 files={'file': ('students.csv', csv_body, 'text/csv')}, timeout=60)
+        data = response.json() if response.ok else {"text": response.text}
+        errors = data.get('errors', [])
+        success = (response.status_code == 200 and data.get('imported') == 2 and data.get('failed') == 1 and
+                   len(errors) == 1 and errors[0]['row'] == 3 and errors[0]['admission_number'] == f"IMP{suffix}-2" and
+                   any(e.startswith("date_of_admission") for e in errors[0]['errors']))
+        self.log_result("Import Students With One Bad Row", success,
+                       f"Status: {response.status_code}, Data: {data}" if not success else "", data)
+        
+        status_code, data = self.make_request('GET', '/students', params={"class_name": "Class 8"})
+        data = [s for s in data if s['admission_number'].startswith(f"IMP{suffix}")] if status_code == 200 else []
+        imported = sorted(s['admission_number'] for s in data) if status_code == 200 else None
+        success = imported == [f"IMP{suffix}-1", f"IMP{suffix}-3"]
+        self.log_result("Imported Students Stored", success, f"Admission numbers: {imported}" if not success else "")
+        for student in data:
+            self.make_request('DELETE', f"/students/{student['id']}")
+
     def test_fee_management(self):
         """Test fee management operations"""
         print("\n🔍 Testing Fee Management...")
@@ -263,6 +405,271 @@ class SchoolAdminAPITester:
             self.log_result("Get Fee Bill Students", success, 
                            f"Status: {status_code}" if not success else "", data)
 
+    def test_fee_fan_out(self):
+        """Test that a fee bill reaches every active student of its class once"""
+        print("\n🔍 Testing Fee Fan-Out...")
+        
+        def add_student(key):
+            status_code, data = self.make_request('POST', '/students', {
+                "class_name": "Class 2",
+                "admission_number": f"FAN{datetime.now().strftime('%H%M%S%f')}",
+                "name": f"Fan-Out Student {key}",
+                "parent_contact": "+91-9876500051",
+                "date_of_admission": date.today().isoformat()
+            })
+            return data['id'] if status_code == 200 else None
+        
+        student_ids = [add_student(key) for key in ("active_1", "active_2", "inactive")]
+        if None in student_ids:
+            self.log_result("Fee Fan-Out", False, "Could not create students", None)
+            return
+        self.make_request('PUT', f'/students/{student_ids[2]}', {"is_active": False})
+        active = {s['id'] for s in self.export_rows('students', {"class_name": "Class 2"})}
+        
+        status_code, bill = self.make_request('POST', '/fee-bills', {"name": "Fan-Out Fee", "amount": 750.0, "target_class": "Class 2"})
+        _, fees = self.make_request('GET', f"/fee-bills/{bill.get('id')}/students")
+        billed = [f['student_id'] for f in fees] if isinstance(fees, list) else fees
+        success = (status_code == 200 and bill['assigned_count'] == len(active) and
+                   sorted(billed) == sorted(active) and student_ids[2] not in billed and
+                   all(f['amount'] == 750.0 and f['status'] == "unpaid" for f in fees))
+        self.log_result("Fee Bill Reaches Active Class Students", success,
+                       f"Assigned: {bill.get('assigned_count')}, Billed: {billed}, Active: {active}" if not success else "")
+        
+        late_id = add_student("late")
+        student_ids.append(late_id)
+        status_code, first = self.make_request('POST', f"/fee-bills/{bill['id']}/apply")
+        status_code, second = self.make_request('POST', f"/fee-bills/{bill['id']}/apply")
+        _, fees = self.make_request('GET', f"/fee-bills/{bill['id']}/students")
+        success = (status_code == 200 and first['assigned_count'] == 1 and second['assigned_count'] == 0 and
+                   len(fees) == len(active) + 1 and late_id in {f['student_id'] for f in fees})
+        self.log_result("Fee Bill Re-Apply Adds Only New Students", success,
+                       f"First: {first}, Second: {second}, Fees: {len(fees)}" if not success else "")
+        
+        for student_id in student_ids:
+            self.make_request('DELETE', f'/students/{student_id}')
+
+    def test_batch_mark_paid(self):
+        """Test batch mark-paid with a mix of paid, unpaid and unknown fee IDs"""
+        print("\n🔍 Testing Batch Mark Paid...")
+        
+        if not self.test_student_id:
+            self.log_result("Batch Mark Paid", False, "No student ID available", None)
+            return
+        
+        # Two bills for the test student's class, one of them paid up front
+        fee_ids = []
+        for name in ["Lab Fee", "Library Fee"]:
+            status_code, bill = self.make_request('POST', '/fee-bills', {
+                "name": name, "amount": 750.0, "target_class": "Class 5"
+            })
+            status_code, fees = self.make_request('GET', f"/fee-bills/{bill.get('id')}/students")
+            fee_ids += [f['id'] for f in fees if f.get('student_id') == self.test_student_id] if status_code == 200 else []
+        if len(fee_ids) != 2:
+            self.log_result("Batch Mark Paid", False, f"Expected 2 student fees, got {fee_ids}", None)
+            return
+        paid_id, unpaid_id = fee_ids
+        status_code, paid_fee = self.make_request('PUT', f'/student-fees/{paid_id}/mark-paid', {})
+        
+        missing_id = "00000000-0000-0000-0000-000000000000"
+        status_code, data = self.make_request('PUT', '/student-fees/mark-paid', {
+            "fee_ids": [paid_id, unpaid_id, missing_id],
+            "remarks": "Paid at counter"
+        })
+        outcomes = {r['fee_id']: r['outcome'] for r in data.get('results', [])} if status_code == 200 else {}
+        success = (status_code == 200 and
+                   (data['paid'], data['already_paid'], data['not_found']) == (1, 1, 1) and
+                   outcomes == {paid_id: "already_paid", unpaid_id: "paid", missing_id: "not_found"})
+        self.log_result("Batch Mark Paid Outcomes", success,
+                       f"Status: {status_code}, Data: {data}" if not success else "", data)
+        
+        status_code, fees = self.make_request('GET', f'/students/{self.test_student_id}/fees')
+        stored = {f['id']: f for f in fees} if status_code == 200 else {}
+        newly_paid = stored.get(unpaid_id, {})
+        already_paid = stored.get(paid_id, {})
+        success = (newly_paid.get('status') == "paid" and newly_paid.get('paid_at') is not None and
+                   newly_paid.get('marked_by') == self.user_id and newly_paid.get('remarks') == "Paid at counter" and
+                   already_paid.get('paid_at') == paid_fee.get('paid_at') and already_paid.get('remarks') is None)
+        self.log_result("Batch Mark Paid Stored", success,
+                       f"Fees: {[newly_paid, already_paid]}" if not success else "")
+
+    def test_fee_summary(self):
+        """Test that the per-class fee summary matches a bill's student fees and follows payments"""
+        print("\n🔍 Testing Fee Summary...")
+        
+        status_code, bill = self.make_request('POST', '/fee-bills', {"name": "Summary Fee", "amount": 300.0})
+        if status_code != 200 or not bill['assigned_count']:
+            self.log_result("Fee Summary", False, f"Status: {status_code}, Data: {bill}", None)
+            return
+        
+        def expected_classes():
+            fees, _ = self.walk_pages(f"/fee-bills/{bill['id']}/students", {"limit": 500})
+            classes = {}
+            for fee in fees:
+                c = classes.setdefault(fee['student_class'], {"class_name": fee['student_class'], "paid_count": 0,
+                                                              "unpaid_count": 0, "paid_amount": 0, "unpaid_amount": 0})
+                c[f"{fee['status']}_count"] += 1
+                c[f"{fee['status']}_amount"] += fee['amount']
+            return fees, sorted(classes.values(), key=lambda c: c['class_name'])
+        
+        def summary_classes():
+            status_code, data = self.make_request('GET', '/fee-bills/summary')
+            summary = next((s for s in data if s['fee_bill_id'] == bill['id']), None) if status_code == 200 else None
+            return summary and summary['classes']
+        
+        fees, expected = expected_classes()
+        actual = summary_classes()
+        success = actual == expected
+        self.log_result("Fee Summary Matches Student Fees", success,
+                       f"Summary: {actual}, Expected: {expected}" if not success else "")
+        
+        # Paying a fee must show up despite the cached summary
+        self.make_request('PUT', f"/student-fees/{fees[0]['id']}/mark-paid", {"remarks": "Summary test"})
+        _, expected_after = expected_classes()
+        actual = summary_classes()
+        success = actual == expected_after and expected_after != expected
+        self.log_result("Fee Summary Follows Payment", success,
+                       f"Summary: {actual}, Expected: {expected_after}" if not success else "")
+
+    def walk_pages(self, endpoint: str, params: Dict = None, token: str = None) -> tuple:
+        """Follow X-Next-Cursor to the end of a list endpoint, returning (rows, page count)"""
+        headers = {'Authorization': f'Bearer {token or self.token}'}
+        params = dict(params or {})
+        rows, pages = [], 0
+        while True:
+            response = requests.get(f"{self.base_url}/api{endpoint}", headers=headers, params=params, timeout=30)
+            response.raise_for_status()
+            rows += response.json()
+            pages += 1
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                return rows, pages
+            params['cursor'] = cursor
+
+    def test_pagination(self):
+        """Test cursor walks and field projection on list endpoints"""
+        print("\n🔍 Testing Pagination...")
+        
+        # Same-named students and bills so pages split inside ties of the sort key
+        student_ids = []
+        for n in range(5):
+            status_code, data = self.make_request('POST', '/students', {
+                "class_name": "Class 7",
+                "admission_number": f"PAGE{datetime.now().strftime('%H%M%S%f')}",
+                "name": "Page Student",
+                "parent_contact": "+91-9876500001",
+                "date_of_admission": date.today().isoformat()
+            })
+            if status_code == 200:
+                student_ids.append(data['id'])
+        for n in range(3):
+            self.make_request('POST', '/fee-bills', {"name": "Page Fee", "amount": 100.0, "target_class": "Class 7"})
+        
+        for endpoint in ['/students', '/fee-bills']:
+            try:
+                full, _ = self.walk_pages(endpoint, {"limit": 500})
+                walked, pages = self.walk_pages(endpoint, {"limit": 2})
+            except requests.exceptions.RequestException as e:
+                self.log_result(f"Cursor Walk {endpoint}", False, str(e))
+                continue
+            full_ids = [r['id'] for r in full]
+            walked_ids = [r['id'] for r in walked]
+            success = (len(full_ids) >= 5 and pages == (len(full_ids) + 1) // 2 and
+                       len(set(walked_ids)) == len(walked_ids) and walked_ids == full_ids)
+            self.log_result(f"Cursor Walk {endpoint}", success,
+                           f"{pages} pages, walked {walked_ids} vs {full_ids}" if not success else "")
+        
+        for endpoint in ['/students', '/fee-bills']:
+            status_code, data = self.make_request('GET', endpoint, params={"fields": "id,name"})
+            success = (status_code == 200 and len(data) > 0 and
+                       all(set(row) == {"id", "name"} for row in data))
+            self.log_result(f"Field Projection {endpoint}", success,
+                           f"Status: {status_code}, Data: {data[:2] if isinstance(data, list) else data}" if not success else "")
+        
+        for student_id in student_ids:
+            self.make_request('DELETE', f'/students/{student_id}')
+
+    def test_exports(self):
+        """Test that CSV and NDJSON exports hold the same rows as the paginated list endpoints"""
+        print("\n🔍 Testing Exports...")
+        
+        def normalized(row):
+            # Lists render UTC timestamps with a Z suffix, exports with +00:00
+            return {k: datetime.fromisoformat(v) if k.endswith('_at') and v else v for k, v in row.items()}
+        
+        try:
+            students, _ = self.walk_pages('/students', {"limit": 2})
+            fees, _ = self.walk_pages(f'/fee-bills/{self.test_fee_bill_id}/students', {"limit": 2})
+            exported_students = self.export_rows('students')
+            exported_fees = self.export_rows('student-fees', {"fee_bill_id": self.test_fee_bill_id})
+            response = requests.get(f"{self.base_url}/api/exports/students", headers={'Authorization': f'Bearer {self.token}'},
+                                    params={"format": "csv"}, timeout=30)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self.log_result("Exports", False, str(e))
+            return
+        
+        for name, listed, exported in [("Students", students, exported_students), ("Student Fees", fees, exported_fees)]:
+            success = len(listed) > 0 and list(map(normalized, exported)) == list(map(normalized, listed))
+            self.log_result(f"NDJSON Export Matches List {name}", success,
+                           f"Listed: {len(listed)} rows, Exported: {len(exported)} rows" if not success else "")
+        
+        csv_rows = list(csv.DictReader(io.StringIO(response.text)))
+        success = ([r['id'] for r in csv_rows] == [s['id'] for s in students] and
+                   list(csv_rows[0]) == list(students[0]) and
+                   all(r['name'] == s['name'] and r['admission_number'] == s['admission_number']
+                       for r, s in zip(csv_rows, students)))
+        self.log_result("CSV Export Matches List Students", success,
+                       f"CSV: {[r['id'] for r in csv_rows]}, Listed: {[s['id'] for s in students]}" if not success else "")
+
+    def test_promotion(self):
+        """Test that a promotion dry run predicts the real run and moves only mapped classes"""
+        print("\n🔍 Testing Student Promotion...")
+        
+        students = {}
+        for key, class_name in [("moving_1", "Class 10"), ("moving_2", "Class 10"),
+                                ("graduating", "Class 12"), ("unmapped", "Class 11")]:
+            status_code, data = self.make_request('POST', '/students', {
+                "class_name": class_name,
+                "admission_number": f"PROM{datetime.now().strftime('%H%M%S%f')}",
+                "name": f"Promotion Student {key}",
+                "parent_contact": "+91-9876500021",
+                "date_of_admission": date.today().isoformat()
+            })
+            if status_code != 200:
+                self.log_result("Student Promotion", False, f"Could not create student: {data}", None)
+                return
+            students[key] = data['id']
+        
+        mapping = {"Class 10": "Class 11", "Class 12": None}
+        dry_status, dry_run = self.make_request('POST', '/students/promote', {"dry_run": True, "mapping": mapping})
+        real_status, real_run = self.make_request('POST', '/students/promote', {"dry_run": False, "mapping": mapping})
+        success = (dry_status == 200 and real_status == 200 and
+                   (dry_run['promoted'], dry_run['graduated']) == (2, 1) and
+                   (real_run['promoted'], real_run['graduated']) == (dry_run['promoted'], dry_run['graduated']) and
+                   real_run['classes'] == dry_run['classes'])
+        self.log_result("Promotion Dry Run Matches Real Run", success,
+                       f"Dry run: {dry_run}, Real run: {real_run}" if not success else "", real_run)
+        
+        expected = {
+            "moving_1": ("Class 11", True),
+            "moving_2": ("Class 11", True),
+            "graduating": ("Class 12", False),
+            "unmapped": ("Class 11", True),
+            "test_student": ("Class 5", True),
+        }
+        students["test_student"] = self.test_student_id
+        actual = {}
+        for key, student_id in students.items():
+            status_code, data = self.make_request('GET', f'/students/{student_id}')
+            actual[key] = (data.get('class_name'), data.get('is_active')) if status_code == 200 else status_code
+        success = actual == expected
+        self.log_result("Promotion Moves Only Mapped Classes", success,
+                       f"Students: {actual}" if not success else "")
+        
+        for key, student_id in students.items():
+            if key != "test_student":
+                self.make_request('DELETE', f'/students/{student_id}')
+
     def test_attendance_system(self):
         """Test attendance marking"""
         print("\n🔍 Testing Attendance System...")
@@ -297,6 +704,363 @@ class SchoolAdminAPITester:
         self.log_result("Get Attendance", success, 
                        f"Status: {status_code}" if not success else "", data)
 
+    def test_student_profile(self):
+        """Test that the profile matches the student, fees and attendance endpoints it replaces"""
+        print("\n🔍 Testing Student Profile...")
+        
+        if not self.test_student_id:
+            self.log_result("Student Profile", False, "No student ID available", None)
+            return
+        student_id = self.test_student_id
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        for day, status in [(yesterday, "absent"), (date.today().isoformat(), "present")]:
+            self.make_request('POST', '/attendance', {"date": day, "records": [{"student_id": student_id, "status": status}]})
+        
+        status_code, profile = self.make_request('GET', f'/students/{student_id}/profile', params={"days": 2, "recent_fees": 1})
+        if status_code != 200:
+            self.log_result("Student Profile", False, f"Status: {status_code}, Data: {profile}", None)
+            return
+        _, student = self.make_request('GET', f'/students/{student_id}')
+        fees, _ = self.walk_pages(f'/students/{student_id}/fees')
+        attendance, _ = self.walk_pages(f'/students/{student_id}/attendance', {"days": 2})
+        
+        success = profile['student'] == student
+        self.log_result("Profile Student Matches", success, f"Profile: {profile['student']}, Student: {student}" if not success else "")
+        
+        summary = profile['fees']
+        paid = [f for f in fees if f['status'] == "paid"]
+        unpaid = [f for f in fees if f['status'] == "unpaid"]
+        success = (len(fees) >= 2 and summary['total_count'] == len(fees) and
+                   (summary['paid_count'], summary['unpaid_count']) == (len(paid), len(unpaid)) and
+                   summary['paid_amount'] == sum(f['amount'] for f in paid) and
+                   summary['unpaid_amount'] == sum(f['amount'] for f in unpaid) and
+                   summary['recent'] == fees[:1])
+        self.log_result("Profile Fees Match", success, f"Summary: {summary}, Fees: {fees}" if not success else "")
+        
+        rest, _ = self.walk_pages(f'/students/{student_id}/fees', {"cursor": summary['next_cursor']}) if summary['next_cursor'] else ([], 0)
+        success = rest == fees[1:]
+        self.log_result("Profile Fees Cursor Continues", success,
+                       f"Cursor: {summary['next_cursor']}, Rest: {rest}, Fees: {fees}" if not success else "")
+        
+        # days=2 is today and yesterday, on both endpoints
+        summary = profile['attendance']
+        dates = [a['date'] for a in summary['recent']]
+        success = (summary['recent'] == attendance and sorted(dates) == [yesterday, date.today().isoformat()] and
+                   summary['marked_days'] == 2 and summary['present_days'] == 1 and summary['absent_days'] == 1)
+        self.log_result("Profile Attendance Matches", success,
+                       f"Summary: {summary}, Attendance: {attendance}" if not success else "")
+
+    def test_attendance_partitions(self):
+        """Test that creating a month's partition moves its rows out of attendance_default
+
+        Runs ensure_attendance_partitions in this process, so it needs
+        DATABASE_URL pointing at the server's database; without it the test is
+        skipped.
+        """
+        print("\n🔍 Testing Attendance Partitions...")
+        
+        if not os.environ.get('DATABASE_URL'):
+            print("   Skipping: DATABASE_URL is not set")
+            return
+        if not self.test_student_id:
+            self.log_result("Attendance Partitions", False, "No student ID available", None)
+            return
+        
+        sys.path.insert(0, str(Path(__file__).parent / "backend"))
+        from sqlalchemy import text
+        from database import engine
+        from partitions import ensure_attendance_partitions
+        
+        # A month far enough ahead that no partition exists for it yet
+        month = date(2100 + int(datetime.now().strftime('%H%M%S')) % 800, 6, 1)
+        day = month.replace(day=15)
+        partition = f"attendance_y{month.year}m06"
+        
+        async def run(statement, **params):
+            async with engine.begin() as conn:
+                return (await conn.execute(text(statement), params)).all()
+        
+        async def check():
+            try:
+                status_code, data = self.make_request('POST', '/attendance', {
+                    "date": day.isoformat(), "records": [{"student_id": self.test_student_id, "status": "present"}]
+                })
+                in_default = await run("SELECT count(*) FROM attendance_default WHERE date = :day", day=day)
+                created = await ensure_attendance_partitions(engine, month, month)
+                left = await run("SELECT count(*) FROM attendance_default")
+                moved = await run(f"SELECT student_id FROM {partition} WHERE date = :day", day=day)
+                return status_code, in_default[0][0], created, left[0][0], [r[0] for r in moved]
+            finally:
+                async with engine.begin() as conn:
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+                await engine.dispose()
+        
+        status_code, in_default, created, left, moved = asyncio.run(check())
+        success = (status_code == 200 and in_default == 1 and created == 1 and left == 0 and
+                   moved == [self.test_student_id])
+        self.log_result("Partition Creation Moves Default Rows", success,
+                       f"Status: {status_code}, In default before: {in_default}, Created: {created}, "
+                       f"Left in default: {left}, Moved: {moved}" if not success else "")
+
+    def test_archive(self):
+        """Test archiving a closed academic year and reading it back through the API
+
+        Backdates rows of a new school into the latest closed academic year
+        with SQL, so it needs DATABASE_URL pointing at the server's database;
+        without it the test is skipped. The archive job itself runs in the
+        server.
+        """
+        print("\n🔍 Testing Archive...")
+        
+        if not os.environ.get('DATABASE_URL'):
+            print("   Skipping: DATABASE_URL is not set")
+            return
+        
+        sys.path.insert(0, str(Path(__file__).parent / "backend"))
+        from sqlalchemy import text
+        from database import engine
+        from archive import academic_year_bounds, last_closed_year
+        
+        # A school of its own, as the job archives every closed year of it
+        suffix = datetime.now().strftime('%H%M%S%f')
+        status_code, data = self.make_request('POST', '/auth/register-school', {
+            "school_name": f"Archive School {suffix}",
+            "user_name": "Archive Principal",
+            "user_email": f"archive{suffix}@archiveschool.com",
+            "user_password": "ArchivePass123!"
+        })
+        if status_code != 200:
+            self.log_result("Archive", False, f"Could not register school: {status_code}", data)
+            return
+        token = data['access_token']
+        status_code, student = self.make_request('POST', '/students', {
+            "class_name": "Class 5",
+            "admission_number": f"ARC{suffix}",
+            "name": "Archived Student",
+            "parent_contact": "+91-9876500050",
+            "date_of_admission": "2020-04-01"
+        }, token=token)
+        student_id = student['id']
+        bills = {}
+        for name in ("Settled Fee", "Open Fee"):
+            status_code, bill = self.make_request('POST', '/fee-bills', {"name": name, "amount": 700, "target_class": "Class 5"}, token=token)
+            bills[name] = bill['id']
+        status_code, fees = self.make_request('GET', f"/students/{student_id}/fees", token=token)
+        settled_fee = next(fee['id'] for fee in fees if fee['fee_bill_id'] == bills["Settled Fee"])
+        self.make_request('PUT', f"/student-fees/{settled_fee}/mark-paid", {}, token=token)
+        self.make_request('POST', '/attendance', {
+            "date": date.today().isoformat(), "records": [{"student_id": student_id, "status": "present"}]
+        }, token=token)
+        
+        closed_start, _ = academic_year_bounds(last_closed_year())
+        old_days = [closed_start + timedelta(days=10), closed_start + timedelta(days=11)]
+        billed_at = datetime.combine(closed_start + timedelta(days=5), datetime.min.time())
+        
+        async def backdate():
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text(
+                        "INSERT INTO attendance (id, student_id, date, status, created_at) "
+                        "VALUES (gen_random_uuid(), :student_id, :first, 'present', now()), "
+                        "(gen_random_uuid(), :student_id, :second, 'absent', now())"
+                    ), {"student_id": student_id, "first": old_days[0], "second": old_days[1]})
+                    # The open bill is a day newer, so the two fees keep that order when merged
+                    await conn.execute(text(
+                        "UPDATE student_fees SET created_at = CAST(:billed_at AS timestamptz) + "
+                        "CASE WHEN fee_bill_id = :open THEN interval '1 day' ELSE interval '0' END "
+                        "WHERE student_id = :student_id"
+                    ), {"billed_at": billed_at, "open": bills["Open Fee"], "student_id": student_id})
+            finally:
+                await engine.dispose()
+        
+        asyncio.run(backdate())
+        
+        status_code, job = self.make_request('POST', '/archives', {}, token=token)
+        success = status_code == 202 and job['status'] == 'running'
+        self.log_result("Archive Job Started", success, f"Status: {status_code}, Data: {job}" if not success else "")
+        if not success:
+            return
+        for _ in range(60):
+            status_code, job = self.make_request('GET', f"/archives/jobs/{job['id']}", token=token)
+            if status_code != 200 or job['status'] != 'running':
+                break
+            time.sleep(0.5)
+        archived = {entry['table']: entry['rows'] for entry in job.get('archived', [])}
+        # The open bill's fee stays in Postgres: its bill is not settled
+        success = status_code == 200 and job['status'] == 'succeeded' and archived == {'attendance': 2, 'student_fees': 1}
+        self.log_result("Archive Job Succeeded", success, f"Status: {status_code}, Data: {job}" if not success else "")
+        
+        status_code, data = self.make_request('GET', '/archives/jobs/00000000-0000-0000-0000-000000000000', token=token)
+        self.log_result("Unknown Archive Job", status_code == 404, f"Status: {status_code}" if status_code != 404 else "")
+        
+        # Live and archived days in one history, walked one day per page
+        rows, pages = self.walk_pages(f"/students/{student_id}/attendance", {
+            "days": (date.today() - old_days[0]).days + 1, "limit": 1
+        }, token=token)
+        expected = [(date.today().isoformat(), "present"), (old_days[1].isoformat(), "absent"), (old_days[0].isoformat(), "present")]
+        success = [(row['date'], row['status']) for row in rows] == expected and pages == 3
+        self.log_result("Archived Attendance Read Through", success, f"Rows: {rows}, Pages: {pages}" if not success else "")
+        
+        status_code, data = self.make_request('POST', '/attendance', {
+            "date": old_days[0].isoformat(), "records": [{"student_id": student_id, "status": "absent"}]
+        }, token=token)
+        self.log_result("Archived Attendance Write Rejected", status_code == 400, f"Status: {status_code}, Data: {data}" if status_code != 400 else "")
+        
+        rows, pages = self.walk_pages(f"/students/{student_id}/fees", {"limit": 1}, token=token)
+        success = [(row['fee_bill_name'], row['status']) for row in rows] == [("Open Fee", "unpaid"), ("Settled Fee", "paid")]
+        self.log_result("Archived Fees Read Through", success, f"Rows: {rows}" if not success else "")
+        
+        # The archived bill's payer is not billed again
+        status_code, data = self.make_request('POST', f"/fee-bills/{bills['Settled Fee']}/apply", token=token)
+        self.log_result("Archived Fee Bill Apply Rejected", status_code == 409, f"Status: {status_code}, Data: {data}" if status_code != 409 else "")
+        status_code, data = self.make_request('POST', f"/fee-bills/{bills['Open Fee']}/apply", token=token)
+        success = status_code == 200 and data['assigned_count'] == 0
+        self.log_result("Open Fee Bill Apply", success, f"Status: {status_code}, Data: {data}" if not success else "")
+        
+        status_code, summaries = self.make_request('GET', '/fee-bills/summary', token=token)
+        settled = next((s for s in summaries if s['fee_bill_id'] == bills["Settled Fee"]), {}) if status_code == 200 else {}
+        success = settled.get('archived_at') is not None and settled.get('paid_count') == 1 and settled.get('paid_amount') == 700
+        self.log_result("Archived Fee Bill Summary", success, f"Status: {status_code}, Data: {settled}" if not success else "")
+        
+        status_code, profile = self.make_request('GET', f"/students/{student_id}/profile", token=token)
+        fees = profile.get('fees', {}) if status_code == 200 else {}
+        success = (fees.get('total_count') == 2 and fees.get('paid_count') == 1 and fees.get('paid_amount') == 700 and
+                   [fee['fee_bill_name'] for fee in fees.get('recent', [])] == ["Open Fee", "Settled Fee"])
+        self.log_result("Archived Fees In Profile", success, f"Status: {status_code}, Data: {fees}" if not success else "")
+
+    def get_other_school(self) -> Optional[Dict[str, str]]:
+        """Register a second school with one student and one teacher, for cross-school checks"""
+        if self.other_school is not None:
+            return self.other_school
+        
+        suffix = datetime.now().strftime('%H%M%S%f')
+        status_code, data = self.make_request('POST', '/auth/register-school', {
+            "school_name": f"Other School {suffix}",
+            "user_name": "Other Principal",
+            "user_email": f"other{suffix}@otherschool.com",
+            "user_password": "OtherPass123!"
+        })
+        if status_code != 200:
+            return None
+        token = data['access_token']
+        
+        status_code, student = self.make_request('POST', '/students', {
+            "class_name": "Class 5",
+            "admission_number": f"OTH{suffix}",
+            "name": "Other Student",
+            "parent_contact": "+91-9876500000",
+            "date_of_admission": date.today().isoformat()
+        }, token=token)
+        status_code, teacher = self.make_request('POST', '/teachers', {
+            "email": f"other-teacher{suffix}@otherschool.com",
+            "password": "TeacherPass123!",
+            "name": "Other Teacher",
+            "assigned_classes": ["Class 5"]
+        }, token=token)
+        
+        self.other_school = {
+            "token": token,
+            "school_id": data['school']['id'],
+            "student_id": student.get('id'),
+            "teacher_id": teacher.get('id')
+        }
+        return self.other_school
+
+    def test_attendance_upsert(self):
+        """Test that re-marking a day updates the record and foreign students roll back the batch"""
+        print("\n🔍 Testing Attendance Upsert...")
+        
+        if not self.test_student_id:
+            self.log_result("Attendance Upsert", False, "No student ID available", None)
+            return
+        
+        today = date.today().isoformat()
+        params = {"date": today, "class_name": "Class 5"}
+        
+        def student_records():
+            status_code, data = self.make_request('GET', '/attendance', params=params)
+            return [r for r in data if r.get('student_id') == self.test_student_id] if status_code == 200 else None
+        
+        for status in ["present", "absent"]:
+            self.make_request('POST', '/attendance', {
+                "date": today,
+                "records": [{"student_id": self.test_student_id, "status": status}]
+            })
+        records = student_records()
+        success = records is not None and len(records) == 1 and records[0]['status'] == 'absent'
+        self.log_result("Re-mark Attendance Updates One Row", success,
+                       f"Records: {records}" if not success else "")
+        
+        other = self.get_other_school()
+        if not other or not other['student_id']:
+            self.log_result("Foreign Student Attendance", False, "Could not create a second school", None)
+            return
+        status_code, data = self.make_request('POST', '/attendance', {
+            "date": today,
+            "records": [
+                {"student_id": self.test_student_id, "status": "present"},
+                {"student_id": other['student_id'], "status": "present"}
+            ]
+        })
+        records = student_records()
+        success = status_code == 404 and records is not None and len(records) == 1 and records[0]['status'] == 'absent'
+        self.log_result("Foreign Student Rolls Back Attendance", success,
+                       f"Status: {status_code}, Records: {records}" if not success else "", data)
+        
+        # Nothing was written for the other school either
+        status_code, data = self.make_request('GET', '/attendance', params=params, token=other['token'])
+        success = status_code == 200 and data == []
+        self.log_result("Foreign Student Attendance Not Written", success,
+                       f"Status: {status_code}, Data: {data}" if not success else "", data)
+
+    def export_rows(self, name: str, params: Dict = None) -> list:
+        """Read an export as NDJSON, returning its rows"""
+        response = requests.get(f"{self.base_url}/api/exports/{name}", headers={'Authorization': f'Bearer {self.token}'},
+                                params={**(params or {}), "format": "ndjson"}, timeout=30)
+        response.raise_for_status()
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_dashboard_totals(self):
+        """Test that dashboard totals match the underlying rows and follow writes immediately"""
+        print("\n🔍 Testing Dashboard Totals...")
+        
+        today = date.today()
+        students = self.export_rows('students')
+        expected = {
+            "total_students": len(students),
+            "total_classes": len({s['class_name'] for s in students}),
+            "recent_admissions": sum(s['date_of_admission'] >= (today - timedelta(days=30)).isoformat() for s in students),
+            "pending_fees": len(self.export_rows('student-fees', {"status": "unpaid"})),
+        }
+        attendance = self.export_rows('attendance', {"start_date": today.isoformat(), "end_date": today.isoformat()})
+        present = sum(a['status'] == "present" for a in attendance)
+        expected["today_attendance_rate"] = round(present / len(attendance) * 100, 1) if attendance else 0
+        
+        status_code, stats = self.make_request('GET', '/dashboard/stats')
+        success = status_code == 200 and stats == expected
+        self.log_result("Dashboard Totals Match Rows", success,
+                       f"Status: {status_code}, Stats: {stats}, Expected: {expected}" if not success else "")
+        
+        # A write must not be hidden behind the cached stats
+        status_code, student = self.make_request('POST', '/students', {
+            "class_name": "Class 3",
+            "admission_number": f"DASH{datetime.now().strftime('%H%M%S%f')}",
+            "name": "Dashboard Student",
+            "parent_contact": "+91-9876500041",
+            "date_of_admission": today.isoformat()
+        })
+        status_code, after = self.make_request('GET', '/dashboard/stats')
+        success = (status_code == 200 and after['total_students'] == stats['total_students'] + 1 and
+                   after['recent_admissions'] == stats['recent_admissions'] + 1)
+        self.log_result("Dashboard Follows New Student", success,
+                       f"Before: {stats}, After: {after}" if not success else "")
+        
+        self.make_request('DELETE', f"/students/{student['id']}")
+        status_code, after = self.make_request('GET', '/dashboard/stats')
+        success = status_code == 200 and after == stats
+        self.log_result("Dashboard Follows Deleted Student", success,
+                       f"Before: {stats}, After: {after}" if not success else "")
+
     def test_notifications(self):
         """Test notification system"""
         print("\n🔍 Testing Notification System...")
@@ -328,6 +1092,119 @@ class SchoolAdminAPITester:
             self.log_result("Get Notification Contacts", success, 
                            f"Status: {status_code}" if not success else "", data)
 
+    def test_notification_contacts(self):
+        """Test that contacts are grouped by normalized parent phone and page through next_offset"""
+        print("\n🔍 Testing Notification Contacts...")
+        
+        student_ids = []
+        for name, phone in [("Contact Sibling A", "+91-98765 00071"), ("Contact Sibling B", "098765-00071"),
+                            ("Contact Other", "+91 98765 00072")]:
+            status_code, data = self.make_request('POST', '/students', {
+                "class_name": "Class 1",
+                "admission_number": f"CONT{datetime.now().strftime('%H%M%S%f')}",
+                "name": name,
+                "parent_contact": phone,
+                "date_of_admission": date.today().isoformat()
+            })
+            if status_code == 200:
+                student_ids.append(data['id'])
+        status_code, notification = self.make_request('POST', '/notifications', {
+            "title": "Contacts Test", "message": "Grouped by parent phone.", "target_class": "Class 1"
+        })
+        if len(student_ids) != 3 or status_code != 200:
+            self.log_result("Notification Contacts", False, f"Status: {status_code}, Data: {notification}", None)
+            return
+        
+        endpoint = f"/notifications/{notification['id']}/contacts"
+        status_code, first = self.make_request('GET', endpoint, params={"limit": 1})
+        status_code, second = self.make_request('GET', endpoint, params={"limit": 1, "offset": first.get('next_offset')})
+        contacts = first.get('contacts', []) + second.get('contacts', [])
+        by_phone = {c['phone']: c['student_names'] for c in contacts}
+        success = (first['total'] == 2 and first['next_offset'] == 1 and second['next_offset'] is None and
+                   by_phone == {"+919876500071": ["Contact Sibling A", "Contact Sibling B"],
+                                "+919876500072": ["Contact Other"]} and
+                   all(c['whatsapp_link'].startswith(f"https://wa.me/{c['phone'][1:]}?text=") for c in contacts))
+        self.log_result("Contacts Grouped By Phone", success, f"Pages: {first}, {second}" if not success else "")
+        
+        # The link text is signed like the outbox messages, with the school's name
+        expected_text = f"*Contacts Test*\n\nGrouped by parent phone.\n\n- {self.test_school_name}"
+        texts = {unquote(c['whatsapp_link'].split('?text=', 1)[1]) for c in contacts}
+        success = texts == {expected_text}
+        self.log_result("Contact Link Signed With School Name", success, f"Texts: {texts}" if not success else "")
+        
+        # A new sibling must join the cached contact list
+        status_code, data = self.make_request('POST', '/students', {
+            "class_name": "Class 1",
+            "admission_number": f"CONT{datetime.now().strftime('%H%M%S%f')}",
+            "name": "Contact Sibling C",
+            "parent_contact": "9876500071",
+            "date_of_admission": date.today().isoformat()
+        })
+        student_ids.append(data.get('id'))
+        status_code, after = self.make_request('GET', endpoint)
+        names = {c['phone']: c['student_names'] for c in after.get('contacts', [])}
+        success = after.get('total') == 2 and names.get("+919876500071") == ["Contact Sibling A", "Contact Sibling B", "Contact Sibling C"]
+        self.log_result("Contacts Follow New Student", success, f"Status: {status_code}, Data: {after}" if not success else "")
+        
+        for student_id in student_ids:
+            self.make_request('DELETE', f'/students/{student_id}')
+
+    def test_outbox_delivery(self):
+        """Test that draining the outbox with the file sender delivers a new notification
+
+        Runs the worker pool in this process, so it needs DATABASE_URL pointing
+        at the server's database.
+        """
+        print("\n🔍 Testing Outbox Delivery...")
+        
+        if not os.environ.get('DATABASE_URL'):
+            print("   Skipping: DATABASE_URL is not set")
+            return
+        
+        status_code, data = self.make_request('POST', '/notifications', {
+            "title": "Outbox Test",
+            "message": "Delivered through the outbox.",
+            "target_class": "Class 5"
+        })
+        notification_id = data.get('id') if status_code == 200 else None
+        status_code, before = self.make_request('GET', f'/notifications/{notification_id}/deliveries')
+        success = status_code == 200 and before['total'] == before['pending'] == 1
+        self.log_result("Notification Enqueued", success, f"Status: {status_code}, Data: {before}" if not success else "", before)
+        if not success:
+            return
+        
+        sys.path.insert(0, str(Path(__file__).parent / "backend"))
+        from database import engine
+        from outbox import FileSender, OutboxWorkerPool
+        
+        async def drain():
+            pool = OutboxWorkerPool(1, sender=FileSender())
+            try:
+                # Other pending deliveries in the database may be drained too
+                for _ in range(50):
+                    if not await pool.drain_batch():
+                        break
+            finally:
+                await engine.dispose()
+        
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['OUTBOX_FILE_PATH'] = str(Path(directory) / 'outbox.jsonl')
+            try:
+                asyncio.run(drain())
+                lines = Path(os.environ['OUTBOX_FILE_PATH']).read_text().splitlines()
+            finally:
+                del os.environ['OUTBOX_FILE_PATH']
+        
+        messages = [m for m in map(json.loads, lines) if m['phone'] == "+919876543210" and "Outbox Test" in m['text']]
+        expected_text = f"*Outbox Test*\n\nDelivered through the outbox.\n\n- {self.test_school_name}"
+        success = len(messages) == 1 and messages[0]['text'] == expected_text
+        self.log_result("Outbox File Sender Output", success, f"Messages: {messages}" if not success else "")
+        
+        status_code, after = self.make_request('GET', f'/notifications/{notification_id}/deliveries')
+        success = (status_code == 200 and (after['pending'], after['sending'], after['sent']) == (0, 0, 1) and
+                   after['last_sent_at'] is not None)
+        self.log_result("Outbox Delivery Marked Sent", success, f"Status: {status_code}, Data: {after}" if not success else "", after)
+
     def test_teacher_management(self):
         """Test teacher management with class assignment"""
         print("\n🔍 Testing Teacher Management...")
@@ -376,6 +1253,276 @@ class SchoolAdminAPITester:
         
         return teacher_id
 
+    def test_payroll_run(self, teacher_id: Optional[str]):
+        """Test that a payroll run with another school's teacher is rejected without paying anyone"""
+        print("\n🔍 Testing Payroll Run...")
+        
+        other = self.get_other_school()
+        if not teacher_id or not other or not other['teacher_id']:
+            self.log_result("Payroll Run", False, "Missing teacher IDs", None)
+            return
+        
+        def salary_count(tid, token=None):
+            status_code, data = self.make_request('GET', f'/teachers/{tid}/salaries', token=token)
+            return len(data) if status_code == 200 else None
+        
+        own_before = salary_count(teacher_id)
+        other_before = salary_count(other['teacher_id'], other['token'])
+        
+        status_code, data = self.make_request('POST', '/teacher-salaries/payroll-run', {
+            "payments": [
+                {"teacher_id": teacher_id, "amount": 42000.0},
+                {"teacher_id": other['teacher_id'], "amount": 42000.0}
+            ],
+            "remark": "Payroll with a foreign teacher"
+        })
+        own_after = salary_count(teacher_id)
+        other_after = salary_count(other['teacher_id'], other['token'])
+        success = status_code == 404 and own_after == own_before and other_after == other_before == 0
+        self.log_result("Payroll Run Rejects Foreign Teacher", success,
+                       f"Status: {status_code}, Salaries before: {own_before}/{other_before}, "
+                       f"after: {own_after}/{other_after}" if not success else "", data)
+        
+        status_code, data = self.make_request('POST', '/teacher-salaries/payroll-run', {
+            "payments": [{"teacher_id": teacher_id, "amount": 42000.0}],
+            "remark": "Payroll run"
+        })
+        success = (status_code == 200 and data['paid'] == 1 and data['total_amount'] == 42000.0 and
+                   salary_count(teacher_id) == own_before + 1)
+        self.log_result("Payroll Run", success, f"Status: {status_code}, Data: {data}" if not success else "", data)
+
+    def create_teacher(self, name: str, classes: list) -> tuple:
+        """Create a teacher and log in as them, returning (teacher_id, token)"""
+        email = f"{name.lower().replace(' ', '')}{datetime.now().strftime('%H%M%S%f')}@testschool.com"
+        status_code, data = self.make_request('POST', '/teachers', {
+            "email": email,
+            "password": "TeacherPass123!",
+            "name": name,
+            "phone": "+91-9876500040",
+            "assigned_classes": classes
+        })
+        if status_code != 200:
+            return None, None
+        status_code, login = self.make_request('POST', '/auth/login', {"email": email, "password": "TeacherPass123!"})
+        return data['id'], login.get('access_token') if status_code == 200 else None
+
+    def test_identity_cache(self):
+        """Test that cached identities are dropped when a user is updated or deleted"""
+        print("\n🔍 Testing Identity Cache...")
+        
+        teacher_id, teacher_token = self.create_teacher("Cached Teacher", ["Class 5"])
+        if not teacher_token:
+            self.log_result("Identity Cache", False, "Could not create teacher", None)
+            return
+        
+        # Populate the cache, then rename the teacher
+        self.make_request('GET', '/auth/me', token=teacher_token)
+        self.make_request('PUT', f'/teachers/{teacher_id}', {
+            "email": "unused@testschool.com",
+            "password": "",
+            "name": "Renamed Teacher",
+            "assigned_classes": ["Class 5"]
+        })
+        status_code, data = self.make_request('GET', '/auth/me', token=teacher_token)
+        success = status_code == 200 and data['user']['name'] == "Renamed Teacher"
+        self.log_result("Identity Cache Invalidated On Update", success,
+                       f"Status: {status_code}, Data: {data}" if not success else "")
+        
+        self.make_request('DELETE', f'/users/{teacher_id}')
+        status_code, data = self.make_request('GET', '/auth/me', token=teacher_token)
+        success = status_code == 401
+        self.log_result("Deleted User Token Rejected", success, f"Status: {status_code}, Data: {data}" if not success else "")
+
+    def test_teacher_classes(self):
+        """Test that teacher access follows the teacher_classes assignments"""
+        print("\n🔍 Testing Teacher Classes...")
+        
+        status_code, student = self.make_request('POST', '/students', {
+            "class_name": "Class 3",
+            "admission_number": f"TCLS{datetime.now().strftime('%H%M%S%f')}",
+            "name": "Class Three Student",
+            "parent_contact": "+91-9876500081",
+            "date_of_admission": date.today().isoformat()
+        })
+        teacher_id, teacher_token = self.create_teacher("Class Teacher", ["Class 6", "Class 5"])
+        if status_code != 200 or not teacher_token:
+            self.log_result("Teacher Classes", False, "Could not create student or teacher", None)
+            return
+        
+        def access():
+            _, classes = self.make_request('GET', '/my-classes', token=teacher_token)
+            status_code, students = self.make_request('GET', '/students', params={"limit": 500}, token=teacher_token)
+            visible = {s['class_name'] for s in students} if status_code == 200 else students
+            status_code, _ = self.make_request('GET', f"/students/{student['id']}", token=teacher_token)
+            _, teachers = self.make_request('GET', '/classes/Class 5/teachers')
+            return classes['classes'], visible, status_code, teacher_id in {t['id'] for t in teachers}
+        
+        classes, visible, status_code, listed = access()
+        success = (classes == ["Class 5", "Class 6"] and visible <= {"Class 5", "Class 6"} and "Class 5" in visible and
+                   status_code == 404 and listed)
+        self.log_result("Teacher Sees Assigned Classes", success,
+                       f"Classes: {classes}, Visible: {visible}, Class 3 student: {status_code}, Listed: {listed}" if not success else "")
+        
+        self.make_request('PUT', f'/teachers/{teacher_id}', {
+            "email": "unused@testschool.com", "password": "", "name": "Class Teacher", "assigned_classes": ["Class 3"]
+        })
+        classes, visible, status_code, listed = access()
+        success = classes == ["Class 3"] and visible == {"Class 3"} and status_code == 200 and not listed
+        self.log_result("Teacher Access Follows Reassignment", success,
+                       f"Classes: {classes}, Visible: {visible}, Class 3 student: {status_code}, Listed: {listed}" if not success else "")
+        
+        self.make_request('DELETE', f'/users/{teacher_id}')
+        self.make_request('DELETE', f"/students/{student['id']}")
+
+    def test_read_routing(self):
+        """Test X-DB-Route on projected lists and read-your-writes routing to the primary
+
+        The routing checks need the server and this process to share a
+        DATABASE_READ_URL; without it they are skipped.
+        """
+        print("\n🔍 Testing Read Routing...")
+        
+        headers = {'Authorization': f'Bearer {self.token}'}
+        response = requests.get(f"{self.base_url}/api/students", headers=headers,
+                                params={"fields": "id,name"}, timeout=30)
+        success = response.status_code == 200 and response.headers.get('X-DB-Route') in ("primary", "replica")
+        self.log_result("X-DB-Route On Projected List", success,
+                       f"Status: {response.status_code}, Headers: {dict(response.headers)}" if not success else "")
+        
+        if not os.environ.get('DATABASE_READ_URL'):
+            print("   Skipping read-your-writes: DATABASE_READ_URL is not set")
+            return
+        
+        response = requests.post(f"{self.base_url}/api/students", headers=headers, json={
+            "class_name": "Class 9",
+            "admission_number": f"RYW{datetime.now().strftime('%H%M%S%f')}",
+            "name": "Routing Student",
+            "parent_contact": "+91-9876500031",
+            "date_of_admission": date.today().isoformat()
+        }, timeout=30)
+        until = response.headers.get('X-Read-Your-Writes-Until')
+        student_id = response.json().get('id') if response.status_code == 200 else None
+        success = student_id is not None and until is not None and response.headers.get('X-DB-Route') == "primary"
+        self.log_result("Write Sets Read-Your-Writes", success,
+                       f"Status: {response.status_code}, Headers: {dict(response.headers)}" if not success else "")
+        if not success:
+            return
+        
+        response = requests.get(f"{self.base_url}/api/students/{student_id}",
+                                headers={**headers, 'X-Read-Your-Writes-Until': until}, timeout=30)
+        success = response.status_code == 200 and response.headers.get('X-DB-Route') == "primary"
+        self.log_result("Read After Write Uses Primary", success,
+                       f"Status: {response.status_code}, Route: {response.headers.get('X-DB-Route')}" if not success else "")
+        
+        response = requests.get(f"{self.base_url}/api/students", headers=headers, timeout=30)
+        success = response.status_code == 200 and response.headers.get('X-DB-Route') == "replica"
+        self.log_result("Plain Read Uses Replica", success,
+                       f"Status: {response.status_code}, Route: {response.headers.get('X-DB-Route')}" if not success else "")
+        
+        # The server never issues a deadline an hour ahead, so it must not pin reads to the primary
+        response = requests.get(f"{self.base_url}/api/students", timeout=30,
+                                headers={**headers, 'X-Read-Your-Writes-Until': str(int(float(until)) + 3600)})
+        success = response.status_code == 200 and response.headers.get('X-DB-Route') == "replica"
+        self.log_result("Far-Future Read-Your-Writes Ignored", success,
+                       f"Status: {response.status_code}, Route: {response.headers.get('X-DB-Route')}" if not success else "")
+        
+        self.make_request('DELETE', f'/students/{student_id}')
+
+    def test_connection_profiles(self):
+        """Test that the direct profile reuses prepared statements and the pgbouncer profile leaves none behind
+
+        Opens its own engines, so it needs DATABASE_URL pointing at the
+        server's database; without it the test is skipped.
+        """
+        print("\n🔍 Testing Connection Profiles...")
+        
+        if not os.environ.get('DATABASE_URL'):
+            print("   Skipping: DATABASE_URL is not set")
+            return
+        
+        sys.path.insert(0, str(Path(__file__).parent / "backend"))
+        from sqlalchemy import select, text
+        from database import ASYNC_DATABASE_URL, default_profile, make_engine
+        from models import Student
+        
+        async def prepared_statements(profile):
+            engine = make_engine(ASYNC_DATABASE_URL, profile, pool_size=1, max_overflow=0)
+            try:
+                async with engine.connect() as conn:
+                    for n in range(3):
+                        await conn.execute(select(Student.id).where(Student.class_name == f"Class {n + 1}").limit(1))
+                    result = await conn.execute(text("SELECT statement FROM pg_prepared_statements"))
+                    return [s for s in result.scalars().all() if 'FROM students' in s]
+            finally:
+                await engine.dispose()
+        
+        direct = asyncio.run(prepared_statements("direct"))
+        pgbouncer = asyncio.run(prepared_statements("pgbouncer"))
+        # Direct: one cached statement for all three calls. PgBouncer: none left
+        # on the backend for another client to collide with.
+        success = len(direct) == 1 and pgbouncer == []
+        self.log_result("Prepared Statements Per Profile", success,
+                       f"Direct: {direct}, PgBouncer: {pgbouncer}" if not success else "")
+        
+        success = (default_profile("postgresql+asyncpg://user@pooler.example.com:6543/postgres") == "pgbouncer" and
+                   default_profile("postgresql+asyncpg://user@db.example.com:5432/postgres") == "direct")
+        self.log_result("Default Profile From Port", success)
+
+    def test_metrics(self):
+        """Test that /metrics labels latency by route template and reports pool gauges"""
+        print("\n🔍 Testing Metrics...")
+        
+        def counts():
+            response = requests.get(f"{self.base_url}/api/metrics", timeout=30)
+            found = {}
+            for line in response.text.splitlines():
+                if line.startswith("http_request_duration_seconds_count{"):
+                    labels, value = line[len("http_request_duration_seconds_count"):].rsplit(" ", 1)
+                    found[labels] = float(value)
+            return response.text, found
+        
+        _, before = counts()
+        for student_id in [self.test_student_id, "00000000-0000-0000-0000-000000000000"]:
+            self.make_request('GET', f'/students/{student_id}')
+        requests.get(f"{self.base_url}/api/no-such-route-{datetime.now().strftime('%H%M%S')}", timeout=30)
+        text, after = counts()
+        
+        def grew(labels):
+            return after.get(labels, 0) - before.get(labels, 0)
+        
+        success = (grew('{method="GET",route="/api/students/{student_id}",status="200"}') == 1 and
+                   grew('{method="GET",route="/api/students/{student_id}",status="404"}') == 1 and
+                   grew('{method="GET",route="unmatched",status="404"}') == 1 and
+                   self.test_student_id not in text and "no-such-route" not in text)
+        self.log_result("Metrics Labelled By Route Template", success,
+                       f"Counts before: {before}, after: {after}" if not success else "")
+        
+        success = all(f'{gauge}{{pool="primary"}}' in text for gauge in
+                      ["db_pool_size", "db_pool_checked_out", "db_pool_overflow", "db_pool_wait_seconds_count"])
+        self.log_result("Metrics Pool Gauges", success, text[-500:] if not success else "")
+
+    def test_query_counts(self):
+        """Test that list endpoints issue the same number of queries for any page size
+
+        Needs the server to run with SQL_DEBUG_HEADERS=true (X-DB-Queries); with
+        SQL_TEST_MODE=true the server itself also fails N+1 responses.
+        """
+        print("\n🔍 Testing Query Counts...")
+        
+        headers = {'Authorization': f'Bearer {self.token}'}
+        for endpoint in ['/students', '/fee-bills', '/notifications', '/teacher-salaries']:
+            counts = []
+            for limit in [1, 50]:
+                response = requests.get(f"{self.base_url}/api{endpoint}", headers=headers,
+                                        params={"limit": limit}, timeout=30)
+                counts.append(response.headers.get('X-DB-Queries'))
+            if counts[0] is None:
+                print(f"   Skipping {endpoint}: server does not send X-DB-Queries")
+                continue
+            success = counts[0] == counts[1]
+            self.log_result(f"Constant Query Count {endpoint}", success,
+                           f"Queries for limit=1 vs limit=50: {counts}" if not success else "")
+
     def cleanup_test_data(self):
         """Clean up test data"""
         print("\n🧹 Cleaning up test data...")
@@ -395,6 +1542,7 @@ class SchoolAdminAPITester:
         try:
             # Core API tests
             self.test_health_check()
+            self.test_readiness_without_database()
             
             # Try existing login first
             self.test_existing_login()
@@ -408,10 +1556,32 @@ class SchoolAdminAPITester:
                 self.test_dashboard_stats()
                 self.test_get_classes()
                 self.test_student_management()
+                self.test_search()
+                self.test_student_import()
                 self.test_fee_management()
+                self.test_fee_fan_out()
+                self.test_batch_mark_paid()
+                self.test_fee_summary()
+                self.test_pagination()
+                self.test_exports()
+                self.test_promotion()
                 self.test_attendance_system()
+                self.test_attendance_upsert()
+                self.test_attendance_partitions()
+                self.test_archive()
+                self.test_dashboard_totals()
+                self.test_student_profile()
                 self.test_notifications()
-                self.test_teacher_management()
+                self.test_notification_contacts()
+                self.test_outbox_delivery()
+                teacher_id = self.test_teacher_management()
+                self.test_payroll_run(teacher_id)
+                self.test_identity_cache()
+                self.test_teacher_classes()
+                self.test_read_routing()
+                self.test_connection_profiles()
+                self.test_query_counts()
+                self.test_metrics()
                 
                 # Cleanup
                 self.cleanup_test_data()
@@ -10,18 +10,31 @@ const api = axios.create({
   },
 });
 
+// After a write the server asks for reads from the primary database for a few
+// seconds (X-Read-Your-Writes-Until), so lists reflect what was just saved
+let readYourWritesUntil = 0;
+
 // Add auth token to requests
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  if (readYourWritesUntil > Date.now() / 1000) {
+    config.headers['X-Read-Your-Writes-Until'] = readYourWritesUntil;
+  }
   return config;
 });
 
 // Handle auth errors
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const until = Number(response.headers['x-read-your-writes-until']);
+    if (until > readYourWritesUntil) {
+      readYourWritesUntil = until;
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
@@ -33,6 +46,21 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints return one page at a time, 100 rows unless limit= asks for
+// more (up to 500); follow X-Next-Cursor to the end. Calling api.get directly
+// on a paged endpoint silently sees only the first 100 rows.
+const getAllPages = async (url, params = {}) => {
+  let response = await api.get(url, { params });
+  const data = [...response.data];
+  let cursor = response.headers['x-next-cursor'];
+  while (cursor) {
+    response = await api.get(url, { params: { ...params, cursor } });
+    data.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  }
+  return { ...response, data };
+};
+
 // Auth
 export const registerSchool = (schoolData, userData) => 
   api.post('/auth/register-school', null, { params: { ...schoolData, ...userData } });
@@ -65,38 +93,70 @@ export const updateTeacher = (id, data) => api.put(`/teachers/${id}`, data);
 
 // Teacher Salaries
 export const createTeacherSalary = (data) => api.post('/teacher-salaries', data);
-export const getAllSalaries = () => api.get('/teacher-salaries');
-export const getTeacherSalaries = (teacherId) => api.get(`/teachers/${teacherId}/salaries`);
+export const getAllSalaries = () => getAllPages('/teacher-salaries');
+export const runPayroll = (payments, remark) => api.post('/teacher-salaries/payroll-run', { payments, remark });
+export const getSalarySummary = (params) => api.get('/teacher-salaries/summary', { params });
+export const getTeacherSalaries = (teacherId, fromDate) =>
+  api.get(`/teachers/${teacherId}/salaries`, { params: fromDate ? { from_date: fromDate } : {} });
 
 // Students
 export const createStudent = (data) => api.post('/students', data);
-export const getStudents = (params) => api.get('/students', { params });
+export const importStudents = (file) => {
+  const formData = new FormData();
+  formData.append('file', file);
+  return api.post('/students/import', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+};
+export const getStudents = (params) => getAllPages('/students', params);
 export const getStudent = (id) => api.get(`/students/${id}`);
+export const getStudentProfile = (id, days = 60, recentFees = 50) => 
+  api.get(`/students/${id}/profile`, { params: { days, recent_fees: recentFees } });
 export const updateStudent = (id, data) => api.put(`/students/${id}`, data);
 export const deleteStudent = (id) => api.delete(`/students/${id}`);
+export const promoteStudents = (dryRun = true, mapping) => 
+  api.post('/students/promote', { dry_run: dryRun, mapping });
 
 // Fee Bills
 export const createFeeBill = (data) => api.post('/fee-bills', data);
-export const getFeeBills = () => api.get('/fee-bills');
+export const getFeeBills = () => getAllPages('/fee-bills');
+export const getFeeBillsSummary = () => api.get('/fee-bills/summary');
 export const getFeeBillStudents = (id, status) => 
-  api.get(`/fee-bills/${id}/students`, { params: { status } });
+  getAllPages(`/fee-bills/${id}/students`, { status });
 export const markFeePaid = (feeId, data) => 
   api.put(`/student-fees/${feeId}/mark-paid`, data);
+export const markFeesPaidBatch = (feeIds, remarks) => 
+  api.put('/student-fees/mark-paid', { fee_ids: feeIds, remarks });
 export const getStudentFees = (studentId) => 
-  api.get(`/students/${studentId}/fees`);
+  getAllPages(`/students/${studentId}/fees`);
+export const getStudentFeesPage = (studentId, cursor) => 
+  api.get(`/students/${studentId}/fees`, { params: { cursor } });
 
 // Attendance
 export const markAttendance = (data) => api.post('/attendance', data);
 export const getAttendance = (date, className) => 
   api.get('/attendance', { params: { date, class_name: className } });
 export const getStudentAttendance = (studentId, days = 60) => 
-  api.get(`/students/${studentId}/attendance`, { params: { days } });
+  getAllPages(`/students/${studentId}/attendance`, { days });
 
 // Notifications
 export const createNotification = (data) => api.post('/notifications', data);
-export const getNotifications = () => api.get('/notifications');
-export const getNotificationContacts = (id) => 
-  api.get(`/notifications/${id}/contacts`);
+export const getNotifications = () => getAllPages('/notifications');
+export const getNotificationContacts = async (id) => {
+  let response = await api.get(`/notifications/${id}/contacts`);
+  const contacts = [...response.data.contacts];
+  while (response.data.next_offset !== null) {
+    response = await api.get(`/notifications/${id}/contacts`, { params: { offset: response.data.next_offset } });
+    contacts.push(...response.data.contacts);
+  }
+  return { ...response, data: { ...response.data, contacts } };
+};
+
+// Archives of closed academic years
+export const getArchives = () => api.get('/archives');
+export const runArchive = (year) => api.post('/archives', { year });
+export const getArchiveJob = (jobId) => api.get(`/archives/jobs/${jobId}`);
+
+// Search
+export const search = (q, limit) => api.get('/search', { params: { q, limit } });
 
 // Dashboard
 export const getDashboardStats = () => api.get('/dashboard/stats');
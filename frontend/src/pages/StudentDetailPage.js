@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { getStudent, updateStudent, getStudentFees, getStudentAttendance } from '../lib/api';
+import { getStudentProfile, getStudentFeesPage, updateStudent } from '../lib/api';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
@@ -19,7 +19,11 @@ export const StudentDetailPage = () => {
   const { isPrincipal } = useAuth();
   const [student, setStudent] = useState(null);
   const [fees, setFees] = useState([]);
+  const [feeSummary, setFeeSummary] = useState(null);
+  const [feesCursor, setFeesCursor] = useState(null);
+  const [loadingFees, setLoadingFees] = useState(false);
   const [attendance, setAttendance] = useState([]);
+  const [attendanceSummary, setAttendanceSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [editing, setEditing] = useState(false);
   const [editData, setEditData] = useState({});
@@ -30,15 +34,14 @@ export const StudentDetailPage = () => {
 
   const fetchData = async () => {
     try {
-      const [studentRes, feesRes, attendanceRes] = await Promise.all([
-        getStudent(id),
-        getStudentFees(id),
-        getStudentAttendance(id, 60)
-      ]);
-      setStudent(studentRes.data);
-      setFees(feesRes.data);
-      setAttendance(attendanceRes.data);
-      setEditData(studentRes.data);
+      const { data } = await getStudentProfile(id, 60);
+      setStudent(data.student);
+      setFees(data.fees.recent);
+      setFeesCursor(data.fees.next_cursor);
+      setFeeSummary(data.fees);
+      setAttendance(data.attendance.recent);
+      setAttendanceSummary(data.attendance);
+      setEditData(data.student);
     } catch (error) {
       toast.error('Failed to fetch student details');
       navigate('/students');
@@ -47,6 +50,19 @@ export const StudentDetailPage = () => {
     }
   };
 
+  const loadMoreFees = async () => {
+    setLoadingFees(true);
+    try {
+      const response = await getStudentFeesPage(id, feesCursor);
+      setFees((current) => [...current, ...response.data]);
+      setFeesCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      toast.error('Failed to load more fees');
+    } finally {
+      setLoadingFees(false);
+    }
+  };
+
   const handleSave = async () => {
     try {
       await updateStudent(id, {
@@ -66,20 +82,18 @@ export const StudentDetailPage = () => {
   };
 
   const attendanceStats = {
-    total: attendance.length,
-    present: attendance.filter(a => a.status === 'present').length,
-    absent: attendance.filter(a => a.status === 'absent').length,
-    rate: attendance.length > 0 
-      ? Math.round((attendance.filter(a => a.status === 'present').length / attendance.length) * 100) 
-      : 0
+    total: attendanceSummary?.marked_days ?? 0,
+    present: attendanceSummary?.present_days ?? 0,
+    absent: attendanceSummary?.absent_days ?? 0,
+    rate: Math.round(attendanceSummary?.present_percentage ?? 0)
   };
 
   const feeStats = {
-    total: fees.length,
-    paid: fees.filter(f => f.status === 'paid').length,
-    unpaid: fees.filter(f => f.status === 'unpaid').length,
-    totalAmount: fees.reduce((sum, f) => sum + f.amount, 0),
-    paidAmount: fees.filter(f => f.status === 'paid').reduce((sum, f) => sum + f.amount, 0)
+    total: feeSummary?.total_count ?? 0,
+    paid: feeSummary?.paid_count ?? 0,
+    unpaid: feeSummary?.unpaid_count ?? 0,
+    totalAmount: (feeSummary?.paid_amount ?? 0) + (feeSummary?.unpaid_amount ?? 0),
+    paidAmount: feeSummary?.paid_amount ?? 0
   };
 
   if (loading) {
@@ -339,6 +353,13 @@ export const StudentDetailPage = () => {
                       ))}
                     </TableBody>
                   </Table>
+                  {feesCursor && (
+                    <div className="flex justify-center pt-4">
+                      <Button variant="outline" onClick={loadMoreFees} disabled={loadingFees} data-testid="load-more-fees">
+                        {loadingFees ? 'Loading...' : `Show more (${fees.length} of ${feeStats.total})`}
+                      </Button>
+                    </div>
+                  )}
                 </div>
               )}
             </CardContent>
@@ -0,0 +1,76 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from hashing import HasherOverloadedError, PasswordHasher, pwd_context
+
+
+class BlockingContext:
+    """Stands in for CryptContext; each hash waits until ``release`` is set"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def hash(self, password):
+        self.started.release()
+        assert self.release.wait(5)
+        return f"hashed:{password}"
+
+
+def test_hash_and_verify_round_trip():
+    async def run():
+        hasher = PasswordHasher(pwd_context, 2, 4)
+        try:
+            hashed = await hasher.hash("Secret123!")
+            return await hasher.verify("Secret123!", hashed), await hasher.verify("wrong", hashed)
+        finally:
+            hasher.shutdown()
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_event_loop_runs_while_hashing():
+    async def run():
+        context = BlockingContext()
+        hasher = PasswordHasher(context, 1, 4)
+        try:
+            hashing = asyncio.create_task(hasher.hash("a"))
+            await asyncio.to_thread(context.started.acquire)
+            # The loop still schedules other work while the hash is in its thread
+            ticks = 0
+            for _ in range(10):
+                await asyncio.sleep(0)
+                ticks += 1
+            assert not hashing.done()
+            context.release.set()
+            return ticks, await hashing
+        finally:
+            hasher.shutdown()
+
+    assert asyncio.run(run()) == (10, "hashed:a")
+
+
+def test_calls_beyond_max_pending_fail_fast():
+    async def run():
+        context = BlockingContext()
+        hasher = PasswordHasher(context, 1, 2)
+        try:
+            running = [asyncio.create_task(hasher.hash(str(n))) for n in range(2)]
+            await asyncio.sleep(0)
+            assert hasher.pending == 2
+            with pytest.raises(HasherOverloadedError):
+                await hasher.hash("overflow")
+            context.release.set()
+            results = await asyncio.gather(*running)
+            # Finished calls free their slots
+            return results, hasher.pending, await hasher.hash("after")
+        finally:
+            hasher.shutdown()
+
+    assert asyncio.run(run()) == (["hashed:0", "hashed:1"], 0, "hashed:after")
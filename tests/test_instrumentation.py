@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from instrumentation import RouteProfile
+
+
+def test_cache_miss_is_not_n_plus_one():
+    profile = RouteProfile()
+    assert profile.check(1, 1) is None
+    # The identity cache expired: one extra query, whatever the page size
+    assert profile.check(3, 2) is None
+    assert profile.check(50, 2) is None
+
+
+def test_two_one_off_queries_are_not_n_plus_one():
+    profile = RouteProfile()
+    assert profile.check(1, 1) is None
+    assert profile.check(4, 3) is None
+
+
+def test_constant_queries_are_not_n_plus_one():
+    profile = RouteProfile()
+    assert profile.check(1, 3) is None
+    assert profile.check(50, 3) is None
+    assert profile.check(0, 2) is None
+
+
+def test_query_per_item_is_n_plus_one():
+    profile = RouteProfile()
+    assert profile.check(1, 2) is None
+    assert profile.check(50, 51) == (1, 2)
+
+
+def test_growth_is_flagged_against_any_smaller_sample():
+    profile = RouteProfile()
+    assert profile.check(1, 2) is None
+    assert profile.check(3, 4) is None
+    assert profile.check(6, 7) == (1, 2)
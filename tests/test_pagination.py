@@ -0,0 +1,82 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import Date, String, column
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from pagination import Keyset, merge_page, rows_after
+
+KEYSET = Keyset(column("date", Date), column("id", String), descending=True)
+DAY = date(2025, 6, 30)
+
+
+def row(days_ago, id, source="db"):
+    return SimpleNamespace(date=DAY - timedelta(days=days_ago), id=id, source=source)
+
+
+def fetch(rows, cursor, limit):
+    """fetch_page over rows held in memory"""
+    rows = rows_after(rows, KEYSET, cursor)
+    if len(rows) > limit:
+        return rows[:limit], KEYSET.encode(rows[limit - 1])
+    return rows, None
+
+
+def walk(db_rows, others, limit):
+    pages, cursor = [], None
+    while True:
+        rows, next_cursor = fetch(db_rows, cursor, limit)
+        rows, cursor = merge_page(rows, next_cursor, others, KEYSET, cursor, limit)
+        pages.append(rows)
+        if cursor is None:
+            return pages
+
+
+def test_interleaved_rows_are_merged_in_order():
+    db_rows = [row(0, "a"), row(2, "c"), row(4, "e")]
+    others = [row(1, "b", "archive"), row(3, "d", "archive")]
+    rows, next_cursor = merge_page(db_rows, None, others, KEYSET, None, 10)
+    assert [r.id for r in rows] == ["a", "b", "c", "d", "e"]
+    assert next_cursor is None
+
+
+def test_database_row_wins_over_its_archived_copy():
+    rows, _ = merge_page([row(1, "a")], None, [row(1, "a", "archive"), row(2, "b", "archive")], KEYSET, None, 10)
+    assert [(r.id, r.source) for r in rows] == [("a", "db"), ("b", "archive")]
+
+
+def test_others_past_a_full_page_wait_for_the_next_one():
+    db_rows = [row(0, "a"), row(2, "c")]
+    rows, next_cursor = merge_page(db_rows, KEYSET.encode(db_rows[-1]), [row(1, "b", "archive"), row(9, "z", "archive")], KEYSET, None, 2)
+    assert [r.id for r in rows] == ["a", "b"]
+    assert KEYSET.decode(next_cursor) == [DAY - timedelta(days=1), "b"]
+
+
+def test_others_before_the_cursor_are_dropped():
+    cursor = KEYSET.encode(row(2, "c"))
+    rows, next_cursor = merge_page([], None, [row(1, "b", "archive"), row(3, "d", "archive")], KEYSET, cursor, 10)
+    assert [r.id for r in rows] == ["d"]
+    assert next_cursor is None
+
+
+def test_others_beyond_the_last_database_page_get_their_own_pages():
+    rows, next_cursor = merge_page([row(0, "a")], None, [row(5, "x", "archive"), row(6, "y", "archive")], KEYSET, None, 2)
+    assert [r.id for r in rows] == ["a", "x"]
+    rows, next_cursor = merge_page([], None, [row(5, "x", "archive"), row(6, "y", "archive")], KEYSET, next_cursor, 2)
+    assert [r.id for r in rows] == ["y"]
+    assert next_cursor is None
+
+
+def test_walking_pages_visits_every_row_once_in_order():
+    db_rows = [row(days, f"db{days}") for days in range(0, 40, 3)]
+    # Two archived copies of database rows, left by an interrupted archive run
+    others = [row(days, f"ar{days}", "archive") for days in range(1, 40, 4)] + [row(3, "db3", "archive"), row(9, "db9", "archive")]
+    for limit in (1, 2, 3, 7, 100):
+        pages = walk(db_rows, others, limit)
+        rows = [r for page in pages for r in page]
+        assert all(len(page) <= limit for page in pages)
+        assert [r.id for r in rows] == [r.id for r in rows_after(db_rows + others[:-2], KEYSET, None)]
+        assert all(r.source == "db" for r in rows if r.id.startswith("db"))